@@ -0,0 +1,52 @@
+"""
+Render time of a 24-card product grid with the card cache cold and warm.
+
+    uv run python -m benchmarks.card_cache
+
+"cold" clears the cache before every render, so every card is rendered
+and stored; "warm" reads all of them with one get_many. Products are
+fetched once beforehand, so only rendering is timed.
+"""
+import argparse
+
+from benchmarks.utils import create_catalog, measure, test_database
+
+PAGE_SIZE = 24
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with test_database():
+        from django.contrib.auth.models import AnonymousUser
+        from django.core.cache import cache
+        from django.template.loader import render_to_string
+
+        from honduras_shop_aggregator.products.models import Product
+
+        create_catalog(PAGE_SIZE)
+        products = list(Product.objects.visible().for_grid(1)[:PAGE_SIZE])
+        context = {
+            'products': products,
+            'user': AnonymousUser(),
+            'seller_features_enabled': True,
+        }
+
+        def render():
+            return render_to_string('partials/_product_grid.html', context)
+
+        def render_cold():
+            cache.clear()
+            return render()
+
+        cold_ms = measure(render_cold, repeat=args.repeat)
+        render()
+        warm_ms = measure(render, repeat=args.repeat)
+        print(f"{'cards':>6} {'cold ms':>9} {'warm ms':>9}")
+        print(f"{len(products):>6} {cold_ms:>9.2f} {warm_ms:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
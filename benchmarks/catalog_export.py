@@ -0,0 +1,81 @@
+"""
+Peak Python memory and time of the streaming catalog export against
+loading the whole queryset before writing it.
+
+    uv run python -m benchmarks.catalog_export --sizes 10000 100000 500000
+
+Peak memory is measured with tracemalloc while the export is consumed the
+way StreamingHttpResponse consumes it, line by line.
+"""
+import argparse
+import csv
+import gc
+import io
+import time
+import tracemalloc
+
+from benchmarks.utils import create_catalog, test_database
+
+
+def load_all(queryset):
+    from honduras_shop_aggregator.products.exports import (EXPORT_FIELDS,
+                                                           export_queryset,
+                                                           image_url)
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(EXPORT_FIELDS)
+    for product in list(export_queryset(queryset)):
+        writer.writerow([
+            product.slug, product.product_name, product.category.slug,
+            product.product_price, product.stock_quantity,
+            product.description, product.is_active, product.product_link,
+            product.origin_city.name,
+            "|".join(city.name for city in product.delivery_cities.all()),
+            image_url(product.image_name, ''),
+        ])
+    return len(output.getvalue())
+
+
+def stream(queryset):
+    from honduras_shop_aggregator.products.exports import export_lines
+
+    return sum(len(line) for line in export_lines(queryset, 'csv'))
+
+
+def run(function, queryset):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(queryset)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[10000, 100000]
+    )
+    args = parser.parse_args()
+
+    with test_database():
+        from honduras_shop_aggregator.products.models import Product
+
+        print(f"{'products':>10} {'implementation':>14} {'seconds':>9} "
+              f"{'peak MB':>9}")
+        created = 0
+        for size in sorted(args.sizes):
+            create_catalog(
+                size - created, describe=lambda i: f"Descripción {i} " * 5
+            )
+            created = size
+            for name, function in (('load all', load_all), ('stream', stream)):
+                elapsed, peak = run(function, Product.objects.all())
+                print(f"{size:>10} {name:>14} {elapsed:>9.2f} {peak:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
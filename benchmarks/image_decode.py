@@ -0,0 +1,127 @@
+"""
+Peak memory and time per image of the image processing functions against
+the full-resolution decoding they replaced.
+
+    uv run python -m benchmarks.image_decode --megapixels 12 24 48
+
+Every measurement runs in a fresh process and resets the kernel's RSS
+high-water mark first (Linux only), so the reported peak is the memory
+growth caused by processing that single image.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from PIL import Image, ImageDraw
+
+ASPECT_RATIO = 4 / 3
+
+
+def legacy_fit(image_path, size=(1200, 1200)):
+    img = Image.open(image_path)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    target = size[0]
+    scale = target / max(img.size)
+    new_size = (round(img.width * scale), round(img.height * scale))
+    img = img.resize(new_size, Image.Resampling.LANCZOS)
+    canvas = Image.new("RGB", size, (255, 255, 255))
+    canvas.paste(img, ((target - new_size[0]) // 2, (target - new_size[1]) // 2))
+    canvas.save(image_path, quality=90, optimize=True)
+
+
+def legacy_crop(image_path, size=(240, 240)):
+    img = Image.open(image_path)
+    width, height = img.size
+    side = min(width, height)
+    left, top = (width - side) / 2, (height - side) / 2
+    img = img.crop((left, top, left + side, top + side))
+    img = img.resize(size, Image.Resampling.LANCZOS)
+    img.save(image_path)
+
+
+def memory_status(field):
+    """A field of /proc/self/status, in MB."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) / 1024
+    raise KeyError(field)
+
+
+def reset_peak_memory():
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+
+
+def run(implementation, operation, source):
+    """Processes a copy of `source`; returns (seconds, peak RSS growth in MB)."""
+    from benchmarks.utils import setup
+
+    setup()
+    from honduras_shop_aggregator.image_utils import crop_image, process_image
+
+    functions = {
+        ('legacy', 'fit'): legacy_fit,
+        ('legacy', 'crop'): legacy_crop,
+        ('current', 'fit'): process_image,
+        ('current', 'crop'): crop_image,
+    }
+    path = f"{source}.{implementation}.{operation}.jpg"
+    shutil.copyfile(source, path)
+    reset_peak_memory()
+    baseline = memory_status('VmRSS')
+    start = time.perf_counter()
+    functions[implementation, operation](path)
+    elapsed = time.perf_counter() - start
+    peak = memory_status('VmHWM')
+    os.remove(path)
+    return elapsed, peak - baseline
+
+
+def synthetic_photo(path, megapixels):
+    """A JPEG with enough detail that it does not compress to nothing."""
+    height = round((megapixels * 1_000_000 / ASPECT_RATIO) ** 0.5)
+    width = round(height * ASPECT_RATIO)
+    img = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    draw = ImageDraw.Draw(img)
+    for x in range(0, width, 97):
+        draw.line((x, 0, width - x, height), fill=(x % 255, 90, 160), width=5)
+    img.save(path, quality=92)
+    return width, height
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--megapixels', type=int, nargs='+', default=[12, 24, 48]
+    )
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    context = get_context('spawn')
+    try:
+        print(f"{'input':>16} {'operation':>9} {'implementation':>14} "
+              f"{'ms':>8} {'peak MB':>8}")
+        for megapixels in args.megapixels:
+            source = os.path.join(folder, f"{megapixels}mp.jpg")
+            width, height = synthetic_photo(source, megapixels)
+            for operation in ('fit', 'crop'):
+                for implementation in ('legacy', 'current'):
+                    with ProcessPoolExecutor(1, mp_context=context) as pool:
+                        elapsed, peak = pool.submit(
+                            run, implementation, operation, source
+                        ).result()
+                    print(f"{f'{width}x{height}':>16} {operation:>9} "
+                          f"{implementation:>14} {elapsed * 1000:>8.0f} "
+                          f"{peak:>8.0f}")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Upload latency with in-request vs queued image processing, and the
+throughput of the image worker for several pool sizes.
+
+    uv run python -m benchmarks.image_jobs --uploads 40 --workers 0 2 4
+
+Uploads are the fixture images, optionally upscaled with --scale to
+resemble phone photos.
+"""
+import argparse
+import io
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.utils import create_catalog, test_database
+
+FIXTURE_IMAGES = ['test_img_to_crop.jpg', 'test_img_new.jpg']
+IMAGE_PATH = 'honduras_shop_aggregator/static/images'
+
+
+def load_uploads(scale):
+    from PIL import Image
+
+    uploads = []
+    for name in FIXTURE_IMAGES:
+        with Image.open(os.path.join(IMAGE_PATH, name)) as img:
+            img = img.convert('RGB')
+            if scale != 1:
+                img = img.resize((img.width * scale, img.height * scale))
+            buffer = io.BytesIO()
+            img.save(buffer, format='JPEG', quality=90)
+            uploads.append((name, buffer.getvalue()))
+    return uploads
+
+
+def upload_all(products, uploads):
+    """Saves one upload per product; returns per-request latencies in ms."""
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    timings = []
+    for i, product in enumerate(products):
+        name, content = uploads[i % len(uploads)]
+        # Trailing bytes keep every upload distinct, so none is deduplicated.
+        content += f"{time.perf_counter_ns()}".encode()
+        product.image = SimpleUploadedFile(name, content, 'image/jpeg')
+        start = time.perf_counter()
+        product.save()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def drain(workers):
+    from concurrent.futures import ProcessPoolExecutor
+    from contextlib import nullcontext
+
+    from honduras_shop_aggregator.images.jobs import claim_jobs, run_jobs
+
+    pool = ProcessPoolExecutor(workers) if workers else nullcontext()
+    done = 0
+    start = time.perf_counter()
+    with pool as executor:
+        while jobs := claim_jobs(20):
+            done += run_jobs(jobs, executor)
+    return done, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--uploads', type=int, default=40)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2, 4])
+    parser.add_argument('--scale', type=int, default=1)
+    args = parser.parse_args()
+
+    media_root = tempfile.mkdtemp()
+    try:
+        with test_database():
+            from django.test import override_settings
+
+            from honduras_shop_aggregator.products.models import Product
+
+            uploads = load_uploads(args.scale)
+            create_catalog(args.uploads)
+            products = list(Product.objects.order_by('pk')[:args.uploads])
+
+            with override_settings(
+                MEDIA_ROOT=media_root, IMAGE_PROCESSING_ASYNC=False
+            ):
+                sync = upload_all(products, uploads)
+            print(f"in-request processing: p50 {statistics.median(sync):.1f} ms, "
+                  f"p95 {statistics.quantiles(sync, n=20)[-1]:.1f} ms")
+            print(f"{'workers':>8} {'queued p50 ms':>14} {'images/s':>9}")
+            for workers in args.workers:
+                with override_settings(
+                    MEDIA_ROOT=media_root, IMAGE_PROCESSING_ASYNC=True
+                ):
+                    queued = upload_all(products, uploads)
+                    done, elapsed = drain(workers)
+                print(f"{workers:>8} {statistics.median(queued):>14.1f} "
+                      f"{done / elapsed:>9.1f}")
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Latency of a deep IndexView page: Python shuffle vs database shuffle.
+
+    uv run python -m benchmarks.index_shuffle --sizes 1000 10000 100000
+"""
+import argparse
+import random
+
+from benchmarks.utils import create_catalog, measure, test_database
+
+PAGE_SIZE = 24
+
+
+def python_shuffle(queryset, seed, page):
+    products = list(queryset.all())
+    random.Random(seed).shuffle(products)
+    return products[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+
+
+def database_shuffle(queryset, seed, page):
+    return list(queryset.shuffled(seed)[(page - 1) * PAGE_SIZE:page * PAGE_SIZE])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[1000, 10000, 100000]
+    )
+    parser.add_argument('--page', type=int, default=10)
+    args = parser.parse_args()
+
+    with test_database():
+        from honduras_shop_aggregator.products.models import Product
+
+        print(f"{'products':>10} {'python ms':>12} {'database ms':>12}")
+        created = 0
+        for size in sorted(args.sizes):
+            create_catalog(size - created)
+            created = size
+            queryset = Product.objects.visible()
+            python_ms = measure(
+                lambda: python_shuffle(queryset, 7, args.page), repeat=3
+            )
+            database_ms = measure(
+                lambda: database_shuffle(queryset, 7, args.page)
+            )
+            print(f"{size:>10} {python_ms:>12.1f} {database_ms:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Latency of a deep "load more" page: OFFSET pagination with a COUNT against
+keyset pagination with a cursor.
+
+    uv run python -m benchmarks.keyset_pagination --sizes 20000 100000 --page 500
+
+Both read the grid queryset of ProductFilterView in its default order,
+newest first.
+"""
+import argparse
+
+from benchmarks.utils import create_catalog, measure, test_database
+
+PAGE_SIZE = 20
+
+
+def offset_page(queryset, page):
+    from django.core.paginator import Paginator
+
+    return list(Paginator(queryset, PAGE_SIZE).page(page))
+
+
+def keyset_page(paginator, cursor):
+    return list(paginator.page(cursor))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[20000, 100000]
+    )
+    parser.add_argument('--page', type=int, default=500)
+    args = parser.parse_args()
+
+    with test_database():
+        from honduras_shop_aggregator.pagination import KeysetPaginator
+        from honduras_shop_aggregator.products.models import Product
+
+        print(f"{'products':>10} {'page':>6} {'offset ms':>10} {'keyset ms':>10}")
+        created = 0
+        for size in sorted(args.sizes):
+            create_catalog(size - created)
+            created = size
+            queryset = Product.objects.visible().available_in(1).for_grid(1)
+            paginator = KeysetPaginator(queryset, PAGE_SIZE)
+            # The cursor the previous page would have handed out.
+            last = paginator.queryset[(args.page - 1) * PAGE_SIZE - 1]
+            cursor = paginator.encode(last)
+            assert (
+                [product.pk for product in keyset_page(paginator, cursor)]
+                == [product.pk for product in offset_page(queryset, args.page)]
+            )
+            offset_ms = measure(lambda: offset_page(queryset, args.page))
+            keyset_ms = measure(lambda: keyset_page(paginator, cursor))
+            print(f"{size:>10} {args.page:>6} {offset_ms:>10.1f} "
+                  f"{keyset_ms:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
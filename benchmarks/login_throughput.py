@@ -0,0 +1,97 @@
+"""
+Logins per second of the sign-in form's authentication, before and after
+EmailOrUsernameBackend, for each way a login can go.
+
+    uv run python -m benchmarks.login_throughput
+
+"two-pass" is the earlier form: ModelBackend with the login as a
+username, then an email__iexact lookup and ModelBackend again. A login
+by email or with a wrong password hashed the password twice there, so it
+took about twice as long as a login by username. "one-pass" is
+EmailOrUsernameBackend. Hashes counts the password hashes of a login.
+"""
+import argparse
+import time
+from unittest import mock
+
+from benchmarks.utils import test_database
+
+MODEL_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+ONE_PASS_BACKEND = 'honduras_shop_aggregator.users.backends.EmailOrUsernameBackend'
+
+
+def two_pass(username, password):
+    from django.contrib.auth import authenticate
+
+    from honduras_shop_aggregator.users.models import User
+
+    user = authenticate(username=username, password=password)
+    if user is None:
+        try:
+            user_obj = User.objects.get(email__iexact=username)
+            user = authenticate(username=user_obj.username, password=password)
+        except User.DoesNotExist:
+            pass
+    return user
+
+
+def one_pass(username, password):
+    from django.contrib.auth import authenticate
+
+    return authenticate(username=username, password=password)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logins', type=int, default=20)
+    parser.add_argument('--users', type=int, default=1000)
+    args = parser.parse_args()
+
+    with test_database():
+        from django.contrib.auth.hashers import get_hasher, make_password
+        from django.test import override_settings
+
+        from honduras_shop_aggregator.users.models import User
+
+        password = make_password('password')
+        User.objects.bulk_create(
+            User(
+                username=f'user{i}', email=f'user{i}@bench.test', password=password
+            )
+            for i in range(args.users)
+        )
+        logins = {
+            'username': ('user7', 'password'),
+            'email': ('USER7@bench.test', 'password'),
+            'wrong password': ('user7@bench.test', 'wrong'),
+            'unknown': ('nobody@bench.test', 'password'),
+        }
+        flows = (
+            ('two-pass', two_pass, MODEL_BACKEND),
+            ('one-pass', one_pass, ONE_PASS_BACKEND),
+        )
+        hasher = type(get_hasher())
+
+        print(
+            f"{'flow':<9} {'login':<15} {'logins/s':>9} {'ms':>8} {'hashes':>7}"
+        )
+        for flow_name, flow, backend in flows:
+            with override_settings(AUTHENTICATION_BACKENDS=[backend]):
+                for login_name, (username, password) in logins.items():
+                    with mock.patch.object(
+                        hasher, 'encode', autospec=True, side_effect=hasher.encode
+                    ) as encode:
+                        start = time.perf_counter()
+                        for _ in range(args.logins):
+                            flow(username, password)
+                        elapsed = time.perf_counter() - start
+                    print(
+                        f"{flow_name:<9} {login_name:<15} "
+                        f"{args.logins / elapsed:>9.1f} "
+                        f"{elapsed / args.logins * 1000:>8.1f} "
+                        f"{encode.call_count / args.logins:>7.0f}"
+                    )
+
+
+if __name__ == '__main__':
+    main()
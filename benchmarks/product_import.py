@@ -0,0 +1,79 @@
+"""
+Rows per second of the bulk product import against saving the same rows
+one Product.save at a time, as ProductFormCreateView does.
+
+    uv run python -m benchmarks.product_import --rows 1000 5000
+
+Half of the rows repeat a product name, so slug allocation has suffixes
+to find, and every row has two delivery cities.
+"""
+import argparse
+import io
+import time
+
+from benchmarks.utils import create_catalog, test_database
+
+NAMES = 50
+
+
+def catalog_csv(rows, offset):
+    lines = [
+        "product_name,category,product_price,stock_quantity,description,"
+        "delivery_cities\n"
+    ]
+    for i in range(offset, offset + rows):
+        name = f"Producto {i % NAMES}" if i % 2 else f"Producto único {i}"
+        lines.append(
+            f"{name},benchmark,{10 + i % 90}.50,{i % 7},"
+            f"Descripción del producto {i},Capital|Second City\n"
+        )
+    return "".join(lines).encode()
+
+
+def save_each(seller, content):
+    from honduras_shop_aggregator.products.imports import (ProductImporter,
+                                                           read_rows)
+
+    # The importer only validates here; every row is then saved on its own.
+    importer = ProductImporter(seller)
+    for line, row in read_rows(io.BytesIO(content), 'csv'):
+        _, product, delivery_cities, _ = importer.build(line, row)
+        product.save()
+        product.delivery_cities.set(delivery_cities)
+
+
+def import_bulk(seller, content):
+    from honduras_shop_aggregator.products.imports import (ProductImporter,
+                                                           read_rows)
+
+    ProductImporter(seller).run(read_rows(io.BytesIO(content), 'csv'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 5000])
+    args = parser.parse_args()
+
+    with test_database():
+        from honduras_shop_aggregator.cities.models import City
+
+        seller = create_catalog(1)
+        seller.city = City.objects.get(pk=1)
+        City.objects.get_or_create(name='Second City')
+        print(f"{'rows':>8} {'implementation':>14} {'seconds':>9} {'rows/s':>9}")
+        offset = 0
+        for rows in args.rows:
+            for implementation, function in (
+                ('save', save_each), ('bulk', import_bulk)
+            ):
+                content = catalog_csv(rows, offset)
+                offset += rows
+                start = time.perf_counter()
+                function(seller, content)
+                elapsed = time.perf_counter() - start
+                print(f"{rows:>8} {implementation:>14} {elapsed:>9.2f} "
+                      f"{rows / elapsed:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Latency of ProductFilter search: icontains scan vs the search index.
+
+    uv run python -m benchmarks.product_search --sizes 1000 10000 100000
+"""
+import argparse
+import random
+
+from benchmarks.utils import create_catalog, measure, test_database
+
+WORDS = (
+    "camisa zapatos bolso cuero algodon artesanal sombrero collar pulsera "
+    "plata bordado organico"
+).split()
+FILLER = [f"palabra{n}" for n in range(5000)]
+QUERIES = ["camisa", "cuero artesanal", "sombrero", "palabra4999"]
+
+
+def describe(i):
+    rng = random.Random(i)
+    words = [rng.choice(FILLER) for _ in range(40)]
+    words[rng.randrange(40)] = rng.choice(WORDS) if rng.random() < 0.05 else "x"
+    return " ".join(words)
+
+
+def ordered(queryset, value):
+    from django.db.models import Case, IntegerField, When
+
+    return list(queryset.annotate(
+        name_exact=Case(
+            When(product_name__iexact=value.strip(), then=1),
+            default=0,
+            output_field=IntegerField()
+        )
+    ).order_by('-name_exact', 'product_name').values_list('pk', flat=True)[:20])
+
+
+def icontains_search(value):
+    import re
+
+    from django.db.models import Q
+    from unidecode import unidecode
+
+    from honduras_shop_aggregator.products.models import Product
+
+    queryset = Product.objects.all()
+    normalized_value = unidecode(value.strip().lower())
+    for term in re.sub(r"[^\w\s]|_", " ", normalized_value).split():
+        queryset = queryset.filter(
+            Q(product_name__icontains=term) | Q(description__icontains=term)
+        )
+    return ordered(queryset, value)
+
+
+def indexed_search(value):
+    from honduras_shop_aggregator.products.models import Product
+    from honduras_shop_aggregator.products.search import (get_search_backend,
+                                                          search_terms)
+
+    queryset = get_search_backend().filter(
+        Product.objects.all(), search_terms(value)
+    )
+    return ordered(queryset, value)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[1000, 10000, 100000]
+    )
+    args = parser.parse_args()
+
+    with test_database():
+        print(f"{'products':>10} {'query':>16} {'icontains ms':>13} {'index ms':>10}")
+        created = 0
+        for size in sorted(args.sizes):
+            create_catalog(size - created, describe=describe)
+            created = size
+            for query in QUERIES:
+                scan_ms = measure(lambda: icontains_search(query))
+                index_ms = measure(lambda: indexed_search(query))
+                print(f"{size:>10} {query:>16} {scan_ms:>13.1f} {index_ms:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Anonymous request time of the product list with the response cache missed
+and hit.
+
+    uv run python -m benchmarks.response_cache
+
+"miss" drops the cached response before every request, so the view runs
+its queries and renders the page; "hit" serves the stored response.
+"""
+import argparse
+
+from benchmarks.utils import create_catalog, measure, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with test_database():
+        from django.test import Client, override_settings
+        from django.urls import reverse
+
+        from honduras_shop_aggregator.response_cache import invalidate
+
+        create_catalog(args.count)
+        client = Client()
+        url = reverse('product_list')
+
+        def request():
+            response = client.get(url)
+            assert response.status_code == 200
+            return response
+
+        def request_miss():
+            invalidate('products')
+            return request()
+
+        # The default locmem cache leaves the response cache off.
+        with override_settings(RESPONSE_CACHE_TIMEOUT=300):
+            miss_ms = measure(request_miss, repeat=args.repeat)
+            request()
+            hit_ms = measure(request, repeat=args.repeat)
+        print(f"{'products':>9} {'miss ms':>9} {'hit ms':>9}")
+        print(f"{args.count:>9} {miss_ms:>9.2f} {hit_ms:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
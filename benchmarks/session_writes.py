@@ -0,0 +1,105 @@
+"""
+Database writes and session-table reads per page view while browsing the
+catalog, anonymously and signed in, for each session engine.
+
+    uv run python -m benchmarks.session_writes
+
+Every visitor walks the same pages: the index and its next page, the
+product list and its next page, a category, a product card, a seller
+profile, a city switch and the index again. The response cache is off so
+that every view runs. Writes are INSERT, UPDATE and DELETE statements.
+"""
+import argparse
+
+from benchmarks.utils import create_catalog, test_database
+
+ENGINES = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+)
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--visits', type=int, default=20)
+    args = parser.parse_args()
+
+    with test_database():
+        from django.core.cache import cache
+        from django.db import connection
+        from django.test import Client, override_settings
+        from django.test.utils import CaptureQueriesContext
+        from django.urls import reverse
+
+        from honduras_shop_aggregator.cities.models import City
+        from honduras_shop_aggregator.products.models import Product
+        from honduras_shop_aggregator.users.models import User
+
+        seller = create_catalog(200)
+        City.objects.get_or_create(pk=2, defaults={'name': 'Second'})
+        product = Product.objects.first()
+        User.objects.create_user('visitor', 'visitor@bench.test', 'password')
+
+        def page(client, url, **data):
+            response = client.get(url, data)
+            assert response.status_code in (200, 302), url
+            return response
+
+        def visit(client):
+            views = 0
+            for url in (reverse('index'), reverse('product_list')):
+                response = page(client, url)
+                page(client, url, cursor=response.context['page_obj'].next_cursor)
+                views += 2
+            page(client, reverse('category_page', kwargs={
+                'slug': product.category.slug
+            }))
+            page(client, reverse('product_card', kwargs={'slug': product.slug}))
+            page(client, reverse('public_seller_profile', kwargs={
+                'store_name': seller.store_name
+            }))
+            page(client, reverse('set_city', kwargs={'city_pk': 2}))
+            page(client, reverse('set_city', kwargs={'city_pk': 1}))
+            page(client, reverse('index'))
+            return views + 6
+
+        print(
+            f"{'engine':<12} {'visitor':<10} {'views':>6} "
+            f"{'writes/view':>12} {'session reads/view':>19}"
+        )
+        for engine in ENGINES:
+            for signed_in in (False, True):
+                cache.clear()
+                with override_settings(
+                    SESSION_ENGINE=engine, RESPONSE_CACHE_TIMEOUT=0
+                ):
+                    views = writes = session_reads = 0
+                    for _ in range(args.visits):
+                        client = Client()
+                        if signed_in:
+                            client.post(reverse('login'), {
+                                'username': 'visitor', 'password': 'password'
+                            })
+                        with CaptureQueriesContext(connection) as queries:
+                            views += visit(client)
+                        statements = [query['sql'] for query in queries]
+                        writes += sum(
+                            sql.lstrip().upper().startswith(WRITES)
+                            for sql in statements
+                        )
+                        session_reads += sum(
+                            sql.startswith('SELECT')
+                            and 'FROM "django_session"' in sql
+                            for sql in statements
+                        )
+                print(
+                    f"{engine.rsplit('.', 1)[1]:<12} "
+                    f"{'signed in' if signed_in else 'anonymous':<10} "
+                    f"{views:>6} {writes / views:>12.2f} "
+                    f"{session_reads / views:>19.2f}"
+                )
+
+
+if __name__ == '__main__':
+    main()
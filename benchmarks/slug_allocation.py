@@ -0,0 +1,75 @@
+"""
+Creating many products with the same name: the exists() loop that probed
+one suffix per query against the single-query slug allocator.
+
+    uv run python -m benchmarks.slug_allocation --count 1000
+"""
+import argparse
+import time
+
+from django.utils.text import slugify
+
+from benchmarks.utils import create_catalog, test_database
+
+NAME = 'Camisa de algodón'
+
+
+def legacy_slug(model, name):
+    base_slug = slugify(name)
+    slug = base_slug
+    num = 1
+    while model.objects.filter(slug=slug).exists():
+        slug = f"{base_slug}-{num}"
+        num += 1
+    return slug
+
+
+def create_products(seller, count, implementation):
+    from honduras_shop_aggregator.products.models import Product
+
+    template = Product.objects.filter(seller=seller).first()
+    for _ in range(count):
+        product = Product(
+            seller=seller,
+            category=template.category,
+            origin_city=template.origin_city,
+            product_name=NAME,
+            product_price=10,
+        )
+        if implementation == 'legacy':
+            product.slug = legacy_slug(Product, NAME)
+        product.save()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=1000)
+    args = parser.parse_args()
+
+    with test_database():
+        from django.db import connection
+
+        from honduras_shop_aggregator.products.models import Product
+
+        seller = create_catalog(1)
+        print(f"{'implementation':>14} {'products':>9} {'total ms':>10} "
+              f"{'queries':>9} {'last slug':>24}")
+        for implementation in ('legacy', 'current'):
+            Product.objects.filter(product_name=NAME).delete()
+            queries = []
+
+            def count(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count):
+                start = time.perf_counter()
+                create_products(seller, args.count, implementation)
+                elapsed = time.perf_counter() - start
+            last = Product.objects.filter(product_name=NAME).latest('pk').slug
+            print(f"{implementation:>14} {args.count:>9} "
+                  f"{elapsed * 1000:>10.0f} {len(queries):>9} {last:>24}")
+
+
+if __name__ == '__main__':
+    main()
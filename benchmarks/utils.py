@@ -0,0 +1,94 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Each benchmark runs against a throwaway test database created from the
+configured DATABASE_URL, so it never touches real data:
+
+    uv run python -m benchmarks.index_shuffle
+"""
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup():
+    os.environ.setdefault(
+        'DJANGO_SETTINGS_MODULE', 'honduras_shop_aggregator.settings'
+    )
+    django.setup()
+
+
+@contextmanager
+def test_database(fixtures=()):
+    """Creates a migrated test database and destroys it on exit."""
+    setup()
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test.utils import (setup_test_environment,
+                                   teardown_test_environment)
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        if fixtures:
+            call_command('loaddata', *fixtures, verbosity=0)
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(func, repeat=5):
+    """Returns the median wall time of func() in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def create_catalog(count, batch_size=5000, describe=None, **fields):
+    """
+    Bulk-creates count visible products owned by a single seller.
+
+    describe(i), when given, returns the description of the i-th product.
+    """
+    from honduras_shop_aggregator.categories.models import Category
+    from honduras_shop_aggregator.cities.models import City
+    from honduras_shop_aggregator.products.models import Product
+    from honduras_shop_aggregator.sellers.models import Seller
+    from honduras_shop_aggregator.users.models import User
+
+    city, _ = City.objects.get_or_create(pk=1, defaults={'name': 'Capital'})
+    category, _ = Category.objects.get_or_create(name='benchmark')
+    user, _ = User.objects.get_or_create(
+        username='benchmark', defaults={'email': 'benchmark@bench.test'}
+    )
+    seller = Seller.objects.filter(user=user).first() or Seller.objects.create(
+        user=user,
+        store_name='benchmark',
+        website='https://benchmark.test',
+        is_verified=True,
+    )
+    offset = Product.objects.count()
+    for start in range(0, count, batch_size):
+        Product.objects.bulk_create(
+            Product(
+                seller=seller,
+                category=category,
+                origin_city=city,
+                product_name=f'benchmark product {offset + i}',
+                slug=f'benchmark-product-{offset + i}',
+                product_price=10,
+                stock_quantity=5,
+                description=describe(offset + i) if describe else '',
+                **fields,
+            )
+            for i in range(start, min(start + batch_size, count))
+        )
+    return seller
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CategoriesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'honduras_shop_aggregator.categories'
+
+    def ready(self):
+        import honduras_shop_aggregator.categories.signals  # noqa: F401
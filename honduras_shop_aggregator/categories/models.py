@@ -1,7 +1,8 @@
 from django.db import models
-from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 
+from honduras_shop_aggregator.slugs import save_with_slug
+
 
 class Category(models.Model):
 
@@ -19,7 +20,9 @@ class Category(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.name)
+            return save_with_slug(
+                self, lambda: self.save(*args, **kwargs), self.name
+            )
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -1,4 +1,6 @@
+from django.db import connection
 from django.db.models import ProtectedError
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.translation import gettext as _
 
@@ -70,18 +72,19 @@ class TestCategoryListRead(BaseTestCase):
         self.user = User.objects.get(pk=1)
         self.category = Category.objects.get(pk=1)
         self.other_category = Category.objects.get(pk=2)
+        # Visitors who have not picked a city see the capital's counts.
         self.product_count_first_category = Product.objects.filter(
             category=1,
             is_active=True,
             stock_quantity__gt=0,
             is_deleted=False
-        ).count()
+        ).available_in(1).count()
         self.product_count_second_category = Product.objects.filter(
             category=2,
             is_active=True,
             stock_quantity__gt=0,
             is_deleted=False
-        ).count()
+        ).available_in(1).count()
 
     def test_read_category_list_unauthorized(self):
         response = self.client.get(
@@ -114,6 +117,32 @@ class TestCategoryListRead(BaseTestCase):
         self.assertContains(response, self.category.name)
         self.assertContains(response, self.other_category.name)
 
+    def test_counts_follow_selected_city(self):
+        self.client.get(reverse('set_city', kwargs={'city_pk': 2}))
+        response = self.client.get(reverse('category_list'))
+        counts = {
+            category.pk: category.product_count
+            for category in response.context['categories']
+        }
+        expected = Product.objects.filter(
+            is_active=True,
+            stock_quantity__gt=0,
+            is_deleted=False
+        ).available_in(2)
+        self.assertEqual(counts[1], expected.filter(category=1).count())
+        self.assertEqual(counts[2], expected.filter(category=2).count())
+
+    def test_query_count_does_not_grow_with_categories(self):
+        self.client.get(reverse('category_list'))
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(reverse('category_list'))
+        for i in range(10):
+            Category.objects.create(name=f"Extra category {i}")
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(reverse('category_list'))
+        self.assertContains(response, "Extra category 9")
+        self.assertEqual(len(after), len(before))
+
     def test_read_category_list_empty(self):
         Product.objects.all().delete()
         Category.objects.all().delete()
@@ -132,3 +161,12 @@ class TestCategoryProtect(BaseTestCase):
         self.assertEqual(self.product.category, self.category)
         with self.assertRaises(ProtectedError):
             self.category.delete()
+
+
+class TestCategorySlug(BaseTestCase):
+
+    def test_duplicate_names_get_suffixed_slugs(self):
+        first = Category.objects.create(name='Ropa y Calzado')
+        second = Category.objects.create(name='Ropa  y calzado')
+        self.assertEqual(first.slug, 'ropa-y-calzado')
+        self.assertEqual(second.slug, 'ropa-y-calzado-1')
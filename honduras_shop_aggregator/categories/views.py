@@ -1,14 +1,16 @@
 from django.contrib.messages.views import SuccessMessageMixin
-from django.db.models import Q
-from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
-from django.template.loader import render_to_string
 from django.views.generic import ListView
 from django_filters.views import FilterView
 
 from honduras_shop_aggregator.categories.models import Category
+from honduras_shop_aggregator.likedproducts.liked_set import LikedSet
+from honduras_shop_aggregator.pagination import (KeysetPaginationMixin,
+                                                 load_more_response)
 from honduras_shop_aggregator.products.filters import ProductFilter
 from honduras_shop_aggregator.products.models import Product
+from honduras_shop_aggregator.response_cache import (
+    CATALOG_TAGS, AnonymousResponseCacheMixin)
 
 
 class CategoryListView(SuccessMessageMixin, ListView):
@@ -18,30 +20,25 @@ class CategoryListView(SuccessMessageMixin, ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        city_pk = self.request.session.get('city_pk')
+        products = Product.objects.visible().available_in(
+            self.request.visitor.city_pk
+        )
+        product_counts = products.count_by_category()
         for category in context['categories']:
-            products = Product.objects.filter(
-                category=category,
-                is_active=True,
-                stock_quantity__gt=0,
-                is_deleted=False
-            )
-            if city_pk:
-                products = products.filter(
-                    Q(origin_city=city_pk) | Q(delivery_cities=city_pk)
-                )
-            category.product_count = products.distinct().count()
+            category.product_count = product_counts.get(category.pk, 0)
         return context
 
 
 class CategoryPageView(
-    SuccessMessageMixin, FilterView
+    AnonymousResponseCacheMixin, KeysetPaginationMixin, SuccessMessageMixin,
+    FilterView
 ):
     model = Product
     template_name = 'pages/categories/category_page.html'
     context_object_name = 'products'
     filterset_class = ProductFilter
     paginate_by = 20
+    cache_tags = CATALOG_TAGS
 
     def get_filterset_kwargs(self, filterset_class):
         kwargs = super().get_filterset_kwargs(filterset_class)
@@ -50,48 +47,22 @@ class CategoryPageView(
 
     def get_queryset(self, **kwargs):
         category_slug = self.kwargs.get("slug")
-        city_pk = self.request.session.get('city_pk')
-        products = Product.objects.filter(
-            category__slug=category_slug,
-            is_active=True,
-            stock_quantity__gt=0,
-            is_deleted=False
-        )
-        if city_pk:
-            products = products.filter(
-                Q(origin_city=city_pk) | Q(delivery_cities=city_pk)
-            ).distinct()
-        return products
+        city_pk = self.request.visitor.city_pk
+        products = Product.objects.visible().filter(category__slug=category_slug)
+        return products.available_in(city_pk).for_grid(city_pk)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["category"] = get_object_or_404(Category, slug=self.kwargs.get("slug"))
-        products = context['products']
-        if self.request.user.is_authenticated:
-            liked_ids = self.request.user.likes.values_list("product_id", flat=True)
-            for product in products:
-                product.is_liked = product.pk in liked_ids
-        else:
-            liked_products = self.request.session.get('liked_products', [])
-            for product in products:
-                product.is_liked = product.pk in liked_products
+        LikedSet.for_request(self.request, context['products']).mark(
+            context['products']
+        )
         return context
 
     def render_to_response(self, context, **response_kwargs):
         """Return JSON if AJAX, otherwise full page."""
-        request = self.request
-        if request.headers.get("x-requested-with") == "XMLHttpRequest":
-            html = render_to_string(
-                "partials/_product_grid.html", 
-                {"products": context["products"], "request": request},
-                request=request
+        if self.request.headers.get("x-requested-with") == "XMLHttpRequest":
+            return load_more_response(
+                self.request, context["page_obj"], "partials/_product_grid.html"
             )
-            page_obj = context["page_obj"]
-            return JsonResponse({
-                "html": html,
-                "has_next": page_obj.has_next(),
-                "next_page": (
-                    page_obj.next_page_number() if page_obj.has_next() else None
-                )
-            })
         return super().render_to_response(context, **response_kwargs)
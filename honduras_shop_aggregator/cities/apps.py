@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CitiesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'honduras_shop_aggregator.cities'
+
+    def ready(self):
+        import honduras_shop_aggregator.cities.signals  # noqa: F401
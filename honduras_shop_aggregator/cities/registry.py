@@ -0,0 +1,82 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from honduras_shop_aggregator import cache_url
+from honduras_shop_aggregator.cities.models import City
+
+CAPITAL_CITY_PK = 1
+VERSION_CACHE_KEY = 'cities:registry:version'
+# Seconds a snapshot is used for when the cache is not shared between
+# processes, so a change made in another one shows up after that long.
+UNSHARED_SNAPSHOT_TTL = 60
+
+
+class CityRegistry:
+    """
+    In-process snapshot of every city, ordered by name.
+
+    Loaded on first use and dropped when a city is saved or deleted. The
+    snapshot version is also kept in the default cache, so with a shared
+    cache backend the other workers reload on their next lookup. Without
+    one they reload every UNSHARED_SNAPSHOT_TTL seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cities = None
+        self._version = None
+        self._expires = None
+
+    def _snapshot(self):
+        version = cache.get(VERSION_CACHE_KEY)
+        cities = self._cities
+        expires = self._expires
+        if (
+            cities is not None
+            and version == self._version
+            and (expires is None or time.monotonic() < expires)
+        ):
+            return cities
+        with self._lock:
+            if version is None:
+                version = uuid.uuid4().hex
+                cache.add(VERSION_CACHE_KEY, version, timeout=None)
+                version = cache.get(VERSION_CACHE_KEY, version)
+            cities = {city.pk: city for city in City.objects.order_by('name')}
+            self._cities = cities
+            self._version = version
+            self._expires = (
+                None if cache_url.is_shared(settings.CACHES['default'])
+                else time.monotonic() + UNSHARED_SNAPSHOT_TTL
+            )
+        return cities
+
+    def all(self):
+        return list(self._snapshot().values())
+
+    def get(self, pk):
+        """Returns the city with this pk, or None if there is no such city."""
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            return None
+        return self._snapshot().get(pk)
+
+    def capital(self):
+        city = self.get(CAPITAL_CITY_PK)
+        if city is None:
+            raise City.DoesNotExist("The capital city is missing.")
+        return city
+
+    def invalidate(self):
+        with self._lock:
+            self._cities = None
+            self._version = None
+        cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+
+
+city_registry = CityRegistry()
@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from honduras_shop_aggregator.cities.models import City
+from honduras_shop_aggregator.cities.registry import city_registry
+from honduras_shop_aggregator.response_cache import invalidate
+
+
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+def invalidate_city_registry(sender, **kwargs):
+    city_registry.invalidate()
+    # A lookup before the commit reloads the rows from before the change.
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(city_registry.invalidate)
+
+
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+def invalidate_city_pages(sender, **kwargs):
+    invalidate('cities')
@@ -1,11 +1,21 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
 from django.db.models import ProtectedError
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.translation import gettext as _
 
 from honduras_shop_aggregator.cities.models import City
+from honduras_shop_aggregator.cities.registry import (UNSHARED_SNAPSHOT_TTL,
+                                                      VERSION_CACHE_KEY,
+                                                      city_registry)
 from honduras_shop_aggregator.products.models import Product
 from honduras_shop_aggregator.users.models import User
 from honduras_shop_aggregator.utils import BaseTestCase
+from honduras_shop_aggregator.visitor import CITY_COOKIE
 
 
 class TestDefaultSessionCity(BaseTestCase):
@@ -16,13 +26,15 @@ class TestDefaultSessionCity(BaseTestCase):
 
     def test_default_city_fallback_anonymous(self):
         response = self.client.get(reverse('index'))
-        self.assertEqual(self.client.session.get('city_pk'), 1)
+        # The capital is the default, so no cookie is needed for it.
+        self.assertEqual(self.visitor_cookie(CITY_COOKIE), [])
         self.assertContains(response, 'Capital')
 
     def test_default_city_fallback_user_without_preferred_city(self):
         self.login_user(self.user_without_city)
         response = self.client.get(reverse('index'))
-        self.assertEqual(self.client.session.get('city_pk'), 1)
+        # The capital is the default, so no cookie is needed for it.
+        self.assertEqual(self.visitor_cookie(CITY_COOKIE), [])
         self.assertContains(response, 'Capital')
 
     def test_default_city_for_user_with_preferred_city(self):
@@ -35,7 +47,7 @@ class TestDefaultSessionCity(BaseTestCase):
             follow=True,
         )
         response = self.client.get(reverse('index'))
-        self.assertEqual(self.client.session.get('city_pk'), 2)
+        self.assertEqual(self.visitor_cookie(CITY_COOKIE), [2])
         self.assertContains(response, 'Second City')
 
 
@@ -50,14 +62,14 @@ class TestSetCity(BaseTestCase):
             kwargs={'city_pk': 2}),
             follow=True
         )
-        self.assertEqual(self.client.session.get('city_pk'), 2)
+        self.assertEqual(self.visitor_cookie(CITY_COOKIE), [2])
         self.assertContains(response, 'Second City')
         response2 = self.client.get(reverse(
             'set_city',
             kwargs={'city_pk': 1}),
             follow=True
         )
-        self.assertEqual(self.client.session.get('city_pk'), 1)
+        self.assertEqual(self.visitor_cookie(CITY_COOKIE), [1])
         self.assertContains(response2, 'Capital')
 
     def test_set_city_with_toggle_authorized(self):
@@ -67,7 +79,7 @@ class TestSetCity(BaseTestCase):
             kwargs={'city_pk': 2}),
             follow=True
         )
-        self.assertEqual(self.client.session.get('city_pk'), 2)
+        self.assertEqual(self.visitor_cookie(CITY_COOKIE), [2])
         self.assertContains(response, 'Second City')
 
 class TestFilterProductsByCity(BaseTestCase):
@@ -116,7 +128,7 @@ class TestFilterProductsByCity(BaseTestCase):
             )
         )
         print(self.product_from_capital_with_delivery.origin_city.pk)
-        print(self.client.session.get('city_pk'))
+        print(self.visitor_cookie(CITY_COOKIE))
         self.assertContains(response2, _('Delivery from'))
         response3 = self.client.get(
             reverse(
@@ -164,3 +176,114 @@ class TestCityProtect(BaseTestCase):
         self.assertEqual(self.user_2.preferred_delivery_city, self.city_2)
         with self.assertRaises(ProtectedError):
             self.city_2.delete()
+
+
+class TestCityRegistry(BaseTestCase):
+
+    def setUp(self):
+        self.user = User.objects.get(pk=1)
+        self.user_with_city = User.objects.get(username='userwithpreferredcity')
+        city_registry.invalidate()
+        city_registry.all()
+
+    def city_queries(self, request, *args, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = request(*args, **kwargs)
+        return response, [
+            query["sql"] for query in queries
+            if 'FROM "cities_city"' in query["sql"]
+        ]
+
+    def test_index_renders_without_city_queries(self):
+        Product.objects.update(is_active=False)
+        response, queries = self.city_queries(self.client.get, reverse('index'))
+        self.assertContains(response, 'Capital')
+        self.assertContains(response, 'Second City')
+        self.assertEqual(queries, [])
+
+    def test_ajax_page_renders_without_city_queries(self):
+        Product.objects.update(is_active=False)
+        response, queries = self.city_queries(
+            self.client.get,
+            reverse('product_list'),
+            {"page": 1},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_form_page_renders_without_city_queries(self):
+        response, queries = self.city_queries(self.client.get, reverse('login'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_set_city_without_city_queries(self):
+        response, queries = self.city_queries(
+            self.client.get, reverse('set_city', kwargs={'city_pk': 2})
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.visitor_cookie(CITY_COOKIE), [2])
+        self.assertEqual(queries, [])
+
+    def test_set_nonexistent_city(self):
+        response = self.client.get(reverse('set_city', kwargs={'city_pk': 999}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_login_without_city_queries(self):
+        response, queries = self.city_queries(
+            self.client.post,
+            reverse('login'),
+            {
+                'username': self.user_with_city.username,
+                'password': 'correct_password',
+            }
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.visitor_cookie(CITY_COOKIE), [2])
+        self.assertEqual(queries, [])
+
+    def test_user_update_queries_city_only_for_form_field(self):
+        self.login_user(self.user)
+        response, queries = self.city_queries(
+            self.client.post,
+            reverse('user_update', kwargs={'username': self.user.username}),
+            {
+                'username': self.user.username,
+                'first_name': 'John',
+                'last_name': 'Smith',
+                'email': 'john@email.com',
+                'preferred_delivery_city': 2,
+                'password_confirm': 'correct_password',
+            }
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.visitor_cookie(CITY_COOKIE), [2])
+        # The choice field lookup and the model's foreign key check, both
+        # part of form validation; setting the city cookie itself is free.
+        self.assertEqual(len(queries), 2)
+
+    def test_registry_reloads_after_city_change(self):
+        city = City.objects.get(pk=2)
+        city.name = 'Renamed City'
+        city.save()
+        self.assertEqual(city_registry.get(2).name, 'Renamed City')
+        new_city = City.objects.create(name='New City')
+        self.assertEqual(city_registry.get(new_city.pk), new_city)
+        new_city.delete()
+        self.assertIsNone(city_registry.get(new_city.pk))
+
+    def test_lookup_before_the_commit_is_invalidated(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            City.objects.create(name='New City')
+            # Another request loads the cities before the save commits.
+            city_registry.all()
+            version = cache.get(VERSION_CACHE_KEY)
+        self.assertNotEqual(cache.get(VERSION_CACHE_KEY), version)
+
+    def test_registry_without_shared_cache_reloads_periodically(self):
+        # Added by another process, whose invalidation this one never sees.
+        new_city, = City.objects.bulk_create([City(name='New City')])
+        self.assertIsNone(city_registry.get(new_city.pk))
+        later = time.monotonic() + UNSHARED_SNAPSHOT_TTL + 1
+        with mock.patch('time.monotonic', return_value=later):
+            self.assertEqual(city_registry.get(new_city.pk), new_city)
@@ -1,8 +1,9 @@
 import hashlib
+import math
 
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext as _
-from PIL import Image
+from PIL import ExifTags, Image, ImageOps
 
 
 def validate_image(image):
@@ -29,9 +30,61 @@ def image_upload_path(instance, filename):
     return f"{folder}/{name}.{extension.lower()}"
 
 
-def get_file_hash(file_path):
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def get_file_hash(file_path, salt=''):
+    """md5 of the file, read in chunks so large uploads stay out of memory."""
+    digest = hashlib.md5(salt.encode())
     with open(file_path, 'rb') as f:
-        return hashlib.md5(f.read()).hexdigest()
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Declared resolution an upload may have, and resolution it may be decoded
+# at. JPEGs decode at a fraction of their size, other formats in full.
+MAX_IMAGE_PIXELS = 100_000_000
+MAX_DECODED_PIXELS = 25_000_000
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def open_image(image_path, size, cover=False):
+    """
+    Opens an image decoded at the smallest scale that still gives `size`.
+
+    JPEGs are decoded at 1/2, 1/4 or 1/8 of their resolution when that
+    is enough (draft mode), so a 50 megapixel photo is never held in
+    memory at full size. `cover` asks for the shortest side to fill the
+    size, as a crop needs, instead of the longest. The EXIF orientation
+    is applied and all metadata is dropped.
+    """
+    with Image.open(image_path) as source:
+        width, height = source.size
+        if width * height > MAX_IMAGE_PIXELS:
+            raise ValidationError(_("Image resolution is too large."))
+        orientation = source.getexif().get(ExifTags.Base.Orientation)
+        if orientation in TRANSPOSED_ORIENTATIONS:
+            oriented_width, oriented_height = height, width
+        else:
+            oriented_width, oriented_height = width, height
+        scale = (max if cover else min)(
+            size[0] / oriented_width, size[1] / oriented_height
+        )
+        if scale < 1:
+            source.draft(
+                source.mode, (math.ceil(width * scale), math.ceil(height * scale))
+            )
+        if source.width * source.height > MAX_DECODED_PIXELS:
+            raise ValidationError(_("Image resolution is too large."))
+        img = ImageOps.exif_transpose(source)
+    img.info = {}
+    return img
+
+
+def resize_image(img, size):
+    """LANCZOS resize that first shrinks by whole factors when it can."""
+    return img.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
 
 
 def process_image(image_path, size=(1200, 1200)):
@@ -44,19 +97,16 @@ def process_image(image_path, size=(1200, 1200)):
     Remaining space is filled with white.
     """
     try:
-        img = Image.open(image_path)
-        if img.mode not in ("RGB", "L"):
-            img = img.convert("RGB")
-        target = size[0]
-        width, height = img.size
-        longest_side = max(width, height)
-        scale = target / longest_side
-        new_width = round(width * scale)
-        new_height = round(height * scale)
-        img = img.resize(
-            (new_width, new_height),
-            Image.Resampling.LANCZOS,
-        )
+        with open_image(image_path, size) as img:
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            target = size[0]
+            width, height = img.size
+            longest_side = max(width, height)
+            scale = target / longest_side
+            new_width = round(width * scale)
+            new_height = round(height * scale)
+            img = resize_image(img, (new_width, new_height))
         canvas = Image.new(
             "RGB",
             size,
@@ -70,7 +120,30 @@ def process_image(image_path, size=(1200, 1200)):
             quality=90,
             optimize=True
         )
+    except ValidationError:
+        raise
     except Exception as e:
         raise ValidationError(
             _("Image processing failed") + f": {e}"
-        )
\ No newline at end of file
+        )
+
+
+def crop_image(image_path, size=(240, 240)):
+    """Crops the centered square of the image and scales it to the size."""
+    try:
+        with open_image(image_path, size, cover=True) as img:
+            width, height = img.size
+            min_side = min(width, height)
+            left = (width - min_side) // 2
+            top = (height - min_side) // 2
+            img = img.resize(
+                size,
+                Image.Resampling.LANCZOS,
+                box=(left, top, left + min_side, top + min_side),
+                reducing_gap=3.0,
+            )
+        img.save(image_path)
+    except ValidationError:
+        raise
+    except Exception as e:
+        raise ValidationError(_("Image processing failed") + f": {e}")
@@ -0,0 +1,26 @@
+from django.contrib import admin
+
+from .models import ImageJob, StoredImage
+
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'source', 'operation', 'status', 'attempts', 'created_at', 'finished_at'
+    )
+    list_filter = ('status', 'operation')
+    search_fields = ('source', 'target', 'url')
+    readonly_fields = [field.name for field in ImageJob._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(StoredImage)
+class StoredImageAdmin(admin.ModelAdmin):
+    list_display = ('name', 'refcount', 'size', 'created_at', 'released_at')
+    search_fields = ('name',)
+    readonly_fields = [field.name for field in StoredImage._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
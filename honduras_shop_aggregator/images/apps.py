@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class ImagesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'honduras_shop_aggregator.images'
+
+    def ready(self):
+        from honduras_shop_aggregator.images.signals import connect_signals
+
+        connect_signals()
@@ -0,0 +1,69 @@
+import os
+
+from django.db import models
+from django.db.models.fields.files import ImageFieldFile
+from django.templatetags.static import static
+
+from honduras_shop_aggregator.images.models import OPERATION_FIT
+from honduras_shop_aggregator.images.renditions import PRODUCT_RENDITIONS
+
+PENDING_PREFIX = 'pending/'
+DEFAULT_PENDING_PLACEHOLDER = 'images/placeholder.jpg'
+
+
+def is_pending(name):
+    return bool(name) and name.startswith(PENDING_PREFIX)
+
+
+class ProcessedImageFieldFile(ImageFieldFile):
+
+    @property
+    def is_pending(self):
+        return is_pending(self.name)
+
+    @property
+    def url(self):
+        if self.is_pending:
+            return static(self.field.pending_placeholder)
+        return super().url
+
+
+class ProcessedImageField(models.ImageField):
+    """
+    ImageField whose uploads may still be waiting for the image worker.
+
+    While an upload is pending its url is the static placeholder, so
+    templates never serve the raw, unprocessed file. `operation` names
+    the pipeline operation uploads go through and `renditions` maps size
+    names to the widths generated for the {% picture %} tag.
+    """
+
+    attr_class = ProcessedImageFieldFile
+
+    def __init__(
+        self,
+        *args,
+        operation=OPERATION_FIT,
+        pending_placeholder=DEFAULT_PENDING_PLACEHOLDER,
+        renditions=None,
+        **kwargs
+    ):
+        self.operation = operation
+        self.pending_placeholder = pending_placeholder
+        self.renditions = renditions or PRODUCT_RENDITIONS
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.operation != OPERATION_FIT:
+            kwargs['operation'] = self.operation
+        if self.pending_placeholder != DEFAULT_PENDING_PLACEHOLDER:
+            kwargs['pending_placeholder'] = self.pending_placeholder
+        if self.renditions != PRODUCT_RENDITIONS:
+            kwargs['renditions'] = self.renditions
+        return name, path, args, kwargs
+
+    def is_placeholder(self, name):
+        """Shared placeholder files, which are never processed or deleted."""
+        stem = os.path.splitext(os.path.basename(name))[0]
+        return name == self.default or stem == 'placeholder'
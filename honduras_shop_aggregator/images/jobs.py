@@ -0,0 +1,326 @@
+import http.client
+import ipaddress
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+from urllib.request import (HTTPDefaultErrorHandler, HTTPErrorProcessor,
+                            HTTPHandler, HTTPRedirectHandler, HTTPSHandler,
+                            OpenerDirector, Request)
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.validators import URLValidator
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from honduras_shop_aggregator.images.fields import PENDING_PREFIX
+from honduras_shop_aggregator.images.models import (OPERATION_RENDITIONS,
+                                                    STATUS_DONE, STATUS_FAILED,
+                                                    STATUS_PENDING,
+                                                    STATUS_PROCESSING,
+                                                    ImageJob)
+from honduras_shop_aggregator.images.pipeline import (map_files, process_file,
+                                                      render_file)
+from honduras_shop_aggregator.images.signals import image_swapped
+from honduras_shop_aggregator.images.store import (acquire, discard, release,
+                                                   store, upload_key)
+
+MAX_ATTEMPTS = 3
+FETCH_WORKERS = 8
+FETCH_TIMEOUT = 10
+MAX_FETCH_SIZE = 15 * 1024 * 1024
+FETCH_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+FETCH_SCHEMES = ('http', 'https')
+
+
+def is_public_address(address):
+    """
+    Whether an IP address is on the internet, not loopback, private,
+    link-local (such as the cloud metadata endpoint) or reserved.
+    """
+    ip = ipaddress.ip_address(address.split('%')[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def validate_fetch_url(url):
+    """
+    Raises ValidationError unless `url` is an http(s) url whose host is not
+    an address of this server or of its network.
+
+    Host names are resolved when the worker connects, which checks the
+    address it actually connects to, redirects included.
+    """
+    URLValidator(schemes=FETCH_SCHEMES)(url)
+    host = urlsplit(url).hostname or ''
+    try:
+        public = is_public_address(host)
+    except ValueError:
+        public = host != 'localhost' and not host.endswith('.localhost')
+    if not public:
+        raise ValidationError(
+            _("Images can't be fetched from %(host)s.") % {'host': host},
+            code='invalid'
+        )
+
+
+class PublicConnectionMixin:
+    """Refuses a connection that resolved to a non-public address."""
+
+    def connect(self):
+        super().connect()
+        address = self.sock.getpeername()[0]
+        if not is_public_address(address):
+            self.sock.close()
+            raise OSError(f"Refused to connect to {address}")
+
+
+class PublicHTTPConnection(PublicConnectionMixin, http.client.HTTPConnection):
+    pass
+
+
+class PublicHTTPSConnection(PublicConnectionMixin, http.client.HTTPSConnection):
+    pass
+
+
+class PublicHTTPHandler(HTTPHandler):
+
+    def http_open(self, req):
+        return self.do_open(PublicHTTPConnection, req)
+
+
+class PublicHTTPSHandler(HTTPSHandler):
+
+    def https_open(self, req):
+        return self.do_open(PublicHTTPSConnection, req, context=self._context)
+
+
+def fetch_opener():
+    """
+    An opener for http(s) only, with no proxies, that connects to public
+    addresses only. Redirects to other schemes fail.
+    """
+    opener = OpenerDirector()
+    for handler in (
+        PublicHTTPHandler(), PublicHTTPSHandler(), HTTPRedirectHandler(),
+        HTTPDefaultErrorHandler(), HTTPErrorProcessor(),
+    ):
+        opener.add_handler(handler)
+    return opener
+
+
+def requeue_stale_jobs(older_than=timedelta(minutes=10)):
+    """Hands back jobs whose worker died while processing them."""
+    return ImageJob.objects.filter(
+        status=STATUS_PROCESSING,
+        started_at__lt=timezone.now() - older_than
+    ).update(status=STATUS_PENDING, claimed_by='')
+
+
+def claim_jobs(limit):
+    """Marks up to `limit` pending jobs as taken by this worker."""
+    pks = list(
+        ImageJob.objects.filter(status=STATUS_PENDING)
+        .order_by('created_at', 'pk')
+        .values_list('pk', flat=True)[:limit]
+    )
+    if not pks:
+        return []
+    return claim(pks)
+
+
+def claim(pks):
+    """Marks the jobs of `pks` still pending as taken by this worker."""
+    token = uuid.uuid4().hex
+    ImageJob.objects.filter(pk__in=pks, status=STATUS_PENDING).update(
+        status=STATUS_PROCESSING,
+        claimed_by=token,
+        started_at=timezone.now()
+    )
+    return list(
+        ImageJob.objects.filter(claimed_by=token, status=STATUS_PROCESSING)
+        .select_related('content_type')
+        .order_by('created_at', 'pk')
+    )
+
+
+def finish_job(job, name, error):
+    job.attempts += 1
+    job.finished_at = timezone.now()
+    if error:
+        job.error = error
+        job.status = (
+            STATUS_FAILED if job.attempts >= MAX_ATTEMPTS else STATUS_PENDING
+        )
+        job.claimed_by = ''
+        job.save()
+        return False
+
+    store(job.source, name)
+    model = job.content_type.model_class()
+    swapped = model._base_manager.filter(
+        pk=job.object_id, **{job.field_name: job.source}
+    ).update(**{job.field_name: name})
+    if swapped:
+        discard(job.replaces)
+        image_swapped.send(sender=model, pks=[job.object_id])
+    else:
+        # The object was deleted or got a newer upload in the meantime.
+        release(name)
+    job.status = STATUS_DONE
+    job.error = ''
+    job.save()
+    return True
+
+
+def finish_renditions(job, error):
+    """
+    Finishes a rendition job; the pages showing its image are invalidated
+    so that they pick up the renditions.
+    """
+    if error:
+        return finish_job(job, None, error)
+    model = job.content_type.model_class()
+    pks = list(
+        model._base_manager.filter(**{job.field_name: job.target})
+        .values_list('pk', flat=True)
+    )
+    if pks:
+        image_swapped.send(sender=model, pks=pks)
+    job.attempts += 1
+    job.finished_at = timezone.now()
+    job.status = STATUS_DONE
+    job.error = ''
+    job.save()
+    return True
+
+
+def download(url):
+    """Returns (content, error) for an image url."""
+    try:
+        validate_fetch_url(url)
+    except ValidationError as e:
+        return None, f"Download failed: {' '.join(e.messages)}"
+    request = Request(url, headers={'User-Agent': 'shop-aggregator'})
+    try:
+        with fetch_opener().open(request, timeout=FETCH_TIMEOUT) as response:
+            content = response.read(MAX_FETCH_SIZE + 1)
+    except (OSError, ValueError) as e:
+        return None, f"Download failed: {e}"
+    if len(content) > MAX_FETCH_SIZE:
+        return None, "Image size should not exceed 15 MB."
+    return content, None
+
+
+def finish_fetch(job, content, error):
+    """
+    Saves a downloaded image under pending/ and points the field at it, so
+    the job goes on like an upload. Returns True when it needs processing;
+    content that was processed before is referenced right away.
+    """
+    if error:
+        finish_job(job, None, error)
+        return False
+    model = job.content_type.model_class()
+    field = model._meta.get_field(job.field_name)
+    storage = field.storage
+    extension = os.path.splitext(urlsplit(job.url).path)[1].lower()
+    if extension not in FETCH_EXTENSIONS:
+        extension = '.jpg'
+    source = storage.save(
+        f"{PENDING_PREFIX}{model._meta.model_name}s/fetched-{job.pk}{extension}",
+        ContentFile(content)
+    )
+    target = upload_key(storage.path(source), job.operation, field.renditions)
+    swapped = model._base_manager.filter(
+        pk=job.object_id,
+        **{f'{job.field_name}__in': ['', field.get_default()]}
+    ).update(**{job.field_name: source})
+    job.source, job.target = source, target
+    if swapped and not acquire(target, storage):
+        job.save(update_fields=['source', 'target'])
+        return True
+    if swapped:
+        model._base_manager.filter(
+            pk=job.object_id, **{job.field_name: source}
+        ).update(**{job.field_name: target})
+        image_swapped.send(sender=model, pks=[job.object_id])
+    # Otherwise the object was deleted or got an upload in the meantime.
+    storage.delete(source)
+    job.attempts += 1
+    job.finished_at = timezone.now()
+    job.status = STATUS_DONE
+    job.error = ''
+    job.save()
+    return False
+
+
+def fetch_sources(jobs):
+    """
+    Downloads the images of jobs queued by url, in a pool of threads.
+    Returns the jobs that have a source to process.
+    """
+    fetching = [job for job in jobs if not job.source]
+    if not fetching:
+        return jobs
+    with ThreadPoolExecutor(min(len(fetching), FETCH_WORKERS)) as executor:
+        downloads = list(executor.map(download, [job.url for job in fetching]))
+    fetched = [
+        job for job, (content, error) in zip(fetching, downloads)
+        if finish_fetch(job, content, error)
+    ]
+    return [job for job in jobs if job not in fetching or job in fetched]
+
+
+def job_arguments(job):
+    field = job.content_type.model_class()._meta.get_field(job.field_name)
+    return (
+        job.operation,
+        default_storage.path(job.source),
+        job.target,
+        field.renditions,
+        default_storage.location,
+    )
+
+
+def rendition_arguments(job):
+    field = job.content_type.model_class()._meta.get_field(job.field_name)
+    return (
+        default_storage.path(job.target),
+        job.target,
+        field.renditions,
+        default_storage.location,
+    )
+
+
+def run_jobs(jobs, executor=None):
+    """
+    Fetches the sources of jobs queued by url, processes claimed jobs, in
+    `executor` when given, and swaps in the results. Returns the number of
+    jobs that succeeded.
+    """
+    rendering = [job for job in jobs if job.operation == OPERATION_RENDITIONS]
+    if rendering:
+        arguments = zip(*map(rendition_arguments, rendering))
+        results = map_files(render_file, arguments, executor)
+        for job, (_, error) in zip(rendering, results):
+            finish_renditions(job, error)
+    ready = fetch_sources([job for job in jobs if job not in rendering])
+    if ready:
+        arguments = zip(*map(job_arguments, ready))
+        results = map_files(process_file, arguments, executor)
+        for job, (name, error) in zip(ready, results):
+            finish_job(job, name, error)
+    return sum(job.status == STATUS_DONE for job in jobs)
+
+
+def run_now(pks):
+    """
+    Runs the jobs of `pks` in this process, for deployments without a
+    worker. Jobs a worker claimed first are left to it.
+    """
+    return run_jobs(claim(pks))
@@ -0,0 +1,100 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from honduras_shop_aggregator.image_utils import get_file_hash
+from honduras_shop_aggregator.images.fields import is_pending
+from honduras_shop_aggregator.images.models import StoredImage
+from honduras_shop_aggregator.images.pipeline import map_files
+from honduras_shop_aggregator.images.renditions import (content_name,
+                                                        write_renditions)
+from honduras_shop_aggregator.images.store import (processed_image_fields,
+                                                   recount_references, store)
+
+
+def backfill_file(path, name, renditions, media_root, stored):
+    """
+    Writes renditions for an existing image, under its content-addressed
+    name unless it is already stored; returns (name, error).
+    """
+    try:
+        if not stored:
+            name = content_name(get_file_hash(path), name)
+        write_renditions(path, name, renditions, media_root)
+    except Exception as e:
+        return None, str(e)
+    return name, None
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves images stored before content addressing into the image store "
+        "and generates their renditions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Regenerate renditions of images that are already stored."
+        )
+        parser.add_argument('--workers', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        done = failed = 0
+        workers = options['workers']
+        batch_size = options['batch_size']
+        pool = ProcessPoolExecutor(workers) if workers else nullcontext()
+        with pool as executor:
+            for model, field in processed_image_fields():
+                names = self.pending_names(model, field, options['force'])
+                for start in range(0, len(names), batch_size):
+                    batch = names[start:start + batch_size]
+                    stored = set(
+                        StoredImage.objects.filter(name__in=batch)
+                        .values_list('name', flat=True)
+                    )
+                    arguments = (
+                        [default_storage.path(name) for name in batch],
+                        batch,
+                        [field.renditions] * len(batch),
+                        [default_storage.location] * len(batch),
+                        [name in stored for name in batch],
+                    )
+                    results = map_files(backfill_file, arguments, executor)
+                    for old_name, (name, error) in zip(batch, results):
+                        if error:
+                            failed += 1
+                            self.stderr.write(f"{old_name}: {error}")
+                            continue
+                        if name != old_name:
+                            store(old_name, name)
+                            model._base_manager.filter(
+                                **{field.name: old_name}
+                            ).update(**{field.name: name})
+                        done += 1
+        recount_references()
+        self.stdout.write(self.style.SUCCESS(
+            f"Renditions written for {done} images, {failed} failed."
+        ))
+
+    def pending_names(self, model, field, force):
+        """Distinct image names of the field that need backfilling."""
+        names = (
+            model._base_manager.exclude(**{f"{field.name}__isnull": True})
+            .exclude(**{field.name: ''})
+            .order_by()
+            .values_list(field.name, flat=True)
+            .distinct()
+        )
+        stored = set(StoredImage.objects.values_list('name', flat=True))
+        return [
+            name for name in names
+            if not is_pending(name)
+            and name != field.default
+            and (force or name not in stored)
+            and os.path.exists(default_storage.path(name))
+        ]
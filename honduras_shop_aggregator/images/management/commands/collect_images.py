@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from honduras_shop_aggregator.images.store import (collect_garbage,
+                                                   recount_references)
+
+
+class Command(BaseCommand):
+    help = "Deletes stored images that no longer have any references."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-minutes', type=int, default=60,
+            help="Keep unreferenced images this long, in case they are reused."
+        )
+        parser.add_argument(
+            '--recount', action='store_true',
+            help="Recompute reference counts from the image fields first."
+        )
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            changed = recount_references()
+            self.stdout.write(f"Corrected {changed} reference counts.")
+        files, freed = collect_garbage(
+            timedelta(minutes=options['grace_minutes'])
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {files} unreferenced images, {freed / 1024:.0f} KB freed."
+        ))
@@ -0,0 +1,47 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from honduras_shop_aggregator.images.jobs import (claim_jobs,
+                                                  requeue_stale_jobs, run_jobs)
+
+
+class Command(BaseCommand):
+    help = "Processes queued image uploads in a pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.IMAGE_JOB_WORKERS,
+            help="Size of the process pool; 0 processes in this process."
+        )
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--sleep', type=float, default=2.0)
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Exit once the queue is empty instead of polling."
+        )
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale jobs.")
+        workers = options['workers']
+        pool = ProcessPoolExecutor(workers) if workers else nullcontext()
+        processed = failed = 0
+        with pool as executor:
+            while True:
+                jobs = claim_jobs(options['batch_size'])
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+                succeeded = run_jobs(jobs, executor)
+                processed += succeeded
+                failed += len(jobs) - succeeded
+        self.stdout.write(self.style.SUCCESS(
+            f"Image jobs processed: {processed} done, {failed} failed."
+        ))
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0002_storedimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagejob',
+            name='url',
+            field=models.URLField(blank=True, max_length=500),
+        ),
+        migrations.AlterField(
+            model_name='imagejob',
+            name='source',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='imagejob',
+            name='target',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0003_imagejob_url'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='imagejob',
+            name='operation',
+            field=models.CharField(choices=[('fit', 'Fit and pad'), ('crop', 'Center crop'), ('renditions', 'Renditions')], max_length=20),
+        ),
+    ]
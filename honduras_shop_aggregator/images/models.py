@@ -0,0 +1,78 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+OPERATION_FIT = 'fit'
+OPERATION_CROP = 'crop'
+# Writes the renditions of an image that is already stored.
+OPERATION_RENDITIONS = 'renditions'
+
+STATUS_PENDING = 'pending'
+STATUS_PROCESSING = 'processing'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+class ImageJob(models.Model):
+    """
+    An uploaded image waiting for the worker to process it. Jobs queued
+    with a `url` download their source first; rendition jobs only write
+    the renditions of the stored image `target`.
+    """
+
+    OPERATION_CHOICES = [
+        (OPERATION_FIT, 'Fit and pad'),
+        (OPERATION_CROP, 'Center crop'),
+        (OPERATION_RENDITIONS, 'Renditions'),
+    ]
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['status', 'created_at'],
+                name='images_job_status_created'
+            ),
+        ]
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    field_name = models.CharField(max_length=100)
+    operation = models.CharField(max_length=20, choices=OPERATION_CHOICES)
+    url = models.URLField(max_length=500, blank=True)
+    source = models.CharField(max_length=255, blank=True)
+    target = models.CharField(max_length=255, blank=True)
+    replaces = models.CharField(max_length=255, blank=True)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    claimed_by = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.operation} {self.source} ({self.status})"
+
+
+class StoredImage(models.Model):
+    """
+    A processed, content-addressed image file and how many fields use it.
+
+    Files whose count dropped to zero are deleted by collect_images.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    released_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} references)"
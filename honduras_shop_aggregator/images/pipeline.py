@@ -0,0 +1,322 @@
+"""
+The image pipeline: everything that happens to an upload of a
+ProcessedImageField, from the model save to the stored, content-addressed
+image and its renditions.
+
+    upload -> operation (fit, crop, ...) -> store -> renditions (worker)
+
+Renditions are written outside of transactions: by the image worker, or
+with IMAGE_PROCESSING_ASYNC off, by the request once its transaction
+commits. Pages show the stored image until they exist.
+
+Operations rewrite the upload in place and are looked up by the name the
+field declares, so new ones only need register_operation().
+"""
+import os
+from functools import partial
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.fields.files import FieldFile
+from django.utils.translation import gettext as _
+
+from honduras_shop_aggregator.image_utils import crop_image, process_image
+from honduras_shop_aggregator.images.fields import (PENDING_PREFIX,
+                                                    ProcessedImageField)
+from honduras_shop_aggregator.images.models import (OPERATION_CROP,
+                                                    OPERATION_FIT,
+                                                    OPERATION_RENDITIONS,
+                                                    ImageJob)
+from honduras_shop_aggregator.images.renditions import write_renditions
+from honduras_shop_aggregator.images.signals import image_swapped
+from honduras_shop_aggregator.images.store import (acquire, discard, store_all,
+                                                   upload_key)
+
+OPERATIONS = {}
+
+
+def register_operation(name, function):
+    """Makes `function(path)` available to fields as operation `name`."""
+    OPERATIONS[name] = function
+
+
+register_operation(OPERATION_FIT, process_image)
+register_operation(OPERATION_CROP, crop_image)
+
+
+def apply_operation(operation, path):
+    """Processes the upload at `path` in place."""
+    OPERATIONS[operation](path)
+
+
+def render_upload(operation, path, name, renditions, media_root):
+    """
+    Processes the upload in place and writes its renditions under the
+    content-addressed `name`, which is returned.
+    """
+    apply_operation(operation, path)
+    write_renditions(path, name, renditions, media_root)
+    return name
+
+
+def process_file(*args):
+    """render_upload() for the worker pool; returns (name, error)."""
+    try:
+        return render_upload(*args), None
+    except Exception as e:
+        return None, str(e)
+
+
+def render_file(path, name, renditions, media_root):
+    """write_renditions() for the worker pool; returns (name, error)."""
+    try:
+        write_renditions(path, name, renditions, media_root)
+        return name, None
+    except Exception as e:
+        return None, str(e)
+
+
+def map_files(function, arguments, executor=None):
+    """Runs `function` over argument columns, in `executor` when given."""
+    if executor is None:
+        return map(function, *arguments)
+    return executor.map(function, *arguments)
+
+
+def move_image(storage, source, name):
+    """Moves a file to a free name close to `name`; returns the name used."""
+    name = storage.get_available_name(name)
+    os.makedirs(os.path.dirname(storage.path(name)), exist_ok=True)
+    os.replace(storage.path(source), storage.path(name))
+    return name
+
+
+def schedule_image_processing(instance, field_name, replaces=None):
+    """
+    Processes a freshly saved upload, or queues it for the image worker.
+
+    Processed images are content-addressed: an upload whose content was
+    processed before just references the stored result, without any
+    Pillow work. Otherwise, with IMAGE_PROCESSING_ASYNC off, the upload is
+    processed in the request, as before, and its renditions are written
+    once the transaction commits. With it on, the raw file is moved
+    under pending/, the field points at it (rendering the placeholder) and
+    an ImageJob is created. `replaces` is the name of the image the upload
+    supersedes; its reference is released once the new image is ready.
+    """
+    return schedule_uploads([instance], field_name, [replaces])[0]
+
+
+def schedule_uploads(instances, field_name, replaces=None, executor=None):
+    """
+    schedule_image_processing() for new uploads of several saved instances
+    of one model; returns the ImageJob, or None, of each.
+
+    Hashing and processing run in `executor` when given. All database work
+    stays in the calling thread, inside its transaction, and takes a fixed
+    number of queries for the whole batch. Renditions of images processed
+    here are queued, and written after the commit, see render_after_commit().
+    """
+    count = len(instances)
+    replaces = replaces or [None] * count
+    field = instances[0]._meta.get_field(field_name)
+    storage = field.storage
+    files = [getattr(instance, field_name) for instance in instances]
+    names = list(map_files(upload_key, (
+        [field_file.path for field_file in files],
+        [field.operation] * count,
+        [field.renditions] * count,
+    ), executor))
+
+    # Only the first upload of each content is rendered; content stored
+    # before is reused and later copies in the batch follow the first.
+    rendered, reused, copies = {}, [], []
+    for index, name in enumerate(names):
+        if name in rendered:
+            copies.append(index)
+        elif acquire(name, storage):
+            reused.append(index)
+        else:
+            rendered[name] = index
+
+    jobs = [None] * count
+    if settings.IMAGE_PROCESSING_ASYNC:
+        for index in [*rendered.values(), *copies]:
+            jobs[index] = queue_upload(
+                instances[index], field_name, names[index], replaces[index]
+            )
+    else:
+        try:
+            list(map_files(apply_operation, (
+                [field.operation] * len(rendered),
+                [files[index].path for index in rendered.values()],
+            ), executor))
+        except ValidationError:
+            raise
+        except Exception as e:
+            raise ValidationError(_("Image processing failed") + f": {e}")
+        store_all(
+            [(files[index].name, name) for name, index in rendered.items()],
+            storage
+        )
+        render_after_commit(queue_renditions(
+            [instances[index] for index in rendered.values()],
+            field_name,
+            list(rendered)
+        ))
+        for index in copies:
+            acquire(names[index], storage)
+            storage.delete(files[index].name)
+    for index in reused:
+        storage.delete(files[index].name)
+
+    finished = [index for index in range(count) if jobs[index] is None]
+    for index in finished:
+        files[index].name = names[index]
+    model = type(instances[0])
+    model._base_manager.bulk_update(
+        [instances[index] for index in finished], [field_name]
+    )
+    if finished:
+        swapped = [instances[index] for index in finished]
+        image_swapped.send(
+            sender=model,
+            pks=[instance.pk for instance in swapped],
+            instances=swapped
+        )
+    for index in finished:
+        discard(replaces[index], storage)
+    return jobs
+
+
+def queue_upload(instance, field_name, name, replaces=None):
+    """Moves the raw upload under pending/ and queues it for the worker."""
+    field_file = getattr(instance, field_name)
+    storage = field_file.storage
+    source = move_image(storage, field_file.name, PENDING_PREFIX + field_file.name)
+    type(instance)._base_manager.filter(pk=instance.pk).update(
+        **{field_name: source}
+    )
+    image_swapped.send(
+        sender=type(instance), pks=[instance.pk], instances=[instance]
+    )
+    field_file.name = source
+    return ImageJob.objects.create(
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.pk,
+        field_name=field_name,
+        operation=field_file.field.operation,
+        source=source,
+        target=name,
+        replaces=replaces or '',
+    )
+
+
+def queue_renditions(instances, field_name, names):
+    """Queues writing the renditions of each stored image for the worker."""
+    if not instances:
+        return []
+    content_type = ContentType.objects.get_for_model(instances[0])
+    return ImageJob.objects.bulk_create(
+        ImageJob(
+            content_type=content_type,
+            object_id=instance.pk,
+            field_name=field_name,
+            operation=OPERATION_RENDITIONS,
+            source=name,
+            target=name,
+        )
+        for instance, name in zip(instances, names)
+    )
+
+
+def render_after_commit(jobs):
+    """
+    Runs rendition jobs in this process once the transaction commits, so
+    renditions appear without the worker. The jobs stay queued until then,
+    and for the worker if the process dies first.
+    """
+    # jobs imports this module.
+    from honduras_shop_aggregator.images.jobs import run_now
+
+    if jobs:
+        transaction.on_commit(partial(run_now, [job.pk for job in jobs]))
+
+
+def queue_fetches(instances, field_name, urls):
+    """
+    Queues downloading the image at each url into the field of the saved
+    instance, then processing it like an upload. The fields keep their
+    default image until the worker is done.
+    """
+    content_type = ContentType.objects.get_for_model(instances[0])
+    operation = instances[0]._meta.get_field(field_name).operation
+    return ImageJob.objects.bulk_create(
+        ImageJob(
+            content_type=content_type,
+            object_id=instance.pk,
+            field_name=field_name,
+            operation=operation,
+            url=url,
+        )
+        for instance, url in zip(instances, urls)
+    )
+
+
+class ProcessedImageMixin:
+    """
+    Runs new uploads of a model's ProcessedImageFields through the pipeline
+    on save.
+
+    The stored image names are remembered when the instance is created, so
+    telling which image an upload replaces needs no extra query.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stored_images = self._image_names()
+
+    @classmethod
+    def _processed_image_fields(cls):
+        return [
+            field for field in cls._meta.concrete_fields
+            if isinstance(field, ProcessedImageField)
+        ]
+
+    def _image_names(self):
+        """Names of committed images; deferred fields and uploads are left out."""
+        names = {}
+        for field in self._processed_image_fields():
+            if field.attname not in self.__dict__:
+                continue
+            value = self.__dict__[field.attname]
+            if isinstance(value, FieldFile) and value._committed:
+                value = value.name
+            if value is None or isinstance(value, str):
+                names[field.attname] = value or None
+        return names
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._stored_images.update(self._image_names())
+
+    def save(self, *args, **kwargs):
+        uploads = [
+            field for field in self._processed_image_fields()
+            if field.attname in self.__dict__
+            and getattr(self, field.attname)
+            and not getattr(self, field.attname)._committed
+        ]
+        super().save(*args, **kwargs)
+        for field in self._processed_image_fields():
+            old_name = self._stored_images.get(field.attname)
+            new_name = getattr(self, field.attname).name or None
+            if old_name and field.is_placeholder(old_name):
+                old_name = None
+            if field in uploads:
+                schedule_image_processing(self, field.name, replaces=old_name)
+            elif old_name and old_name != new_name:
+                discard(old_name)
+        self._stored_images = self._image_names()
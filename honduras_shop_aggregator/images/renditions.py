@@ -0,0 +1,115 @@
+import os
+import re
+import shutil
+import uuid
+
+from PIL import Image, features
+
+RENDITIONS_DIR = 'renditions'
+CONTENT_DIR = 'images'
+# Content-addressed names, and the slug.<digest> names used before them.
+VERSIONED_NAME = re.compile(
+    rf'^(?:{CONTENT_DIR}/[0-9a-f]{{2}}/[0-9a-f]{{32}}|.+\.[0-9a-f]{{8}})\.\w+$'
+)
+
+PRODUCT_RENDITIONS = {'thumb': 160, 'card': 400, 'detail': 1200}
+AVATAR_RENDITIONS = {'thumb': 80, 'card': 160, 'detail': 240}
+
+MODERN_FORMATS = (
+    ('avif', 'AVIF', 'image/avif', {'quality': 60, 'speed': 8}),
+    ('webp', 'WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+)
+FALLBACK_FORMATS = {
+    'png': ('png', 'PNG', {'optimize': True}),
+    'jpg': ('jpg', 'JPEG', {'quality': 85, 'optimize': True}),
+}
+
+
+def content_name(digest, name):
+    """images/<d[:2]>/<digest>.<ext>: the same content gets the same name."""
+    extension = os.path.splitext(name)[1].lower()
+    return f"{CONTENT_DIR}/{digest[:2]}/{digest}{extension}"
+
+
+def is_versioned(name):
+    """True for names that change with their content and have renditions."""
+    return bool(name) and VERSIONED_NAME.match(name) is not None
+
+
+def available_formats():
+    """Modern formats this Pillow build can encode, best first."""
+    return [
+        (extension, pil_format, mime_type, options)
+        for extension, pil_format, mime_type, options in MODERN_FORMATS
+        if features.check(extension)
+    ]
+
+
+def fallback_format(name):
+    extension = os.path.splitext(name)[1].lower().lstrip('.')
+    return FALLBACK_FORMATS['png' if extension == 'png' else 'jpg']
+
+
+def renditions_dir(name):
+    return f"{RENDITIONS_DIR}/{os.path.splitext(name)[0]}"
+
+
+def rendition_name(name, size, extension):
+    return f"{renditions_dir(name)}/{size}.{extension}"
+
+
+def has_renditions(image):
+    """True once the renditions of a stored image have all been written."""
+    return is_versioned(image.name) and image.storage.exists(
+        renditions_dir(image.name)
+    )
+
+
+def write_renditions(path, name, widths, media_root):
+    """
+    Writes every size of the image at `path` in the modern formats and in
+    the fallback format, under the renditions folder of `name`.
+
+    They are written to a temporary folder that is then renamed, so the
+    renditions folder only appears once it is complete.
+    """
+    folder = os.path.join(media_root, renditions_dir(name))
+    partial = f"{folder}.{uuid.uuid4().hex}.tmp"
+    formats = [
+        (extension, pil_format, options)
+        for extension, pil_format, _, options in available_formats()
+    ]
+    formats.append(fallback_format(name))
+    os.makedirs(partial)
+    try:
+        with Image.open(path) as img:
+            img.load()
+            for size, width in widths.items():
+                if img.width > width:
+                    height = round(img.height * width / img.width)
+                    resized = img.resize(
+                        (width, height), Image.Resampling.LANCZOS
+                    )
+                else:
+                    resized = img
+                for extension, pil_format, options in formats:
+                    output = resized
+                    if pil_format == 'JPEG' and output.mode not in ('RGB', 'L'):
+                        output = output.convert('RGB')
+                    output.save(
+                        os.path.join(partial, f"{size}.{extension}"),
+                        pil_format,
+                        **options
+                    )
+        shutil.rmtree(folder, ignore_errors=True)
+        os.replace(partial, folder)
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+
+
+def remove_renditions(name, media_root):
+    if is_versioned(name):
+        shutil.rmtree(
+            os.path.join(media_root, renditions_dir(name)), ignore_errors=True
+        )
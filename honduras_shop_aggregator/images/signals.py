@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete
+from django.dispatch import Signal
+
+from honduras_shop_aggregator.images.fields import ProcessedImageField
+from honduras_shop_aggregator.images.store import (processed_image_fields,
+                                                   release)
+
+# Sent with the model as sender and the pks of the rows whose image field
+# was pointed at another file by a queryset update, which sends no post_save.
+# `instances` holds the rows themselves when the sender has them at hand.
+image_swapped = Signal()
+
+
+def release_deleted_images(sender, instance, **kwargs):
+    for field in sender._meta.fields:
+        if isinstance(field, ProcessedImageField):
+            release(getattr(instance, field.name).name)
+
+
+def connect_signals():
+    """Deleting a row releases the stored images its fields reference."""
+    for model in {model for model, _ in processed_image_fields()}:
+        post_delete.connect(
+            release_deleted_images,
+            sender=model,
+            dispatch_uid=f'images:release:{model._meta.label}'
+        )
@@ -0,0 +1,150 @@
+import os
+from collections import Counter
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from honduras_shop_aggregator.image_utils import get_file_hash
+from honduras_shop_aggregator.images.fields import ProcessedImageField
+from honduras_shop_aggregator.images.models import StoredImage
+from honduras_shop_aggregator.images.renditions import (content_name,
+                                                        remove_renditions)
+
+
+def processed_image_fields():
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, ProcessedImageField):
+                yield model, field
+
+
+def upload_key(path, operation, renditions):
+    """
+    Content-addressed name of the processed form of the upload at `path`.
+
+    The operation and rendition widths are part of the hash, so an avatar
+    and a product photo made from the same file do not collide.
+    """
+    salt = f"{operation}:{sorted(renditions.items())}:"
+    return content_name(get_file_hash(path, salt), path)
+
+
+def remove_image(name, storage=default_storage):
+    """Deletes a stored image together with its renditions."""
+    if name:
+        path = storage.path(name)
+        if os.path.exists(path):
+            os.remove(path)
+        remove_renditions(name, storage.location)
+
+
+def acquire(name, storage=default_storage):
+    """Adds a reference to a stored image; False if it is not available."""
+    if not storage.exists(name):
+        return False
+    return StoredImage.objects.filter(name=name).update(
+        refcount=F('refcount') + 1, released_at=None
+    ) > 0
+
+
+def store(source, name, storage=default_storage):
+    """
+    Moves the processed file at `source` to its content-addressed `name`
+    and references it. If the same content got there first, the copy is
+    dropped.
+    """
+    store_all([(source, name)], storage)
+    return name
+
+
+def store_all(files, storage=default_storage):
+    """store() for (source, name) pairs with distinct names, in two queries."""
+    sizes = {}
+    for source, name in files:
+        target = storage.path(name)
+        if os.path.exists(target):
+            os.remove(storage.path(source))
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(storage.path(source), target)
+        sizes[name] = os.path.getsize(target)
+    StoredImage.objects.bulk_create(
+        [StoredImage(name=name, size=size) for name, size in sizes.items()],
+        ignore_conflicts=True
+    )
+    StoredImage.objects.filter(name__in=sizes).update(
+        refcount=F('refcount') + 1, released_at=None
+    )
+
+
+def release(name):
+    """Drops a reference to a stored image; False if it is not tracked."""
+    if not name:
+        return False
+    return StoredImage.objects.filter(name=name).update(
+        refcount=F('refcount') - 1, released_at=timezone.now()
+    ) > 0
+
+
+def discard(name, storage=default_storage):
+    """
+    Releases an image that was replaced. Pending uploads and images stored
+    before content addressing belong to a single field and are deleted
+    once the transaction commits, so a rollback keeps them.
+    """
+    if name and not release(name):
+        transaction.on_commit(lambda: remove_image(name, storage))
+
+
+def referenced_names():
+    """How many rows of every processed image field point at each name."""
+    counts = Counter()
+    for model, field in processed_image_fields():
+        counts.update(
+            model._base_manager.exclude(**{f"{field.name}__isnull": True})
+            .exclude(**{field.name: ''})
+            .values_list(field.name, flat=True)
+            .iterator()
+        )
+    return counts
+
+
+def recount_references():
+    """Recomputes every refcount from the image fields; returns the changes."""
+    counts = referenced_names()
+    changed = []
+    now = timezone.now()
+    for image in StoredImage.objects.iterator():
+        refcount = counts.get(image.name, 0)
+        if refcount != image.refcount:
+            if refcount == 0:
+                image.released_at = now
+            image.refcount = refcount
+            changed.append(image)
+    StoredImage.objects.bulk_update(
+        changed, ['refcount', 'released_at'], batch_size=500
+    )
+    return len(changed)
+
+
+def collect_garbage(grace, storage=default_storage):
+    """
+    Deletes stored images nobody has referenced for `grace`. Returns the
+    number of files and bytes freed.
+    """
+    cutoff = timezone.now() - grace
+    files = freed = 0
+    for image in StoredImage.objects.filter(
+        refcount__lte=0, released_at__lt=cutoff
+    ).iterator():
+        deleted, _ = StoredImage.objects.filter(
+            pk=image.pk, refcount__lte=0
+        ).delete()
+        if deleted:
+            remove_image(image.name, storage)
+            files += 1
+            freed += image.size
+    return files, freed
@@ -0,0 +1,45 @@
+from django import template
+
+from honduras_shop_aggregator.images.renditions import (available_formats,
+                                                        fallback_format,
+                                                        has_renditions,
+                                                        rendition_name)
+
+register = template.Library()
+
+SIZES = {
+    'thumb': '80px',
+    'avatar': '120px',
+    'card': '(max-width: 576px) 50vw, 320px',
+    'detail': '(max-width: 768px) 100vw, 42vw',
+    'fullscreen': '100vw',
+}
+
+
+def build_srcset(image, extension):
+    return ', '.join(
+        f"{image.storage.url(rendition_name(image.name, size, extension))} {width}w"
+        for size, width in image.field.renditions.items()
+    )
+
+
+@register.inclusion_tag('partials/_picture.html')
+def picture(image, sizes='card', **attrs):
+    """
+    Renders a <picture> with AVIF/WebP sources and a srcset fallback.
+
+    Placeholders and images whose renditions are not written yet render
+    as a plain <img>.
+    Other keyword arguments become attributes of the <img>:
+
+        {% picture product.image "card" alt=product.product_name class="card-img-top" %}
+    """
+    context = {'src': image.url, 'attrs': attrs, 'sources': [], 'srcset': ''}
+    if not getattr(image, 'is_pending', False) and has_renditions(image):
+        context['sizes'] = SIZES.get(sizes, sizes)
+        context['sources'] = [
+            {'type': mime_type, 'srcset': build_srcset(image, extension)}
+            for extension, _, mime_type, _ in available_formats()
+        ]
+        context['srcset'] = build_srcset(image, fallback_format(image.name)[0])
+    return context
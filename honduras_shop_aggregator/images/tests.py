@@ -0,0 +1,477 @@
+import os
+import shutil
+import socket
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.templatetags.static import static
+from django.test import SimpleTestCase, override_settings
+from PIL import ExifTags, Image
+
+from honduras_shop_aggregator.image_utils import (crop_image, open_image,
+                                                  process_image)
+from honduras_shop_aggregator.images.jobs import MAX_ATTEMPTS, download
+from honduras_shop_aggregator.images.models import (OPERATION_RENDITIONS,
+                                                    STATUS_DONE, STATUS_FAILED,
+                                                    STATUS_PENDING, ImageJob,
+                                                    StoredImage)
+from honduras_shop_aggregator.images.pipeline import (OPERATIONS,
+                                                      queue_fetches,
+                                                      register_operation,
+                                                      render_upload)
+from honduras_shop_aggregator.images.renditions import (PRODUCT_RENDITIONS,
+                                                        available_formats,
+                                                        is_versioned,
+                                                        rendition_name,
+                                                        renditions_dir)
+from honduras_shop_aggregator.products.models import Product
+from honduras_shop_aggregator.users.models import User
+from honduras_shop_aggregator.utils import BaseTestCase
+
+IMAGE_PATH = 'honduras_shop_aggregator/static/images'
+STORED_NAME = r'^images/[0-9a-f]{2}/[0-9a-f]{32}\.jpg$'
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def uploaded_image(name="test_img_to_crop.jpg"):
+    with open(os.path.join(IMAGE_PATH, name), 'rb') as img_file:
+        return SimpleUploadedFile(
+            name=name, content=img_file.read(), content_type='image/jpeg'
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_PROCESSING_ASYNC=True)
+class TestImageJobs(BaseTestCase):
+
+    def setUp(self):
+        self.product = Product.objects.get(pk=1)
+        self.user = User.objects.get(pk=1)
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def process_jobs(self, workers=0):
+        call_command(
+            'process_image_jobs', '--once', '--workers', str(workers),
+            stdout=StringIO()
+        )
+
+    def test_upload_is_queued_with_placeholder(self):
+        self.product.image = uploaded_image()
+        self.product.save()
+        self.product.refresh_from_db()
+        self.assertTrue(self.product.image.is_pending)
+        self.assertEqual(self.product.image.url, static('images/placeholder.jpg'))
+        job = ImageJob.objects.get()
+        self.assertEqual(job.status, STATUS_PENDING)
+        self.assertRegex(job.target, STORED_NAME)
+        with Image.open(self.product.image.path) as img:
+            self.assertNotEqual(img.size, (1200, 1200))
+
+    def test_worker_swaps_in_processed_image(self):
+        self.product.image = uploaded_image()
+        self.product.save()
+        pending_path = self.product.image.path
+        self.process_jobs()
+        self.product.refresh_from_db()
+        self.assertRegex(self.product.image.name, STORED_NAME)
+        with Image.open(self.product.image.path) as img:
+            self.assertEqual(img.size, (1200, 1200))
+        self.assertFalse(os.path.exists(pending_path))
+        self.assertEqual(ImageJob.objects.get().status, STATUS_DONE)
+
+    def test_worker_pool_crops_avatar(self):
+        self.user.image = uploaded_image()
+        self.user.save()
+        self.process_jobs(workers=2)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.image.is_pending)
+        with Image.open(self.user.image.path) as img:
+            self.assertEqual(img.size, (240, 240))
+
+    def collect_images(self, *args):
+        call_command('collect_images', '--grace-minutes', '0', *args, stdout=StringIO())
+
+    def stored_files(self):
+        return [
+            os.path.join(root, name)
+            for root, _, names in os.walk(os.path.join(TEMP_MEDIA_ROOT, 'images'))
+            for name in names
+        ]
+
+    def test_replaced_image_collected_once_released(self):
+        self.product.image = uploaded_image()
+        self.product.save()
+        self.process_jobs()
+        self.product.refresh_from_db()
+        old_name = self.product.image.name
+        old_path = self.product.image.path
+        self.product.image = uploaded_image("test_img_new.jpg")
+        self.product.save()
+        self.process_jobs()
+        self.product.refresh_from_db()
+        self.assertFalse(self.product.image.is_pending)
+        self.assertNotEqual(self.product.image.path, old_path)
+        self.assertEqual(StoredImage.objects.get(name=old_name).refcount, 0)
+        self.assertTrue(os.path.exists(old_path))
+        self.collect_images()
+        self.assertFalse(os.path.exists(old_path))
+        self.assertFalse(StoredImage.objects.filter(name=old_name).exists())
+        self.assertTrue(os.path.exists(self.product.image.path))
+
+    def test_superseded_upload_is_discarded(self):
+        self.product.image = uploaded_image()
+        self.product.save()
+        first_job = ImageJob.objects.get()
+        self.product.image = uploaded_image("test_img_new.jpg")
+        self.product.save()
+        self.process_jobs()
+        self.product.refresh_from_db()
+        self.assertFalse(self.product.image.is_pending)
+        self.assertFalse(
+            os.path.exists(os.path.join(TEMP_MEDIA_ROOT, first_job.source))
+        )
+        self.collect_images()
+        self.assertEqual(self.stored_files(), [self.product.image.path])
+
+    def test_duplicate_upload_reuses_stored_image(self):
+        self.product.image = uploaded_image()
+        self.product.save()
+        self.process_jobs()
+        self.product.refresh_from_db()
+        other = Product.objects.get(pk=2)
+        other.image = uploaded_image()
+        other.save()
+        other.refresh_from_db()
+        self.assertFalse(other.image.is_pending)
+        self.assertEqual(other.image.name, self.product.image.name)
+        self.assertEqual(ImageJob.objects.count(), 1)
+        self.assertEqual(StoredImage.objects.get().refcount, 2)
+        self.assertEqual(len(self.stored_files()), 1)
+        self.assertEqual(os.listdir(os.path.join(TEMP_MEDIA_ROOT, 'products')), [])
+
+    def test_deleted_rows_release_references(self):
+        self.product.image = uploaded_image()
+        self.product.save()
+        self.process_jobs()
+        self.product.refresh_from_db()
+        self.product.delete()
+        self.assertEqual(StoredImage.objects.get().refcount, 0)
+
+    def test_collect_recounts_references(self):
+        self.user.image = uploaded_image()
+        self.user.save()
+        self.process_jobs()
+        StoredImage.objects.update(refcount=0)
+        self.collect_images('--recount')
+        self.user.refresh_from_db()
+        self.assertEqual(StoredImage.objects.get().refcount, 1)
+        self.assertTrue(os.path.exists(self.user.image.path))
+
+    def test_broken_upload_fails_after_retries(self):
+        self.product.image = uploaded_image()
+        self.product.save()
+        with open(self.product.image.path, 'wb') as f:
+            f.write(b'not an image')
+        for _ in range(MAX_ATTEMPTS):
+            self.process_jobs()
+        job = ImageJob.objects.get()
+        self.assertEqual(job.status, STATUS_FAILED)
+        self.assertEqual(job.attempts, MAX_ATTEMPTS)
+        self.product.refresh_from_db()
+        self.assertTrue(self.product.image.is_pending)
+
+
+    def fetch_image(self, product, content, error=None):
+        queue_fetches([product], 'image', ['https://images.test/shirt.jpg'])
+        with mock.patch(
+            'honduras_shop_aggregator.images.jobs.download',
+            return_value=(content, error)
+        ):
+            self.process_jobs()
+        product.refresh_from_db()
+
+    def test_fetched_image_processed_like_upload(self):
+        self.fetch_image(self.product, uploaded_image().read())
+        self.assertRegex(self.product.image.name, STORED_NAME)
+        with Image.open(self.product.image.path) as img:
+            self.assertEqual(img.size, (1200, 1200))
+        self.assertEqual(ImageJob.objects.get().status, STATUS_DONE)
+        self.assertEqual(
+            os.listdir(os.path.join(TEMP_MEDIA_ROOT, 'pending/products')), []
+        )
+
+    def test_fetched_image_reuses_stored_content(self):
+        self.fetch_image(self.product, uploaded_image().read())
+        other = Product.objects.get(pk=2)
+        self.fetch_image(other, uploaded_image().read())
+        self.assertEqual(other.image.name, self.product.image.name)
+        self.assertEqual(StoredImage.objects.get().refcount, 2)
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_failed_download_fails_after_retries(self):
+        self.fetch_image(self.product, None, "Download failed: timed out")
+        job = ImageJob.objects.get()
+        self.assertEqual((job.status, job.attempts), (STATUS_FAILED, MAX_ATTEMPTS))
+        self.assertEqual(job.error, "Download failed: timed out")
+        self.assertEqual(self.product.image.name, 'products/placeholder.png')
+
+    def test_download_refuses_internal_addresses(self):
+        for url in (
+            'ftp://images.test/shirt.jpg',
+            'file:///etc/passwd',
+            'http://localhost/shirt.jpg',
+            'http://127.0.0.1:8000/shirt.jpg',
+            'http://10.0.0.5/shirt.jpg',
+            'http://[::1]/shirt.jpg',
+            'http://169.254.169.254/latest/meta-data/',
+        ):
+            with self.subTest(url=url):
+                content, error = download(url)
+                self.assertIsNone(content)
+                self.assertTrue(error.startswith("Download failed"))
+
+    def test_download_refuses_hosts_resolving_to_internal_addresses(self):
+        listener = socket.create_server(('127.0.0.1', 0))
+        self.addCleanup(listener.close)
+        port = listener.getsockname()[1]
+        getaddrinfo = socket.getaddrinfo
+
+        def resolve(host, *args, **kwargs):
+            return getaddrinfo('127.0.0.1', *args, **kwargs)
+
+        with mock.patch('socket.getaddrinfo', side_effect=resolve):
+            content, error = download(f'http://images.test:{port}/shirt.jpg')
+        self.assertIsNone(content)
+        self.assertIn("Refused to connect to 127.0.0.1", error)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_PROCESSING_ASYNC=False)
+class TestRenditions(BaseTestCase):
+
+    def setUp(self):
+        self.product = Product.objects.get(pk=1)
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def rendition_path(self, name, size, extension):
+        return os.path.join(TEMP_MEDIA_ROOT, rendition_name(name, size, extension))
+
+    def render_picture(self, image):
+        return Template(
+            '{% load images %}{% picture image "card" alt="Shoe" %}'
+        ).render(Context({'image': image}))
+
+    def upload(self, name="test_img_to_crop.jpg"):
+        self.product.image = uploaded_image(name)
+        self.product.save()
+        call_command('process_image_jobs', '--once', stdout=StringIO())
+
+    def test_renditions_are_written_after_the_commit(self):
+        self.product.image = uploaded_image()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+            name = self.product.image.name
+            self.assertFalse(os.path.exists(os.path.join(
+                TEMP_MEDIA_ROOT, renditions_dir(name)
+            )))
+            job = ImageJob.objects.get()
+            self.assertEqual(
+                (job.operation, job.target, job.status),
+                (OPERATION_RENDITIONS, name, STATUS_PENDING)
+            )
+            html = self.render_picture(self.product.image)
+            self.assertNotIn('srcset', html)
+            self.assertIn(f'src="{self.product.image.url}"', html)
+        self.assertEqual(ImageJob.objects.get().status, STATUS_DONE)
+        self.assertIn('srcset', self.render_picture(self.product.image))
+
+    def test_renditions_left_to_the_worker_when_async(self):
+        self.product.image = uploaded_image()
+        with override_settings(IMAGE_PROCESSING_ASYNC=True):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.product.save()
+            self.assertEqual(ImageJob.objects.get().status, STATUS_PENDING)
+            call_command('process_image_jobs', '--once', stdout=StringIO())
+        self.assertEqual(ImageJob.objects.get().status, STATUS_DONE)
+        self.product.refresh_from_db()
+        self.assertIn('srcset', self.render_picture(self.product.image))
+
+    def test_upload_writes_every_size_and_format(self):
+        self.upload()
+        name = self.product.image.name
+        self.assertTrue(is_versioned(name))
+        extensions = [extension for extension, *_ in available_formats()]
+        for size, width in PRODUCT_RENDITIONS.items():
+            for extension in extensions + ['jpg']:
+                with Image.open(self.rendition_path(name, size, extension)) as img:
+                    self.assertEqual(img.width, width)
+
+    def test_collected_image_renditions_removed(self):
+        self.upload()
+        old_dir = os.path.join(
+            TEMP_MEDIA_ROOT, renditions_dir(self.product.image.name)
+        )
+        self.upload("test_img_new.jpg")
+        self.assertTrue(os.path.exists(old_dir))
+        call_command('collect_images', '--grace-minutes', '0', stdout=StringIO())
+        self.assertFalse(os.path.exists(old_dir))
+        self.assertTrue(os.path.exists(
+            self.rendition_path(self.product.image.name, 'card', 'jpg')
+        ))
+
+    def test_picture_tag_renders_srcset(self):
+        self.upload()
+        html = self.render_picture(self.product.image)
+        card_url = default_storage.url(
+            rendition_name(self.product.image.name, 'card', 'jpg')
+        )
+        self.assertIn(f'{card_url} 400w', html)
+        self.assertIn('sizes="(max-width: 576px) 50vw, 320px"', html)
+        self.assertIn('alt="Shoe"', html)
+        for _, _, mime_type, _ in available_formats():
+            self.assertIn(f'<source type="{mime_type}"', html)
+
+    def test_picture_tag_plain_img_without_renditions(self):
+        Product.objects.filter(pk=self.product.pk).update(image='products/old.jpg')
+        self.product.refresh_from_db()
+        html = self.render_picture(self.product.image)
+        self.assertNotIn('srcset', html)
+        self.assertIn(f'src="{self.product.image.url}"', html)
+
+    def test_backfill_stores_legacy_images(self):
+        with open(os.path.join(IMAGE_PATH, 'test_img_new.jpg'), 'rb') as f:
+            legacy = default_storage.save('products/legacy.jpg', ContentFile(f.read()))
+        Product.objects.filter(pk__in=[1, 2]).update(image=legacy)
+        call_command('backfill_renditions', stdout=StringIO())
+        names = set(
+            Product.objects.filter(pk__in=[1, 2]).values_list('image', flat=True)
+        )
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertRegex(name, STORED_NAME)
+        self.assertEqual(StoredImage.objects.get(name=name).refcount, 2)
+        self.assertFalse(default_storage.exists(legacy))
+        self.assertTrue(os.path.exists(self.rendition_path(name, 'thumb', 'jpg')))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_PROCESSING_ASYNC=False)
+class TestPipeline(BaseTestCase):
+
+    def setUp(self):
+        self.user = User.objects.get(pk=1)
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_save_without_upload_does_not_reload_instance(self):
+        self.user.first_name = "Renamed"
+        with self.assertNumQueries(1):
+            self.user.save()
+
+    def test_upload_replacing_image_is_detected_without_query(self):
+        self.user.image = uploaded_image()
+        self.user.save()
+        old_name = self.user.image.name
+        self.user.image = uploaded_image("test_img_new.jpg")
+        self.user.save()
+        self.assertNotEqual(self.user.image.name, old_name)
+        self.assertEqual(StoredImage.objects.get(name=old_name).refcount, 0)
+
+    def test_cleared_legacy_image_deleted_on_commit(self):
+        legacy = default_storage.save('users/legacy.jpg', ContentFile(b'jpeg'))
+        User.objects.filter(pk=self.user.pk).update(image=legacy)
+        user = User.objects.get(pk=self.user.pk)
+        user.image = None
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            user.save()
+        self.assertTrue(default_storage.exists(legacy))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(default_storage.exists(legacy))
+
+    def test_registered_operation_is_used(self):
+        def grayscale(path):
+            with Image.open(path) as img:
+                img.convert('L').save(path)
+
+        register_operation('grayscale', grayscale)
+        self.addCleanup(OPERATIONS.pop, 'grayscale')
+        path = os.path.join(TEMP_MEDIA_ROOT, 'gray.jpg')
+        os.makedirs(TEMP_MEDIA_ROOT, exist_ok=True)
+        Image.new('RGB', (500, 500), (200, 20, 20)).save(path)
+        name = render_upload(
+            'grayscale', path, 'images/aa/gray.jpg', {'thumb': 80}, TEMP_MEDIA_ROOT
+        )
+        with Image.open(path) as img:
+            self.assertEqual(img.mode, 'L')
+        thumb = os.path.join(TEMP_MEDIA_ROOT, rendition_name(name, 'thumb', 'jpg'))
+        with Image.open(thumb) as img:
+            self.assertEqual(img.size, (80, 80))
+
+
+class TestImageDecoding(SimpleTestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def save_image(self, name, size, orientation=None):
+        path = os.path.join(self.media_root, name)
+        exif = Image.Exif()
+        exif[ExifTags.Base.Make] = 'Camera'
+        if orientation:
+            exif[ExifTags.Base.Orientation] = orientation
+        Image.new('RGB', size, (200, 20, 20)).save(path, exif=exif.tobytes())
+        return path
+
+    def test_large_jpeg_decoded_at_reduced_scale(self):
+        path = self.save_image('large.jpg', (6000, 4000))
+        with open_image(path, (1200, 1200)) as img:
+            self.assertEqual(img.size, (1500, 1000))
+        with open_image(path, (240, 240), cover=True) as img:
+            self.assertEqual(img.size, (750, 500))
+
+    def test_orientation_applied_and_metadata_stripped(self):
+        path = self.save_image('rotated.jpg', (3000, 2000), orientation=6)
+        process_image(path)
+        with Image.open(path) as img:
+            self.assertEqual(img.size, (1200, 1200))
+            self.assertEqual(dict(img.getexif()), {})
+            # Turned upright, the portrait photo is padded left and right.
+            self.assertEqual(img.getpixel((50, 600)), (255, 255, 255))
+            self.assertNotEqual(img.getpixel((600, 50)), (255, 255, 255))
+
+    def test_crop_strips_metadata(self):
+        path = self.save_image('avatar.jpg', (900, 600), orientation=8)
+        crop_image(path)
+        with Image.open(path) as img:
+            self.assertEqual(img.size, (240, 240))
+            self.assertEqual(dict(img.getexif()), {})
+
+    def test_resolution_guards(self):
+        path = self.save_image('huge.jpg', (2000, 2000))
+        with mock.patch(
+            'honduras_shop_aggregator.image_utils.MAX_IMAGE_PIXELS', 1_000_000
+        ):
+            with self.assertRaises(ValidationError):
+                process_image(path)
+        png_path = os.path.join(self.media_root, 'huge.png')
+        Image.new('RGB', (2000, 2000)).save(png_path)
+        with mock.patch(
+            'honduras_shop_aggregator.image_utils.MAX_DECODED_PIXELS', 1_000_000
+        ):
+            with self.assertRaises(ValidationError):
+                crop_image(png_path)
+            # JPEGs are decoded small enough to pass.
+            crop_image(path)
@@ -0,0 +1,89 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from honduras_shop_aggregator import cache_url
+from honduras_shop_aggregator.likedproducts.models import LikedProduct
+
+LIKED_SET_CACHE_TIMEOUT = 60 * 15
+
+
+def liked_set_version_key(user_pk):
+    return f'likedproducts:user:{user_pk}:version'
+
+
+def liked_set_cache_key(user_pk, version):
+    return f'likedproducts:user:{user_pk}:{version}'
+
+
+class LikedSet:
+    """
+    Liked product pks of the current visitor, with O(1) membership.
+
+    Signed-in users are looked up with one IN query restricted to the
+    products being rendered. With a cache every process shares, the
+    answers are cached per user and merged with what is already known, so
+    pages that were seen before cost no queries at all. Anonymous likes
+    come straight from their cookie.
+
+    The cached answers live under a version that every like or unlike
+    drops, right away and again when its transaction commits. An answer
+    merged from data read before the change is stored under the dropped
+    version, where it is never read.
+    """
+
+    def __init__(self, liked_pks):
+        self._liked_pks = frozenset(liked_pks)
+
+    def __contains__(self, product_pk):
+        return product_pk in self._liked_pks
+
+    def __len__(self):
+        return len(self._liked_pks)
+
+    @classmethod
+    def for_request(cls, request, products):
+        if not request.user.is_authenticated:
+            return cls(request.visitor.liked_products)
+        return cls.for_user(request.user.pk, [product.pk for product in products])
+
+    @staticmethod
+    def query(user_pk, product_pks):
+        return set(
+            LikedProduct.objects.filter(
+                user=user_pk, product__in=product_pks
+            ).values_list('product_id', flat=True)
+        )
+
+    @classmethod
+    def for_user(cls, user_pk, product_pks):
+        # A per-process cache would miss the likes handled by other workers.
+        if not cache_url.is_shared(settings.CACHES['default']):
+            return cls(cls.query(user_pk, product_pks))
+        version_key = liked_set_version_key(user_pk)
+        version = cache.get(version_key)
+        if version is None:
+            cache.add(version_key, uuid.uuid4().hex, LIKED_SET_CACHE_TIMEOUT)
+            version = cache.get(version_key)
+        key = liked_set_cache_key(user_pk, version)
+        checked, liked = cache.get(key, (frozenset(), frozenset()))
+        missing = set(product_pks) - checked
+        if missing:
+            liked = liked | cls.query(user_pk, missing)
+            checked = checked | missing
+            cache.set(key, (checked, liked), LIKED_SET_CACHE_TIMEOUT)
+        return cls(liked & set(product_pks))
+
+    @staticmethod
+    def invalidate(user_pk):
+        version_key = liked_set_version_key(user_pk)
+        cache.delete(version_key)
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: cache.delete(version_key))
+
+    def mark(self, products):
+        """Sets is_liked on every product, as the grid templates expect."""
+        for product in products:
+            product.is_liked = product.pk in self
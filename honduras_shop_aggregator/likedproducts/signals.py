@@ -1,21 +1,34 @@
 from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from honduras_shop_aggregator.likedproducts.liked_set import LikedSet
 from honduras_shop_aggregator.likedproducts.models import LikedProduct
 from honduras_shop_aggregator.products.models import Product
 
 
 @receiver(user_logged_in)
 def merge_likes_on_login(sender, request, user, **kwargs):
-    session_likes = request.session.get('liked_products', [])
-    if session_likes:
-        user_likes = set(user.likes.values_list('pk', flat=True))
-        new_likes = set(session_likes) - user_likes
-        for product_pk in new_likes:
-            try:
-                product = Product.objects.get(pk=product_pk)
-                LikedProduct.objects.get_or_create(user=user, product=product)
-            except Product.DoesNotExist:
-                pass
-        del request.session['liked_products']
-        request.session.modified = True
+    # Logins of the test client do not go through VisitorMiddleware.
+    visitor = getattr(request, 'visitor', None)
+    anonymous_likes = visitor.liked_products if visitor else []
+    if anonymous_likes:
+        # One insert; likes the user already has are skipped by the
+        # unique constraint, also when another request adds them meanwhile.
+        LikedProduct.objects.bulk_create(
+            [
+                LikedProduct(user=user, product_id=product_pk)
+                for product_pk in Product.objects.filter(
+                    pk__in=anonymous_likes
+                ).values_list('pk', flat=True)
+            ],
+            ignore_conflicts=True
+        )
+        LikedSet.invalidate(user.pk)
+        visitor.liked_products = []
+
+
+@receiver(post_save, sender=LikedProduct)
+@receiver(post_delete, sender=LikedProduct)
+def invalidate_liked_set(sender, instance, **kwargs):
+    LikedSet.invalidate(instance.user_id)
@@ -1,7 +1,14 @@
+from unittest import mock
+
 from bs4 import BeautifulSoup
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from honduras_shop_aggregator.likedproducts.liked_set import (
+    LikedSet, liked_set_cache_key, liked_set_version_key)
 from honduras_shop_aggregator.likedproducts.models import LikedProduct
 from honduras_shop_aggregator.products.models import Product
 from honduras_shop_aggregator.users.models import User
@@ -145,7 +152,11 @@ class TestLikesMerge(BaseTestCase):
             reverse('toggle_like', kwargs={'product_pk': self.product2.pk})
         )
         self.assertEqual(response.status_code, 200)
-        self.login_user(self.user)
+        # Through the login view: the likes are read from the visitor cookie.
+        self.client.post(reverse('login'), {
+            'username': self.user.username,
+            'password': 'correct_password',
+        })
         response = self.client.post(
             reverse('toggle_like', kwargs={'product_pk': self.product3.pk})
         )
@@ -208,3 +219,81 @@ class TestLikesSessionSecurity(BaseTestCase):
         response_b = other_client.get(reverse("anonymous_profile"))
         self.assertContains(response_b, self.product2.product_name)
         self.assertNotContains(response_b, self.product1.product_name)
+
+
+class TestLikedSet(BaseTestCase):
+
+    def setUp(self):
+        self.user = User.objects.get(pk=1)
+        self.liked = Product.objects.get(pk=1)
+        self.not_liked = Product.objects.get(pk=4)
+        LikedProduct.objects.create(user=self.user, product=self.liked)
+        shared = mock.patch(
+            'honduras_shop_aggregator.cache_url.is_shared', return_value=True
+        )
+        shared.start()
+        self.addCleanup(shared.stop)
+
+    def test_not_cached_without_shared_cache(self):
+        with mock.patch(
+            'honduras_shop_aggregator.cache_url.is_shared', return_value=False
+        ):
+            LikedSet.for_user(self.user.pk, [self.liked.pk])
+            with self.assertNumQueries(1):
+                liked_set = LikedSet.for_user(self.user.pk, [self.liked.pk])
+        self.assertIn(self.liked.pk, liked_set)
+
+    def test_answer_merged_before_an_unlike_is_not_served(self):
+        product_pks = [self.liked.pk, self.not_liked.pk]
+        LikedSet.for_user(self.user.pk, product_pks)
+        version = cache.get(liked_set_version_key(self.user.pk))
+        LikedProduct.objects.filter(user=self.user).delete()
+        # A request that read the likes before the delete stores them late.
+        cache.set(
+            liked_set_cache_key(self.user.pk, version),
+            (frozenset(product_pks), frozenset([self.liked.pk]))
+        )
+        liked_set = LikedSet.for_user(self.user.pk, product_pks)
+        self.assertNotIn(self.liked.pk, liked_set)
+
+    def test_membership_for_page(self):
+        liked_set = LikedSet.for_user(
+            self.user.pk, [self.liked.pk, self.not_liked.pk]
+        )
+        self.assertIn(self.liked.pk, liked_set)
+        self.assertNotIn(self.not_liked.pk, liked_set)
+
+    def test_lookup_is_one_query_restricted_to_page(self):
+        with CaptureQueriesContext(connection) as queries:
+            LikedSet.for_user(self.user.pk, [self.liked.pk, self.not_liked.pk])
+        self.assertEqual(len(queries), 1)
+        self.assertIn(" IN (", queries[0]["sql"])
+        with self.assertNumQueries(0):
+            liked_set = LikedSet.for_user(self.user.pk, [self.liked.pk])
+        self.assertEqual(len(liked_set), 1)
+
+    def test_toggle_like_invalidates_cached_set(self):
+        LikedSet.for_user(self.user.pk, [self.liked.pk, self.not_liked.pk])
+        self.login_user(self.user)
+        self.client.post(
+            reverse('toggle_like', kwargs={'product_pk': self.not_liked.pk})
+        )
+        self.client.post(
+            reverse('toggle_like', kwargs={'product_pk': self.liked.pk})
+        )
+        liked_set = LikedSet.for_user(
+            self.user.pk, [self.liked.pk, self.not_liked.pk]
+        )
+        self.assertNotIn(self.liked.pk, liked_set)
+        self.assertIn(self.not_liked.pk, liked_set)
+
+    def test_session_likes_for_anonymous(self):
+        self.client.post(
+            reverse('toggle_like', kwargs={'product_pk': self.not_liked.pk})
+        )
+        response = self.client.get(reverse('product_list'))
+        liked = {
+            product.pk for product in response.context['products']
+            if product.is_liked
+        }
+        self.assertEqual(liked, {self.not_liked.pk})
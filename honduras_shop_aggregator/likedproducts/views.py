@@ -21,12 +21,12 @@ class ToggleLikeView(View):
             else:
                 status = 'liked'
         else:
-            liked_products = request.session.get('liked_products', [])
+            liked_products = request.visitor.liked_products
             if product_pk in liked_products:
                 liked_products.remove(product_pk)
                 status = 'unliked'
             else:
                 liked_products.append(product_pk)
                 status = 'liked'
-            request.session['liked_products'] = liked_products
+            request.visitor.liked_products = liked_products
         return JsonResponse({'status': status})
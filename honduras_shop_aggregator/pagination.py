@@ -0,0 +1,197 @@
+"""
+Keyset ("load more") pagination for the product grids.
+
+A page is the rows that come after the last row of the previous page in
+the queryset's ordering, so the database seeks to it with a WHERE clause
+instead of counting and skipping every row before it with OFFSET. Deep
+pages cost the same as the first one, and no COUNT query is needed: one
+row more than the page size is read to know whether there is a next page.
+
+The position is handed to the client as an opaque, signed cursor holding
+the ordering and the sort values of the last row.
+"""
+import datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.template.loader import render_to_string
+from django.utils.translation import gettext as _
+
+CURSOR_PARAM = 'cursor'
+CURSOR_SALT = 'honduras_shop_aggregator.pagination'
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def cursor_value(value):
+    """A sort value as JSON, keeping the microseconds of datetimes."""
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPage:
+    """A page of a KeysetPaginator, with the attributes templates read."""
+
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __repr__(self):
+        return f"<Keyset page of {len(self.object_list)} objects>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return False
+
+    def has_other_pages(self):
+        return self.has_next()
+
+
+class KeysetPaginator:
+    """
+    Pages through `queryset` in its own ordering, or the model's default
+    one, with pk added as the last key so that every row has a distinct
+    position. Ordering keys must be fields or annotations of the model
+    itself that are never null.
+
+    `state` is signed into every cursor, for querysets that depend on more
+    than the query string; read it back with cursor_state().
+    """
+
+    def __init__(self, queryset, per_page, state=None):
+        ordering = list(
+            queryset.query.order_by or queryset.model._meta.ordering
+        )
+        if not all(isinstance(key, str) for key in ordering):
+            raise ValueError("Keyset pagination needs field names to order by.")
+        names = [key.lstrip('-') for key in ordering]
+        if 'pk' not in names and queryset.model._meta.pk.name not in names:
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append('-pk' if descending else 'pk')
+        self.ordering = ordering
+        self.queryset = queryset.order_by(*ordering)
+        self.per_page = per_page
+        self.state = state
+
+    def page(self, cursor=None):
+        """The page after `cursor`, or the first page when there is none."""
+        queryset = self.queryset
+        if cursor:
+            queryset = queryset.filter(self.after(self.decode(cursor)))
+        rows = list(queryset[:self.per_page + 1])
+        object_list = rows[:self.per_page]
+        next_cursor = None
+        if len(rows) > self.per_page:
+            next_cursor = self.encode(object_list[-1])
+        return KeysetPage(object_list, next_cursor)
+
+    def encode(self, obj):
+        values = [
+            cursor_value(getattr(obj, key.lstrip('-'))) for key in self.ordering
+        ]
+        return signing.dumps(
+            [self.ordering, values, self.state], salt=CURSOR_SALT, compress=True
+        )
+
+    def decode(self, cursor):
+        try:
+            ordering, values, state = signing.loads(cursor, salt=CURSOR_SALT)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise InvalidCursor(_("The cursor is not valid."))
+        if (
+            ordering != self.ordering
+            or len(values) != len(ordering)
+            or state != self.state
+        ):
+            raise InvalidCursor(_("The cursor is for another ordering."))
+        return values
+
+    def after(self, values):
+        """
+        Rows after `values` in the ordering:
+        (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND c > z) ...
+        """
+        condition = Q()
+        equal = {}
+        for key, value in zip(self.ordering, values):
+            name = key.lstrip('-')
+            lookup = 'lt' if key.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+
+class KeysetPaginationMixin:
+    """
+    Keyset pagination for ListView and FilterView, reading the cursor from
+    the `cursor` query parameter. `paginate_by` sets the page size.
+    """
+    paginator_class = KeysetPaginator
+
+    def get_cursor(self):
+        return self.request.GET.get(CURSOR_PARAM)
+
+    def get_paginator(self, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True, **kwargs):
+        return self.paginator_class(queryset, per_page)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.get_paginator(queryset, page_size)
+        page = keyset_page(paginator, self.get_cursor())
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+def cursor_state(cursor):
+    """The state signed into `cursor`, or None when it is not valid."""
+    try:
+        return signing.loads(cursor, salt=CURSOR_SALT)[2]
+    except (signing.BadSignature, TypeError, ValueError, IndexError):
+        return None
+
+
+def keyset_page(paginator, cursor):
+    """paginator.page(cursor), with a bad cursor reported as a 404."""
+    try:
+        return paginator.page(cursor)
+    except InvalidPage as e:
+        raise Http404(_("Invalid page: %(message)s") % {'message': str(e)})
+
+
+def paginate(request, queryset, per_page):
+    """The requested page of `queryset`, for views that are not ListViews."""
+    return keyset_page(
+        KeysetPaginator(queryset, per_page), request.GET.get(CURSOR_PARAM)
+    )
+
+
+def load_more_response(request, page, template_name):
+    """The JSON the "Load more" button of static/js/product-list.js reads."""
+    html = render_to_string(
+        template_name,
+        {"products": page.object_list, "request": request},
+        request=request
+    )
+    return JsonResponse({
+        "html": html,
+        "has_next": page.has_next(),
+        "next_page": page.next_cursor
+    })
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from .exports import FORMAT_CSV, FORMAT_JSONL, export_response
 from .models import Product, ProductImage
 
 
@@ -38,6 +39,23 @@ class CustomProductAdmin(admin.ModelAdmin):
     )
     ordering = ("date_added",)
     inlines = [ProductImageInline]
+    actions = ["export_csv", "export_jsonl"]
+
+    def export(self, request, queryset, file_format):
+        return export_response(
+            queryset,
+            file_format,
+            "products",
+            base_url=request.build_absolute_uri("/").rstrip("/")
+        )
+
+    @admin.action(description="Export selected products as CSV")
+    def export_csv(self, request, queryset):
+        return self.export(request, queryset, FORMAT_CSV)
+
+    @admin.action(description="Export selected products as JSON lines")
+    def export_jsonl(self, request, queryset):
+        return self.export(request, queryset, FORMAT_JSONL)
 
 
 @admin.register(ProductImage)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'honduras_shop_aggregator.products'
+
+    def ready(self):
+        import honduras_shop_aggregator.products.signals  # noqa: F401
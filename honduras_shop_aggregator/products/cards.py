@@ -0,0 +1,70 @@
+"""
+Cached HTML of the product cards in the public grids.
+
+A card only changes when its product, its seller's name, the language or
+the availability in the current city does, so its HTML is cached under a
+key made of those. The like button depends on the viewer and is rendered
+around the cached card by partials/_product_grid.html, as is the CSRF
+token, so one cached card serves every visitor.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from honduras_shop_aggregator.images.renditions import has_renditions
+
+CARD_TEMPLATE = 'partials/_product_card.html'
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def card_cache_key(product, is_owner):
+    version = (
+        product.updated_at.isoformat(),
+        # The image worker swaps images in with queryset updates on the base
+        # manager, which do not bump updated_at.
+        product.image.name or '',
+        # Renditions are written by the worker after the image is stored.
+        has_renditions(product.image),
+        product.seller.store_name,
+        product.origin_city.name,
+        getattr(product, 'city_availability', None),
+        get_language(),
+        is_owner,
+    )
+    digest = hashlib.md5(repr(version).encode()).hexdigest()
+    return f'products:card:{product.pk}:{digest}'
+
+
+def product_cards(products, owner_pk=None):
+    """
+    Returns (product, card HTML) pairs, reading every card from the cache
+    in one round trip and rendering only the missing ones.
+
+    Products of the seller whose user pk is `owner_pk` get the "Your
+    Product" badge.
+    """
+    products = list(products)
+    owned = [
+        owner_pk is not None and product.seller.user_id == owner_pk
+        for product in products
+    ]
+    keys = [
+        card_cache_key(product, is_owner)
+        for product, is_owner in zip(products, owned)
+    ]
+    cached = cache.get_many(keys)
+    rendered = {}
+    cards = []
+    for product, is_owner, key in zip(products, owned, keys):
+        html = cached.get(key)
+        if html is None:
+            html = rendered[key] = render_to_string(
+                CARD_TEMPLATE, {'product': product, 'is_owner': is_owner}
+            )
+        cards.append((product, mark_safe(html)))
+    if rendered:
+        cache.set_many(rendered, CARD_CACHE_TIMEOUT)
+    return cards
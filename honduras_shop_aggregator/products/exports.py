@@ -0,0 +1,133 @@
+"""
+Streaming catalog export, in the columns the product import reads, so an
+exported file can be imported again.
+
+Products are read with iterator(), a chunk at a time, and every row is
+written out as soon as it is read; memory use does not grow with the size
+of the catalog.
+
+CSV text cells a spreadsheet would run as a formula are quoted; the import
+removes the quote again.
+"""
+import csv
+import json
+
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+from honduras_shop_aggregator.images.fields import is_pending
+from honduras_shop_aggregator.products.imports import (CITY_SEPARATOR,
+                                                       FORMAT_CSV,
+                                                       FORMAT_JSONL,
+                                                       TEXT_FIELDS,
+                                                       escape_formula)
+from honduras_shop_aggregator.products.models import Product
+
+EXPORT_FORMATS = (FORMAT_CSV, FORMAT_JSONL)
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FIELDS = (
+    'slug',
+    'product_name',
+    'category',
+    'product_price',
+    'stock_quantity',
+    'description',
+    'is_active',
+    'product_link',
+    'origin_city',
+    'delivery_cities',
+    'image_url',
+)
+CONTENT_TYPES = {
+    FORMAT_CSV: 'text/csv; charset=utf-8',
+    FORMAT_JSONL: 'application/x-ndjson; charset=utf-8',
+}
+
+
+class Echo:
+    """A file-like object whose write() returns the line it was given."""
+
+    def write(self, value):
+        return value
+
+
+def export_queryset(queryset):
+    return (
+        queryset.select_related('seller', 'category', 'origin_city')
+        .prefetch_related('delivery_cities')
+        .annotate(image_name=F('image'))
+        .order_by('pk')
+    )
+
+
+def image_url(name, base_url):
+    field = Product._meta.get_field('image')
+    if not name or is_pending(name) or field.is_placeholder(name):
+        return ''
+    return f"{base_url}{field.storage.url(name)}"
+
+
+def export_rows(queryset, base_url='', chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields one dict per product, in EXPORT_FIELDS order. Image urls are
+    prefixed with `base_url` to make them absolute.
+    """
+    products = export_queryset(queryset).iterator(chunk_size=chunk_size)
+    for product in products:
+        row = {
+            'slug': product.slug,
+            'product_name': product.product_name,
+            'category': product.category.slug,
+            'product_price': str(product.product_price),
+            'stock_quantity': product.stock_quantity,
+            'description': product.description,
+            'is_active': product.is_active,
+            'product_link': product.product_link or '',
+            'origin_city': product.origin_city.name,
+            'delivery_cities': [
+                city.name for city in product.delivery_cities.all()
+            ],
+            'image_url': image_url(product.image_name, base_url),
+        }
+        # The prefetched queryset refers back to the product. Without this
+        # reference cycle each row is freed as soon as it is written, rather
+        # than by the cyclic garbage collector; the same goes for the image,
+        # read by name instead of through a FieldFile.
+        del product._prefetched_objects_cache
+        yield row
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        row['delivery_cities'] = CITY_SEPARATOR.join(row['delivery_cities'])
+        for field in TEXT_FIELDS:
+            row[field] = escape_formula(row[field])
+        yield writer.writerow(row.values())
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def export_lines(queryset, file_format, base_url='', chunk_size=EXPORT_CHUNK_SIZE):
+    """Yields the export of `queryset` line by line."""
+    rows = export_rows(queryset, base_url, chunk_size)
+    if file_format == FORMAT_CSV:
+        return csv_lines(rows)
+    return jsonl_lines(rows)
+
+
+def export_response(queryset, file_format, filename, base_url=''):
+    """A StreamingHttpResponse downloading the export as `filename`."""
+    response = StreamingHttpResponse(
+        export_lines(queryset, file_format, base_url),
+        content_type=CONTENT_TYPES[file_format]
+    )
+    response['Content-Disposition'] = content_disposition_header(
+        True, f'{filename}.{file_format}'
+    )
+    return response
@@ -1,12 +1,11 @@
-import re
-
 import django_filters
-from django.db.models import Case, IntegerField, Q, When
+from django.db.models import Case, IntegerField, When
 from django.utils.translation import gettext_lazy as _
-from unidecode import unidecode
 
 from honduras_shop_aggregator.categories.models import Category
 from honduras_shop_aggregator.products.models import Product
+from honduras_shop_aggregator.products.search import (get_search_backend,
+                                                      search_terms)
 from honduras_shop_aggregator.sellers.models import Seller
 
 
@@ -39,14 +38,7 @@ class ProductFilter(django_filters.FilterSet):
     def filter_search(self, queryset, name, value):
         if not value:
             return queryset
-        normalized_value = unidecode(value.strip().lower())
-        cleaned_value = re.sub(r"[^\w\s]|_", " ", normalized_value)
-        terms = cleaned_value.split()
-        for term in terms:
-            queryset = queryset.filter(
-                Q(product_name__icontains=term) |
-                Q(description__icontains=term)
-            )
+        queryset = get_search_backend().filter(queryset, search_terms(value))
         queryset = queryset.annotate(
             name_exact=Case(
                 When(product_name__iexact=value.strip(), then=1),
@@ -2,6 +2,7 @@ from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Field, Layout
 from django import forms
 from django.contrib.auth import authenticate
+from django.core.validators import FileExtensionValidator
 from django.forms.widgets import FileInput
 from django.utils.translation import gettext_lazy as _
 
@@ -25,6 +26,21 @@ class ProductCreateForm(forms.ModelForm):
         ]
 
 
+class ProductImportForm(forms.Form):
+    file = forms.FileField(
+        label=_("Products file"),
+        help_text=_(
+            "CSV or JSON lines file with the columns product_name, category, "
+            "product_price, stock_quantity, description, is_active, "
+            "product_link, origin_city, delivery_cities (separated by |) "
+            "and image_url."
+        ),
+        validators=[
+            FileExtensionValidator(['csv', 'jsonl', 'ndjson'])
+        ]
+    )
+
+
 class ProductImageUpdateForm(forms.ModelForm):
 
     class Meta:
@@ -0,0 +1,317 @@
+"""
+Bulk product import for sellers, from CSV or JSON lines files.
+
+The file is read one row at a time. Each row is validated with the rules of
+Product.clean, and valid rows are written in chunks with bulk_create,
+together with their delivery cities. Images given by
+url are queued for the image worker instead of being fetched here.
+"""
+import csv
+import io
+import json
+
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.db import IntegrityError, transaction
+from django.utils.translation import gettext as _
+
+from honduras_shop_aggregator.categories.models import Category
+from honduras_shop_aggregator.cities.registry import city_registry
+from honduras_shop_aggregator.images.jobs import validate_fetch_url
+from honduras_shop_aggregator.images.pipeline import queue_fetches
+from honduras_shop_aggregator.products.models import (Product,
+                                                      ProductAvailability)
+from honduras_shop_aggregator.slugs import SLUG_ATTEMPTS, allocate_slugs
+
+FORMAT_CSV = 'csv'
+FORMAT_JSONL = 'jsonl'
+IMPORT_FORMATS = (FORMAT_CSV, FORMAT_JSONL)
+IMPORT_CHUNK_SIZE = 500
+# Columns copied to the product as they are; the model fields validate them.
+IMPORT_FIELDS = (
+    'product_name',
+    'product_price',
+    'description',
+    'stock_quantity',
+    'is_active',
+    'product_link',
+)
+# Fields resolved by the importer itself, or filled in when writing.
+NOT_VALIDATED = ['seller', 'category', 'origin_city', 'slug', 'image']
+CITY_SEPARATOR = '|'
+# Spreadsheets run CSV cells starting with one of these as formulas, so the
+# text columns are exported with a quote before them, see escape_formula().
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+FORMULA_ESCAPE = "'"
+TEXT_FIELDS = ('product_name', 'description')
+TRUE_VALUES = {'1', 't', 'true', 'y', 'yes', 'si', 'sí'}
+FALSE_VALUES = {'0', 'f', 'false', 'n', 'no'}
+
+
+def import_format(file_name):
+    """The format of an import file, from its extension."""
+    if file_name.lower().endswith(('.jsonl', '.ndjson')):
+        return FORMAT_JSONL
+    return FORMAT_CSV
+
+
+def escape_formula(value):
+    """Quotes a cell a spreadsheet would run, or one already quoted."""
+    if value.startswith((*FORMULA_PREFIXES, FORMULA_ESCAPE)):
+        return FORMULA_ESCAPE + value
+    return value
+
+
+def unescape_formula(value):
+    """Reverts escape_formula()."""
+    if value.startswith(FORMULA_ESCAPE) and value[1:].startswith(
+        (*FORMULA_PREFIXES, FORMULA_ESCAPE)
+    ):
+        return value[1:]
+    return value
+
+
+def read_rows(file, file_format):
+    """
+    Yields (line number, row) from a binary file without reading it whole.
+
+    A JSON line that is not an object yields None as its row.
+    """
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    if file_format == FORMAT_CSV:
+        reader = csv.DictReader(text)
+        for row in reader:
+            for field in TEXT_FIELDS:
+                if row.get(field):
+                    row[field] = unescape_formula(row[field])
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def clean_value(value):
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def error_messages(error):
+    """One line for a ValidationError, prefixed with the fields it names."""
+    if not hasattr(error, 'error_dict'):
+        return " ".join(error.messages)
+    return " ".join(
+        " ".join(messages) if field == NON_FIELD_ERRORS
+        else f"{field}: {' '.join(messages)}"
+        for field, messages in error.message_dict.items()
+    )
+
+
+class ProductImporter:
+    """
+    Imports product rows for one seller.
+
+    Rows that fail validation are skipped and reported in `errors` as
+    (line number, message); the others are created chunk by chunk, so a
+    large file never holds more than one chunk of products in memory.
+    """
+
+    def __init__(self, seller, chunk_size=IMPORT_CHUNK_SIZE):
+        self.seller = seller
+        self.chunk_size = chunk_size
+        self.created = 0
+        self.images_queued = 0
+        self.errors = []
+        self.categories = {}
+        for category in Category.objects.all():
+            self.categories[str(category.pk)] = category.pk
+            self.categories[category.slug] = category.pk
+            self.categories[category.name.lower()] = category.pk
+        self.cities = {}
+        for city in city_registry.all():
+            self.cities[str(city.pk)] = city.pk
+            self.cities[city.name.lower()] = city.pk
+        self.delivery_cities = list(
+            seller.delivery_cities.values_list('pk', flat=True)
+        )
+        self.link_field = Product._meta.get_field('product_link')
+
+    def run(self, rows):
+        """Imports (line number, row) pairs; returns the importer."""
+        chunk = []
+        for line, row in rows:
+            imported = self.build(line, row)
+            if imported:
+                chunk.append(imported)
+            if len(chunk) == self.chunk_size:
+                self.write(chunk)
+                chunk = []
+        if chunk:
+            self.write(chunk)
+        return self
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+    def city(self, value):
+        return self.cities.get(str(value).strip().lower())
+
+    def build(self, line, row):
+        """
+        Validates a row; returns (line, product, delivery city pks, image
+        url), or None after recording why the row was skipped.
+        """
+        if row is None:
+            return self.error(line, _("The line is not a JSON object."))
+        row = {key.strip(): clean_value(value) for key, value in row.items() if key}
+        values = {
+            field: row[field] for field in IMPORT_FIELDS
+            if row.get(field) not in (None, '')
+        }
+        is_active = values.get('is_active')
+        if isinstance(is_active, str):
+            if is_active.lower() in TRUE_VALUES:
+                values['is_active'] = True
+            elif is_active.lower() in FALSE_VALUES:
+                values['is_active'] = False
+        product = Product(seller=self.seller, **values)
+
+        errors = {}
+        category = row.get('category')
+        product.category_id = self.categories.get(str(category or '').lower())
+        if product.category_id is None:
+            errors['category'] = [_("Unknown category: %s") % (category or '')]
+        origin_city = row.get('origin_city')
+        product.origin_city_id = (
+            self.city(origin_city) if origin_city else self.seller.city_id
+        )
+        if product.origin_city_id is None:
+            errors['origin_city'] = [_("Unknown city: %s") % (origin_city or '')]
+        delivery = row.get('delivery_cities')
+        if delivery in (None, ''):
+            delivery_cities = self.delivery_cities
+        else:
+            if isinstance(delivery, str):
+                delivery = delivery.split(CITY_SEPARATOR)
+            elif not isinstance(delivery, list):
+                delivery = [delivery]
+            names = [name for name in delivery if str(name).strip()]
+            delivery_cities = [self.city(name) for name in names]
+            unknown = [
+                str(name) for name, pk in zip(names, delivery_cities) if pk is None
+            ]
+            if unknown:
+                errors['delivery_cities'] = [
+                    _("Unknown city: %s") % ", ".join(unknown)
+                ]
+        image_url = row.get('image_url') or ''
+        if image_url:
+            try:
+                validate_fetch_url(image_url)
+            except ValidationError as e:
+                errors['image_url'] = e.messages
+
+        try:
+            product.clean_fields(exclude=NOT_VALIDATED)
+            product.clean()
+        except ValidationError as e:
+            e.update_error_dict(errors)
+        if errors:
+            return self.error(line, error_messages(ValidationError(errors)))
+        return line, product, set(delivery_cities), image_url
+
+    def write(self, chunk):
+        """Creates the products of a chunk of validated rows."""
+        links = {
+            product.product_link for _, product, _, _ in chunk
+            if product.product_link
+        }
+        taken = set(
+            Product.objects.filter(product_link__in=links)
+            .values_list('product_link', flat=True)
+        )
+        lines = {}
+        for line, product, delivery_cities, image_url in chunk:
+            if product.product_link in taken:
+                self.link_taken(line)
+                continue
+            if product.product_link:
+                taken.add(product.product_link)
+            lines[line] = (product, delivery_cities, image_url)
+
+        # A concurrent save can take one of the allocated slugs or product
+        # links first.
+        for attempt in range(1, SLUG_ATTEMPTS + 1):
+            if not lines:
+                return
+            products = [product for product, _, _ in lines.values()]
+            slugs = allocate_slugs(
+                Product.objects.all(),
+                [product.product_name for product in products],
+                max_length=Product._meta.get_field('slug').max_length
+            )
+            for product, slug in zip(products, slugs):
+                product.slug = slug
+            try:
+                with transaction.atomic():
+                    self.create(list(lines.values()))
+                break
+            except IntegrityError:
+                for product in products:
+                    product.pk = None
+                links = set(
+                    Product.objects.filter(product_link__in=[
+                        product.product_link for product in products
+                        if product.product_link
+                    ]).values_list('product_link', flat=True)
+                )
+                if links:
+                    for line, (product, _, _) in list(lines.items()):
+                        if product.product_link in links:
+                            self.link_taken(line)
+                            del lines[line]
+                elif attempt == SLUG_ATTEMPTS or not Product.objects.filter(
+                    slug__in=slugs
+                ).exists():
+                    raise
+        self.created += len(lines)
+        self.images_queued += sum(
+            1 for _, _, image_url in lines.values() if image_url
+        )
+
+    def link_taken(self, line):
+        unique_message = self.link_field.error_messages['unique']
+        self.error(line, f"product_link: {unique_message}")
+
+    def create(self, rows):
+        products = Product.objects.bulk_create(
+            [product for product, _, _ in rows]
+        )
+        Product.delivery_cities.through.objects.bulk_create(
+            Product.delivery_cities.through(product_id=product.pk, city_id=city)
+            for product, (_, delivery_cities, _) in zip(products, rows)
+            for city in delivery_cities
+        )
+        # Product.objects.bulk_create made the origin city rows; no
+        # m2m_changed is sent for the delivery cities, so theirs are added.
+        ProductAvailability.objects.bulk_create(
+            ProductAvailability(product_id=product.pk, city_id=city)
+            for product, (_, delivery_cities, _) in zip(products, rows)
+            for city in delivery_cities - {product.origin_city_id}
+        )
+        with_images = [
+            (product, image_url)
+            for product, (_, _, image_url) in zip(products, rows)
+            if image_url
+        ]
+        if with_images:
+            queue_fetches(
+                [product for product, _ in with_images],
+                'image',
+                [image_url for _, image_url in with_images]
+            )
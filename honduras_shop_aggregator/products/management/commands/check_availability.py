@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from honduras_shop_aggregator.products.models import ProductAvailability
+
+
+class Command(BaseCommand):
+    help = (
+        "Reports products whose availability rows do not match their origin "
+        "and delivery cities. Read-only; run rebuild_availability to repair."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        missing_count = extra_count = 0
+        for _, missing, extra in ProductAvailability.objects.reconcile(
+            chunk_size=options['chunk_size']
+        ):
+            for product_id, city_id in sorted(missing):
+                self.stdout.write(
+                    f"missing: product {product_id} in city {city_id}"
+                )
+            missing_count += len(missing)
+            extra_count += len(extra)
+            if extra:
+                self.stdout.write(
+                    f"stale rows: {', '.join(str(pk) for pk in sorted(extra))}"
+                )
+        if missing_count or extra_count:
+            raise CommandError(
+                f"Availability is inconsistent: {missing_count} missing, "
+                f"{extra_count} stale rows."
+            )
+        self.stdout.write(self.style.SUCCESS("Availability is consistent."))
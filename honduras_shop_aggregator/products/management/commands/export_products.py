@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from honduras_shop_aggregator.products.exports import (EXPORT_CHUNK_SIZE,
+                                                       EXPORT_FORMATS,
+                                                       export_lines)
+from honduras_shop_aggregator.products.imports import FORMAT_CSV, import_format
+from honduras_shop_aggregator.products.models import Product
+from honduras_shop_aggregator.sellers.models import Seller
+
+
+class Command(BaseCommand):
+    help = "Exports products as CSV or JSON lines, streaming them to a file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', help="File to write; the export goes to stdout without it."
+        )
+        parser.add_argument('--seller', help="Store name of a single seller.")
+        parser.add_argument(
+            '--format', choices=EXPORT_FORMATS,
+            help="Defaults to the one named by the output extension, or csv."
+        )
+        parser.add_argument('--include-deleted', action='store_true')
+        parser.add_argument(
+            '--base-url', default='',
+            help="Prefix that makes image urls absolute, e.g. https://example.com"
+        )
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['seller']:
+            try:
+                seller = Seller.objects.get(store_name=options['seller'])
+            except Seller.DoesNotExist:
+                raise CommandError(
+                    f"No seller with store name {options['seller']}."
+                )
+            products = products.filter(seller=seller)
+        if not options['include_deleted']:
+            products = products.filter(is_deleted=False)
+        output = options['output']
+        file_format = options['format'] or import_format(output or '')
+        lines = export_lines(
+            products, file_format, options['base_url'].rstrip('/'),
+            options['chunk_size']
+        )
+        if not output:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        # The CSV header is not a product.
+        count = -1 if file_format == FORMAT_CSV else 0
+        with open(output, 'w', encoding='utf-8', newline='') as f:
+            for line in lines:
+                f.write(line)
+                count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Products exported: {count} to {output}."
+        ))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from honduras_shop_aggregator.products.imports import (IMPORT_CHUNK_SIZE,
+                                                       IMPORT_FORMATS,
+                                                       ProductImporter,
+                                                       import_format,
+                                                       read_rows)
+from honduras_shop_aggregator.sellers.models import Seller
+
+
+class Command(BaseCommand):
+    help = "Imports products for a seller from a CSV or JSON lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--seller', required=True, help="Store name of the seller."
+        )
+        parser.add_argument(
+            '--format', choices=IMPORT_FORMATS,
+            help="Defaults to the one named by the file extension."
+        )
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            seller = Seller.objects.get(store_name=options['seller'])
+        except Seller.DoesNotExist:
+            raise CommandError(f"No seller with store name {options['seller']}.")
+        file_format = options['format'] or import_format(options['path'])
+        importer = ProductImporter(seller, chunk_size=options['chunk_size'])
+        try:
+            with open(options['path'], 'rb') as file:
+                importer.run(read_rows(file, file_format))
+        except (OSError, UnicodeDecodeError) as e:
+            raise CommandError(
+                f"Import stopped after {importer.created} products: {e}"
+            )
+        for line, message in importer.errors:
+            self.stderr.write(f"Line {line}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Products imported: {importer.created} created, "
+            f"{len(importer.errors)} rows skipped, "
+            f"{importer.images_queued} images queued."
+        ))
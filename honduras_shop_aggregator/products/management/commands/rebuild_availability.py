@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from honduras_shop_aggregator.products.models import ProductAvailability
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the product availability table from origin and delivery cities."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        added = removed = 0
+        for _, missing, extra in ProductAvailability.objects.reconcile(
+            fix=True, chunk_size=options['chunk_size']
+        ):
+            added += len(missing)
+            removed += len(extra)
+        self.stdout.write(self.style.SUCCESS(
+            f"Availability rebuilt: {added} rows added, {removed} rows removed."
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from honduras_shop_aggregator.products.models import Product
+from honduras_shop_aggregator.products.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Recomputes product search documents and rebuilds the search index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = Product.objects.all().rebuild_search_documents(
+            batch_size=options['batch_size']
+        )
+        backend = get_search_backend()
+        with connection.cursor() as cursor:
+            backend.install(cursor)
+            backend.rebuild(cursor)
+        self.stdout.write(self.style.SUCCESS(
+            f"Search index rebuilt, {updated} documents updated."
+        ))
@@ -0,0 +1,37 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from honduras_shop_aggregator.response_cache import (
+    reset_response_cache_stats, response_cache_stats)
+
+
+class Command(BaseCommand):
+    help = (
+        "Prints the hits, misses, hit ratio and mean response times of the "
+        "anonymous response cache for every cached view."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help="Zero the counters after printing them."
+        )
+
+    def handle(self, *args, **options):
+        # Views register with the response cache when their module is imported.
+        import_module(settings.ROOT_URLCONF)
+        self.stdout.write(
+            f"{'view':<26} {'hits':>8} {'misses':>8} {'ratio':>6} "
+            f"{'hit ms':>8} {'miss ms':>8}"
+        )
+        for view_name, stats in response_cache_stats().items():
+            self.stdout.write(
+                f"{view_name:<26} {stats['hits']:>8} {stats['misses']:>8} "
+                f"{stats['hit_ratio']:>6.1%} {stats['hit_ms']:>8.2f} "
+                f"{stats['miss_ms']:>8.2f}"
+            )
+        if options['reset']:
+            reset_response_cache_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
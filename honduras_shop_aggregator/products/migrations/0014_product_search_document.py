@@ -0,0 +1,52 @@
+# Generated by Django 5.1.15 on 2026-10-18 08:12
+
+from django.db import migrations, models
+
+from honduras_shop_aggregator.products.search import (build_search_document,
+                                                      get_search_backend)
+
+BATCH_SIZE = 1000
+
+
+def populate_search_documents(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    products = Product.objects.only(
+        'pk', 'product_name', 'description'
+    ).order_by('pk')
+    last_pk = 0
+    while batch := list(products.filter(pk__gt=last_pk)[:BATCH_SIZE]):
+        for product in batch:
+            product.search_document = build_search_document(
+                product.product_name, product.description
+            )
+        Product.objects.bulk_update(batch, ['search_document'])
+        last_pk = batch[-1].pk
+
+
+def install_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        get_search_backend(connection).install(cursor)
+
+
+def uninstall_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        get_search_backend(connection).uninstall(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_productimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
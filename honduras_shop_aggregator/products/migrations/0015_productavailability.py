@@ -0,0 +1,45 @@
+# Generated by Django 5.1.15 on 2026-10-18 08:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_availability(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductAvailability = apps.get_model('products', 'ProductAvailability')
+    pairs = set(Product.objects.values_list('pk', 'origin_city_id'))
+    pairs |= set(
+        Product.delivery_cities.through.objects.values_list('product_id', 'city_id')
+    )
+    ProductAvailability.objects.bulk_create(
+        [
+            ProductAvailability(product_id=product_id, city_id=city_id)
+            for product_id, city_id in pairs
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cities', '0001_initial'),
+        ('products', '0014_product_search_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='available_products', to='cities.city')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Product availability',
+                'verbose_name_plural': 'Product availability',
+                'constraints': [models.UniqueConstraint(fields=('city', 'product'), name='unique_city_product_availability')],
+            },
+        ),
+        migrations.RunPython(populate_availability, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.15 on 2026-10-18 08:40
+
+from django.db import migrations
+
+import honduras_shop_aggregator.image_utils
+import honduras_shop_aggregator.images.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0015_productavailability'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=honduras_shop_aggregator.images.fields.ProcessedImageField(blank=True, default='products/placeholder.png', help_text='Upload JPEG or PNG image up to 15MB.', null=True, upload_to=honduras_shop_aggregator.image_utils.image_upload_path, validators=[honduras_shop_aggregator.image_utils.validate_image]),
+        ),
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=honduras_shop_aggregator.images.fields.ProcessedImageField(help_text='Upload JPEG or PNG image up to 15MB.', upload_to=honduras_shop_aggregator.image_utils.image_upload_path, validators=[honduras_shop_aggregator.image_utils.validate_image]),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.15 on 2026-10-18 10:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0002_alter_category_options'),
+        ('cities', '0001_initial'),
+        ('products', '0016_alter_product_image_alter_productimage_image'),
+        ('sellers', '0011_alter_seller_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_deleted', False), ('stock_quantity__gt', 0)), fields=['-date_added', '-id'], name='product_visible_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_deleted', False), ('stock_quantity__gt', 0)), fields=['category', '-date_added', '-id'], name='product_visible_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_deleted', False), ('stock_quantity__gt', 0)), fields=['product_price'], name='product_visible_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['seller', '-date_added', '-id'], name='product_seller_recent_idx'),
+        ),
+    ]
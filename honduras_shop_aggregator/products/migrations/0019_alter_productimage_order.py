@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0018_product_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productimage',
+            name='order',
+            field=models.PositiveIntegerField(blank=True, help_text='Display order', null=True),
+        ),
+    ]
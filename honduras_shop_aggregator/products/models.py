@@ -1,19 +1,27 @@
-import os
+import random
 import re
 
 from django import forms
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import (Case, Count, Exists, ExpressionWrapper, F,
+                              OuterRef, Q, Subquery, Value, When)
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 
 from honduras_shop_aggregator.categories.models import Category
 from honduras_shop_aggregator.cities.models import City
 from honduras_shop_aggregator.image_utils import (image_upload_path,
-                                                  process_image,
                                                   validate_image)
+from honduras_shop_aggregator.images.fields import ProcessedImageField
+from honduras_shop_aggregator.images.pipeline import ProcessedImageMixin
+from honduras_shop_aggregator.products.search import build_search_document
+from honduras_shop_aggregator.response_cache import (MAX_PRODUCT_TAGS,
+                                                     invalidate,
+                                                     invalidate_products)
 from honduras_shop_aggregator.sellers.models import Seller
+from honduras_shop_aggregator.slugs import save_with_slug
 from honduras_shop_aggregator.users.models import User
 
 
@@ -24,11 +32,218 @@ class HttpsURLField(models.URLField):
         return super().formfield(**defaults)
 
 
-class Product(models.Model):
+# Two primes below 2**31: every intermediate product of the shuffle key stays
+# inside a signed 64-bit integer on both PostgreSQL and SQLite.
+SHUFFLE_MODULUS = 2147483647
+SHUFFLE_MIX_MODULUS = 2147483629
+SEARCH_SOURCE_FIELDS = {'product_name', 'description'}
+AVAILABILITY_SOURCE_FIELDS = {'origin_city', 'origin_city_id'}
+AVAILABILITY_LOCAL = 'local'
+AVAILABILITY_DELIVERY = 'delivery'
+AVAILABILITY_UNAVAILABLE = 'unavailable'
+# Products shown on public listings. The partial indexes in Product.Meta
+# use the same condition, so queries filtered with visible() can read them.
+VISIBLE = Q(is_active=True, stock_quantity__gt=0, is_deleted=False)
+
+
+class ProductQuerySet(models.QuerySet):
+
+    def visible(self):
+        """Active, in stock and not deleted products."""
+        return self.filter(VISIBLE)
+
+    def shuffled(self, seed):
+        """
+        Orders products by a pseudo-random key derived from pk and seed.
+
+        The key is computed by the database, so paginating the result
+        fetches only the rows of the requested page. The same seed always
+        gives the same order; ties are broken by pk.
+        """
+        rng = random.Random(seed)
+        multiplier, offset, mix, mix_offset = (
+            rng.randint(1, SHUFFLE_MODULUS - 1) for _ in range(4)
+        )
+        spread = (F('pk') * multiplier + offset) % SHUFFLE_MODULUS
+        return self.annotate(
+            shuffle_key=(
+                (spread * spread) % SHUFFLE_MODULUS * mix + mix_offset
+            ) % SHUFFLE_MIX_MODULUS
+        ).order_by('shuffle_key', 'pk')
+
+    def available_in(self, city_pk):
+        """Products sold in or delivered to the city, without duplicates."""
+        return self.filter(availability__city=city_pk)
+
+    def with_availability(self, city_pk):
+        """
+        Annotates city_availability for the city: local when the product
+        comes from it, delivery when it ships there, unavailable otherwise.
+        """
+        delivered = ProductAvailability.objects.filter(
+            product=OuterRef('pk'), city=city_pk
+        )
+        return self.annotate(
+            city_availability=Case(
+                When(origin_city=city_pk, then=Value(AVAILABILITY_LOCAL)),
+                When(Exists(delivered), then=Value(AVAILABILITY_DELIVERY)),
+                default=Value(AVAILABILITY_UNAVAILABLE),
+                output_field=models.CharField()
+            )
+        )
+
+    def for_grid(self, city_pk):
+        """Everything the product grid partial reads, without per-card queries."""
+        return self.select_related(
+            'seller', 'origin_city'
+        ).with_availability(city_pk)
+
+    def with_like_state(self, user, liked_pks=()):
+        """
+        Annotates likes_count and is_liked in the same query.
+
+        Anonymous visitors keep their likes in a cookie, so their pks
+        are passed in as liked_pks.
+        """
+        likes = self.model._meta.get_field('likes').related_model.objects.filter(
+            product=OuterRef('pk')
+        )
+        if user.is_authenticated:
+            is_liked = Exists(likes.filter(user=user.pk))
+        elif liked_pks:
+            is_liked = ExpressionWrapper(
+                Q(pk__in=liked_pks), output_field=models.BooleanField()
+            )
+        else:
+            is_liked = Value(False)
+        return self.annotate(
+            likes_count=Coalesce(
+                Subquery(
+                    likes.order_by().values('product')
+                    .annotate(total=Count('pk')).values('total')
+                ),
+                0
+            ),
+            is_liked=is_liked
+        )
+
+    def count_by_category(self):
+        """Maps category pk to its number of products in one grouped query."""
+        return dict(
+            self.order_by()
+            .values('category')
+            .annotate(total=Count('pk'))
+            .values_list('category', 'total')
+        )
+
+    def update(self, **kwargs):
+        kwargs.setdefault('updated_at', timezone.now())
+        reindex = SEARCH_SOURCE_FIELDS & kwargs.keys()
+        resync = AVAILABILITY_SOURCE_FIELDS & kwargs.keys()
+        # Taken before the update, which may change what the filter matches.
+        if reindex or resync:
+            pks = list(self.values_list('pk', flat=True))
+        elif self.query.has_filters():
+            # Past MAX_PRODUCT_TAGS every product page is invalidated anyway.
+            pks = list(
+                self.values_list('pk', flat=True)[:MAX_PRODUCT_TAGS + 1]
+            )
+        else:
+            pks = None
+        rows = super().update(**kwargs)
+        if reindex:
+            self.model.objects.filter(pk__in=pks).rebuild_search_documents()
+        if resync:
+            ProductAvailability.objects.sync(pks)
+        invalidate_products(pks)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.search_document = build_search_document(
+                obj.product_name, obj.description
+            )
+        created = super().bulk_create(objs, *args, **kwargs)
+        ProductAvailability.objects.sync(obj.pk for obj in created if obj.pk)
+        # No page can have been cached for a product that did not exist.
+        invalidate('products')
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        now = timezone.now()
+        for obj in objs:
+            obj.updated_at = now
+        fields = [*fields, 'updated_at']
+        if SEARCH_SOURCE_FIELDS & set(fields):
+            for obj in objs:
+                obj.search_document = build_search_document(
+                    obj.product_name, obj.description
+                )
+            fields = [*fields, 'search_document']
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        if AVAILABILITY_SOURCE_FIELDS & set(fields):
+            ProductAvailability.objects.sync(obj.pk for obj in objs)
+        invalidate_products(obj.pk for obj in objs)
+        return rows
+
+    def rebuild_search_documents(self, batch_size=1000):
+        """Recomputes search_document for every product in the queryset."""
+        products = self.only(
+            'pk', 'product_name', 'description', 'search_document'
+        ).order_by('pk')
+        batch = []
+        updated = 0
+        for product in products.iterator(chunk_size=batch_size):
+            document = build_search_document(
+                product.product_name, product.description
+            )
+            if product.search_document != document:
+                product.search_document = document
+                batch.append(product)
+            if len(batch) >= batch_size:
+                updated += self.model.objects.bulk_update(
+                    batch, ['search_document']
+                )
+                batch = []
+        if batch:
+            updated += self.model.objects.bulk_update(batch, ['search_document'])
+        return updated
+
+
+class Product(ProcessedImageMixin, models.Model):
 
     class Meta:
         ordering = ['-date_added']
         verbose_name = "Product"
+        # Listings page through (-date_added, -id), see pagination.py.
+        indexes = [
+            models.Index(
+                fields=['-date_added', '-id'],
+                condition=VISIBLE,
+                name='product_visible_recent_idx'
+            ),
+            models.Index(
+                fields=['category', '-date_added', '-id'],
+                condition=VISIBLE,
+                name='product_visible_category_idx'
+            ),
+            models.Index(
+                fields=['product_price'],
+                condition=VISIBLE,
+                name='product_visible_price_idx'
+            ),
+            # Also serves the seller's own dashboard, which lists hidden and
+            # out of stock products too.
+            models.Index(
+                fields=['seller', '-date_added', '-id'],
+                condition=Q(is_deleted=False),
+                name='product_seller_recent_idx'
+            ),
+        ]
+
+    objects = ProductQuerySet.as_manager()
 
     users = models.ManyToManyField(
         User,
@@ -89,6 +304,8 @@ class Product(models.Model):
         help_text=_("Description of the product.")
     )
     date_added = models.DateTimeField(default=timezone.now)
+    # Bumped by every save and queryset update; cached cards are keyed on it.
+    updated_at = models.DateTimeField(default=timezone.now, editable=False)
     is_active = models.BooleanField(default=True)
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
@@ -101,7 +318,7 @@ class Product(models.Model):
         max_length=255,
         blank=False
     )
-    image = models.ImageField(
+    image = ProcessedImageField(
         upload_to=image_upload_path,
         validators=[validate_image],
         blank=True,
@@ -109,6 +326,7 @@ class Product(models.Model):
         default='products/placeholder.png',
         help_text=_("Upload JPEG or PNG image up to 15MB.")
     )
+    search_document = models.TextField(blank=True, default='', editable=False)
 
     @property
     def is_available(self):
@@ -119,43 +337,25 @@ class Product(models.Model):
         )
 
     def save(self, *args, **kwargs):
-
         if not self.slug:
-            base_slug = slugify(self.product_name)
-            slug = base_slug
-            num = 1
-            while Product.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{num}"
-                num += 1
-            self.slug = slug
-
-        self.full_clean()
+            return save_with_slug(
+                self, lambda: self.save(*args, **kwargs), self.product_name
+            )
 
-        old_image_path = None
-        old_image_name = None
-        if self.pk:
-            try:
-                old = Product.objects.get(pk=self.pk)
-                old_image_name = old.image.name
-                if (
-                    old.image
-                    and old.image != self.image
-                    and old.image.name != 'products/placeholder.png'
-                ):
-                    old_image_path = old.image.path
-            except Product.DoesNotExist:
-                pass
+        update_fields = kwargs.get('update_fields')
+        self.updated_at = timezone.now()
+        if update_fields is not None:
+            update_fields = kwargs['update_fields'] = {*update_fields, 'updated_at'}
+        if update_fields is None or SEARCH_SOURCE_FIELDS & set(update_fields):
+            self.search_document = build_search_document(
+                self.product_name, self.description
+            )
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'search_document'}
 
+        self.full_clean()
         super().save(*args, **kwargs)
 
-        if (
-            self.image
-            and self.image.name != 'products/placeholder.png'
-            and self.image.name != old_image_name
-        ):
-            process_image(self.image.path)
-            if old_image_path and os.path.exists(old_image_path):
-                os.remove(old_image_path)
     def clean(self):
         super().clean()
 
@@ -205,7 +405,114 @@ class Product(models.Model):
 # you may change is_activesetting or if you want to replace that 
 # card with the new one first delete that product
 
-class ProductImage(models.Model):
+class ProductAvailabilityQuerySet(models.QuerySet):
+
+    def diff(self, product_ids):
+        """
+        Compares the stored rows of the given products with the cities they
+        should be available in.
+
+        Returns the missing (product_id, city_id) pairs and the pks of the
+        rows that should not exist.
+        """
+        product_ids = set(product_ids)
+        if not product_ids:
+            return set(), []
+        expected = set(
+            Product.objects.filter(pk__in=product_ids)
+            .values_list('pk', 'origin_city_id')
+        )
+        expected |= set(
+            Product.delivery_cities.through.objects
+            .filter(product_id__in=product_ids)
+            .values_list('product_id', 'city_id')
+        )
+        existing = {
+            (product_id, city_id): pk
+            for pk, product_id, city_id in self.model.objects.filter(
+                product_id__in=product_ids
+            ).values_list('pk', 'product_id', 'city_id')
+        }
+        missing = expected - existing.keys()
+        extra = [pk for pair, pk in existing.items() if pair not in expected]
+        return missing, extra
+
+    def sync(self, product_ids):
+        """Brings the rows of the given products up to date."""
+        missing, extra = self.diff(product_ids)
+        if extra:
+            self.model.objects.filter(pk__in=extra).delete()
+        if missing:
+            self.model.objects.bulk_create(
+                [
+                    self.model(product_id=product_id, city_id=city_id)
+                    for product_id, city_id in missing
+                ],
+                ignore_conflicts=True
+            )
+        return len(missing), len(extra)
+
+    def reconcile(self, fix=False, chunk_size=1000):
+        """
+        Checks every product in chunks of chunk_size and optionally repairs
+        the differences.
+
+        Yields (product_ids, missing, extra) for each inconsistent chunk.
+        """
+        product_ids = Product.objects.order_by('pk').values_list('pk', flat=True)
+        chunk = []
+        for product_id in product_ids.iterator(chunk_size=chunk_size):
+            chunk.append(product_id)
+            if len(chunk) == chunk_size:
+                yield from self._reconcile_chunk(chunk, fix)
+                chunk = []
+        if chunk:
+            yield from self._reconcile_chunk(chunk, fix)
+
+    def _reconcile_chunk(self, product_ids, fix):
+        missing, extra = self.diff(product_ids)
+        if missing or extra:
+            if fix:
+                self.sync(product_ids)
+            yield product_ids, missing, extra
+
+
+class ProductAvailability(models.Model):
+    """
+    Denormalized list of the cities a product can be bought in: its origin
+    city plus every delivery city, one row each.
+    """
+
+    class Meta:
+        verbose_name = "Product availability"
+        verbose_name_plural = "Product availability"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['city', 'product'], name='unique_city_product_availability'
+            )
+        ]
+
+    city = models.ForeignKey(
+        City,
+        on_delete=models.CASCADE,
+        related_name='available_products'
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='availability'
+    )
+
+    objects = ProductAvailabilityQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.product} in {self.city}"
+
+
+GALLERY_LIMIT = 8
+
+
+class ProductImage(ProcessedImageMixin, models.Model):
 
     product = models.ForeignKey(
         Product,
@@ -213,7 +520,7 @@ class ProductImage(models.Model):
         related_name="gallery",
     )
 
-    image = models.ImageField(
+    image = ProcessedImageField(
         upload_to=image_upload_path,
         validators=[validate_image],
         help_text=_("Upload JPEG or PNG image up to 15MB.")
@@ -236,13 +543,6 @@ class ProductImage(models.Model):
             )
             self.order = 1 if last is None else last.order + 1
         super().save(*args, **kwargs)
-        process_image(self.image.path)
-
-    def delete(self, *args, **kwargs):
-        image_path = self.image.path if self.image else None
-        super().delete(*args, **kwargs)
-        if image_path and os.path.exists(image_path):
-            os.remove(image_path)
 
     def __str__(self):
         return f"{self.product.product_name} - Image #{self.order}"
@@ -0,0 +1,140 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from unidecode import unidecode
+
+POSTGRES_SEARCH_INDEX = 'products_product_search_trgm'
+SQLITE_SEARCH_TABLE = 'products_product_search'
+SQLITE_TRIGRAM_MIN_LENGTH = 3
+
+
+def normalize_search_text(value):
+    """Lowercases, transliterates and strips punctuation, as the filter did."""
+    normalized_value = unidecode((value or '').strip().lower())
+    return re.sub(r"[^\w\s]|_", " ", normalized_value)
+
+
+def search_terms(value):
+    return normalize_search_text(value).split()
+
+
+def build_search_document(product_name, description):
+    return " ".join(search_terms(f"{product_name or ''} {description or ''}"))
+
+
+class DatabaseSearchBackend:
+    """Substring search over Product.search_document without an index."""
+
+    def filter(self, queryset, terms):
+        for term in terms:
+            queryset = queryset.filter(search_document__contains=term)
+        return queryset
+
+    def install(self, cursor):
+        pass
+
+    def uninstall(self, cursor):
+        pass
+
+    def rebuild(self, cursor):
+        pass
+
+
+class PostgresSearchBackend(DatabaseSearchBackend):
+    """
+    Same lookups, served by a pg_trgm GIN index on search_document.
+
+    A trigram index answers the LIKE '%term%' lookups the filter has always
+    used, so results stay identical to the unindexed search.
+    """
+
+    def install(self, cursor):
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {POSTGRES_SEARCH_INDEX} "
+            "ON products_product USING gin (search_document gin_trgm_ops)"
+        )
+
+    def uninstall(self, cursor):
+        cursor.execute(f"DROP INDEX IF EXISTS {POSTGRES_SEARCH_INDEX}")
+
+
+class SQLiteSearchBackend(DatabaseSearchBackend):
+    """
+    FTS5 trigram index over Product.search_document for local development.
+
+    Terms shorter than a trigram cannot be matched by the index and fall
+    back to a LIKE lookup.
+    """
+
+    def filter(self, queryset, terms):
+        indexed = [t for t in terms if len(t) >= SQLITE_TRIGRAM_MIN_LENGTH]
+        short = [t for t in terms if len(t) < SQLITE_TRIGRAM_MIN_LENGTH]
+        if indexed:
+            match = " AND ".join(f'"{term}"' for term in indexed)
+            queryset = queryset.filter(pk__in=RawSQL(
+                f"SELECT rowid FROM {SQLITE_SEARCH_TABLE} "
+                f"WHERE {SQLITE_SEARCH_TABLE} MATCH %s",
+                [match]
+            ))
+        return super().filter(queryset, short)
+
+    def install(self, cursor):
+        """Creates the FTS table and its sync triggers if they are missing."""
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [SQLITE_SEARCH_TABLE]
+        )
+        created = cursor.fetchone() is None
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_SEARCH_TABLE} "
+            "USING fts5(search_document, content='products_product', "
+            "content_rowid='id', tokenize='trigram')"
+        )
+        # Table rebuilds done by SQLite schema migrations drop these
+        # triggers, so they are recreated after every migrate.
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {SQLITE_SEARCH_TABLE}_ai "
+            "AFTER INSERT ON products_product BEGIN "
+            f"INSERT INTO {SQLITE_SEARCH_TABLE}(rowid, search_document) "
+            "VALUES (new.id, new.search_document); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {SQLITE_SEARCH_TABLE}_ad "
+            "AFTER DELETE ON products_product BEGIN "
+            f"INSERT INTO {SQLITE_SEARCH_TABLE}"
+            f"({SQLITE_SEARCH_TABLE}, rowid, search_document) "
+            "VALUES ('delete', old.id, old.search_document); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {SQLITE_SEARCH_TABLE}_au "
+            "AFTER UPDATE OF search_document ON products_product BEGIN "
+            f"INSERT INTO {SQLITE_SEARCH_TABLE}"
+            f"({SQLITE_SEARCH_TABLE}, rowid, search_document) "
+            "VALUES ('delete', old.id, old.search_document); "
+            f"INSERT INTO {SQLITE_SEARCH_TABLE}(rowid, search_document) "
+            "VALUES (new.id, new.search_document); END"
+        )
+        if created:
+            self.rebuild(cursor)
+
+    def uninstall(self, cursor):
+        for suffix in ('ai', 'ad', 'au'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {SQLITE_SEARCH_TABLE}_{suffix}")
+        cursor.execute(f"DROP TABLE IF EXISTS {SQLITE_SEARCH_TABLE}")
+
+    def rebuild(self, cursor):
+        cursor.execute(
+            f"INSERT INTO {SQLITE_SEARCH_TABLE}({SQLITE_SEARCH_TABLE}) "
+            "VALUES ('rebuild')"
+        )
+
+
+def get_search_backend(using=None):
+    vendor = connection.vendor if using is None else using.vendor
+    if vendor == 'postgresql':
+        return PostgresSearchBackend()
+    if vendor == 'sqlite':
+        return SQLiteSearchBackend()
+    return DatabaseSearchBackend()
@@ -0,0 +1,94 @@
+from django.db import connections
+from django.db.models.signals import (m2m_changed, post_delete, post_migrate,
+                                      post_save)
+from django.dispatch import receiver
+
+from honduras_shop_aggregator.images.signals import image_swapped
+from honduras_shop_aggregator.products.models import (Product,
+                                                      ProductAvailability,
+                                                      ProductImage)
+from honduras_shop_aggregator.products.search import (build_search_document,
+                                                      get_search_backend)
+from honduras_shop_aggregator.response_cache import invalidate_products
+
+
+@receiver(post_save, sender=Product)
+def index_loaded_product(sender, instance, raw, **kwargs):
+    # Fixtures bypass Product.save, so their search document is built here.
+    if raw:
+        Product.objects.filter(pk=instance.pk).update(
+            search_document=build_search_document(
+                instance.product_name, instance.description
+            )
+        )
+
+
+@receiver(post_save, sender=Product)
+def sync_origin_availability(sender, instance, created, update_fields, **kwargs):
+    if (
+        created
+        or update_fields is None
+        or {'origin_city', 'origin_city_id'} & set(update_fields)
+    ):
+        ProductAvailability.objects.sync([instance.pk])
+
+
+@receiver(m2m_changed, sender=Product.delivery_cities.through)
+def sync_delivery_availability(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        product_ids = [instance.pk]
+    elif action == 'post_clear':
+        # The city's delivery rows are gone, but its availability rows are
+        # not yet, so they still name the affected products.
+        product_ids = instance.available_products.values_list(
+            'product_id', flat=True
+        )
+    else:
+        product_ids = pk_set
+    product_ids = list(product_ids)
+    ProductAvailability.objects.sync(product_ids)
+    invalidate_products(product_ids)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_pages(sender, instance, **kwargs):
+    invalidate_products([instance.pk])
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_gallery_pages(sender, instance, **kwargs):
+    invalidate_products([instance.product_id])
+
+
+@receiver(image_swapped, sender=Product)
+def invalidate_swapped_product_images(sender, pks, **kwargs):
+    invalidate_products(pks)
+
+
+@receiver(image_swapped, sender=ProductImage)
+def invalidate_swapped_gallery_images(sender, pks, instances=None, **kwargs):
+    if instances is None:
+        product_ids = ProductImage.objects.filter(pk__in=pks).values_list(
+            'product_id', flat=True
+        )
+    else:
+        product_ids = {image.product_id for image in instances}
+    invalidate_products(product_ids)
+
+
+@receiver(post_migrate)
+def install_search_index(sender, using, **kwargs):
+    if sender.label != 'products':
+        return
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        columns = connection.introspection.get_table_description(
+            cursor, Product._meta.db_table
+        )
+        # Nothing to index when migrating back past the search_document field.
+        if 'search_document' in {column.name for column in columns}:
+            get_search_backend(connection).install(cursor)
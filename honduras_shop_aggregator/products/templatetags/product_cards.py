@@ -0,0 +1,20 @@
+from django import template
+
+from honduras_shop_aggregator.products import cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def product_cards(context, products):
+    """
+    Pairs each product with its cached card:
+
+        {% product_cards products as cards %}
+        {% for product, card in cards %}...{{ card }}...{% endfor %}
+    """
+    user = context.get('user')
+    owner_pk = None
+    if context.get('seller_features_enabled') and user and user.is_authenticated:
+        owner_pk = user.pk
+    return cards.product_cards(products, owner_pk)
@@ -1,8 +1,10 @@
 from bs4 import BeautifulSoup
+from django.core.management import call_command
 from django.urls import reverse
 from django.utils.translation import gettext as _
 
 from honduras_shop_aggregator.categories.models import Category
+from honduras_shop_aggregator.products.filters import ProductFilter
 from honduras_shop_aggregator.products.models import Product
 from honduras_shop_aggregator.utils import BaseTestCase
 
@@ -120,6 +122,66 @@ class TestProductSearch(BaseTestCase):
         )
 
 
+class TestProductSearchIndex(BaseTestCase):
+
+    def setUp(self):
+        self.product = Product.objects.get(product_name='testproduct')
+
+    def search(self, value):
+        return list(
+            ProductFilter({"search": value}, queryset=Product.objects.all()).qs
+        )
+
+    def test_search_document_is_normalized(self):
+        self.product.product_name = "Camiseta Bordada_Única"
+        self.product.save()
+        self.product.refresh_from_db()
+        self.assertTrue(
+            self.product.search_document.startswith("camiseta bordada unica")
+        )
+        self.assertIn(self.product, self.search("unica"))
+        self.assertIn(self.product, self.search("ÚNICA"))
+
+    def test_partial_and_short_terms(self):
+        self.assertIn(self.product, self.search("stprod"))
+        self.assertIn(self.product, self.search("te"))
+        self.assertNotIn(self.product, self.search("zz"))
+
+    def test_queryset_update_reindexes(self):
+        Product.objects.filter(pk=self.product.pk).update(product_name="renamed")
+        self.assertNotIn(self.product, self.search("testproduct"))
+        self.assertIn(self.product, self.search("renamed"))
+
+    def test_update_fields_save_reindexes(self):
+        self.product.description = "handmade leather"
+        self.product.save(update_fields=["description"])
+        self.assertIn(self.product, self.search("leather"))
+
+    def test_bulk_create_is_indexed(self):
+        product = Product.objects.bulk_create([Product(
+            product_name="bulk sombrero",
+            slug="bulk-sombrero",
+            product_price=10,
+            seller=self.product.seller,
+            category=self.product.category,
+            origin_city=self.product.origin_city,
+        )])[0]
+        self.assertIn(product, self.search("sombrero"))
+
+    def test_exact_name_match_first(self):
+        Product.objects.filter(pk=self.product.pk).update(
+            product_name="product"
+        )
+        results = self.search("Product")
+        self.assertEqual(results[0], self.product)
+
+    def test_rebuild_command_restores_documents(self):
+        Product.objects.all().update(search_document="")
+        self.assertNotIn(self.product, self.search("testproduct"))
+        call_command("rebuild_search_index", verbosity=0)
+        self.assertIn(self.product, self.search("testproduct"))
+
+
 class TestProductFilters(BaseTestCase):
 
     def setUp(self):
@@ -1,22 +1,44 @@
+import csv
 import io
 import json
 import os
 import shutil
 import tempfile
+from unittest import mock
 
 from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.template.loader import render_to_string
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import translation
 from django.utils.text import slugify
 from django.utils.translation import gettext as _
 from PIL import Image
 
 from honduras_shop_aggregator.categories.models import Category
 from honduras_shop_aggregator.cities.models import City
-from honduras_shop_aggregator.products.models import Product
-from honduras_shop_aggregator.products.views import ProductFilterView
+from honduras_shop_aggregator.cities.registry import CAPITAL_CITY_PK
+from honduras_shop_aggregator.images.models import ImageJob
+from honduras_shop_aggregator.pagination import KeysetPaginator
+from honduras_shop_aggregator.products.cards import product_cards
+from honduras_shop_aggregator.products.exports import (export_lines,
+                                                       export_response)
+from honduras_shop_aggregator.products.models import (Product,
+                                                      ProductAvailability,
+                                                      ProductImage)
+from honduras_shop_aggregator.products.views import (ProductCardView,
+                                                     ProductFilterView)
+from honduras_shop_aggregator.response_cache import (CSRF_PLACEHOLDER,
+                                                     response_cache_stats,
+                                                     tag_key)
 from honduras_shop_aggregator.sellers.models import Seller
+from honduras_shop_aggregator.slugs import allocate_slugs, next_free_slug
 from honduras_shop_aggregator.users.models import User
 from honduras_shop_aggregator.utils import BaseTestCase, get_file_hash
 
@@ -147,9 +169,10 @@ class TestProductListRead(BaseTestCase):
 
     def test_load_more_second_page_returns_next_batch(self):
         self.create_extra_products(self.paginate_by + 5)
+        first_page = self.client.get(reverse("product_list"))
         response = self.client.get(
             reverse("product_list"),
-            {"page": 2},
+            {"cursor": first_page.context["page_obj"].next_cursor},
             HTTP_X_REQUESTED_WITH="XMLHttpRequest"
         )
         self.assertEqual(response.status_code, 200)
@@ -168,9 +191,344 @@ class TestProductListRead(BaseTestCase):
 
     def test_no_load_more_on_last_page(self):
         self.create_extra_products(self.paginate_by + 5)
-        response = self.client.get(reverse("product_list"), {"page": self.pages_count})
-        self.assertEqual(response.status_code, 200)
-        self.assertNotContains(response, _("Load More"))
+        response = self.client.get(reverse("product_list"))
+        pages = 1
+        data = {
+            "has_next": True,
+            "next_page": response.context["page_obj"].next_cursor
+        }
+        while data["has_next"]:
+            data = self.client.get(
+                reverse("product_list"),
+                {"cursor": data["next_page"]},
+                HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+            ).json()
+            pages += 1
+        self.assertEqual(pages, self.pages_count)
+        self.assertIsNone(data["next_page"])
+
+    def test_load_more_walks_every_product_once(self):
+        self.create_extra_products(self.paginate_by + 5)
+        response = self.client.get(reverse("product_list"))
+        seen = [product.pk for product in response.context["products"]]
+        cursor = response.context["page_obj"].next_cursor
+        while cursor:
+            response = self.client.get(reverse("product_list"), {"cursor": cursor})
+            seen += [product.pk for product in response.context["products"]]
+            cursor = response.context["page_obj"].next_cursor
+        visible = Product.objects.filter(
+            is_active=True, stock_quantity__gt=0, is_deleted=False
+        ).available_in(CAPITAL_CITY_PK)
+        visible = visible.order_by("-date_added", "-pk")
+        self.assertEqual(seen, list(visible.values_list("pk", flat=True)))
+
+    def test_load_more_does_not_count(self):
+        self.create_extra_products(self.paginate_by + 5)
+        first_page = self.client.get(reverse("product_list"))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(
+                reverse("product_list"),
+                {"cursor": first_page.context["page_obj"].next_cursor},
+                HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+            )
+        self.assertFalse(
+            [query for query in queries if "COUNT(" in query["sql"]]
+        )
+        product_queries = [
+            query["sql"] for query in queries
+            if query["sql"].startswith("SELECT")
+            and 'FROM "products_product"' in query["sql"]
+        ]
+        self.assertEqual(len(product_queries), 1)
+        self.assertNotIn("OFFSET", product_queries[0])
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(reverse("product_list"), {"cursor": "2"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_search_results_load_more_in_search_order(self):
+        self.create_extra_products(self.paginate_by + 5)
+        params = {"search": "Product"}
+        response = self.client.get(reverse("product_list"), params)
+        names = [product.product_name for product in response.context["products"]]
+        params["cursor"] = response.context["page_obj"].next_cursor
+        response = self.client.get(reverse("product_list"), params)
+        names += [product.product_name for product in response.context["products"]]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertEqual(names, sorted(names))
+
+
+class TestVisibleProducts(BaseTestCase):
+    """The listing queries filter with visible() and read the partial indexes."""
+
+    def listing(self, queryset):
+        """The first page of `queryset`, as the listing views fetch it."""
+        return KeysetPaginator(queryset, 20).queryset[:21]
+
+    def test_visible_excludes_hidden_out_of_stock_and_deleted(self):
+        Product.objects.filter(pk=4).update(is_deleted=True)
+        visible = Product.objects.visible()
+        self.assertIn(Product.objects.get(pk=1), visible)
+        for pk in (2, 3, 4):
+            self.assertNotIn(Product.objects.get(pk=pk), visible)
+
+    def test_product_list_uses_recent_index(self):
+        self.assertUsesIndex(
+            self.listing(Product.objects.visible().for_grid(1)),
+            'product_visible_recent_idx'
+        )
+
+    def test_category_page_uses_category_index(self):
+        products = Product.objects.visible().filter(category__slug='general')
+        self.assertUsesIndex(
+            self.listing(products.available_in(1).for_grid(1)),
+            'product_visible_category_idx'
+        )
+
+    def test_price_filter_uses_price_index(self):
+        products = Product.objects.visible().filter(
+            product_price__gte=100, product_price__lte=200
+        )
+        self.assertUsesIndex(self.listing(products), 'product_visible_price_idx')
+
+    def test_seller_profiles_use_seller_index(self):
+        public = Product.objects.visible().filter(seller=3).for_grid(1)
+        self.assertUsesIndex(self.listing(public), 'product_seller_recent_idx')
+        dashboard = Product.objects.filter(seller=3, is_deleted=False)
+        self.assertUsesIndex(self.listing(dashboard), 'product_seller_recent_idx')
+
+
+class TestProductCardCache(BaseTestCase):
+
+    def setUp(self):
+        self.product = Product.objects.get(pk=1)
+        self.seller_user = self.product.seller.user
+        self.user = User.objects.get(pk=1)
+
+    def grid_products(self):
+        return list(Product.objects.filter(pk=1).for_grid(1))
+
+    def render_grid(self, user=None):
+        return render_to_string("partials/_product_grid.html", {
+            "products": self.grid_products(),
+            "user": user or AnonymousUser(),
+            "seller_features_enabled": True,
+        })
+
+    def test_warm_cards_are_not_rendered_again(self):
+        product_cards(self.grid_products())
+        with mock.patch(
+            "honduras_shop_aggregator.products.cards.render_to_string"
+        ) as render:
+            cards = product_cards(self.grid_products())
+        render.assert_not_called()
+        self.assertIn(self.product.product_name, cards[0][1])
+
+    def test_saved_product_is_rendered_again(self):
+        product_cards(self.grid_products())
+        self.product.product_name = "Renamed product"
+        self.product.save()
+        self.assertIn("Renamed product", product_cards(self.grid_products())[0][1])
+
+    def test_queryset_update_is_rendered_again(self):
+        product_cards(self.grid_products())
+        Product.objects.filter(pk=1).update(product_price=777)
+        self.assertIn("L777", product_cards(self.grid_products())[0][1])
+
+    def test_renamed_seller_is_rendered_again(self):
+        product_cards(self.grid_products())
+        Seller.objects.filter(pk=self.product.seller_id).update(
+            store_name="Renamed store"
+        )
+        self.assertIn("Renamed store", product_cards(self.grid_products())[0][1])
+
+    def test_cards_are_cached_per_language(self):
+        with translation.override("es"):
+            spanish = product_cards(self.grid_products())[0][1]
+        with translation.override("en"):
+            english = product_cards(self.grid_products())[0][1]
+        with translation.override("es"):
+            self.assertEqual(product_cards(self.grid_products())[0][1], spanish)
+        self.assertNotEqual(spanish, english)
+
+    def test_like_state_is_applied_over_the_cached_card(self):
+        products = self.grid_products()
+        products[0].is_liked = True
+        liked = render_to_string(
+            "partials/_product_grid.html", {"products": products}
+        )
+        self.assertIn("❤️", liked)
+        products[0].is_liked = False
+        unliked = render_to_string(
+            "partials/_product_grid.html", {"products": products}
+        )
+        self.assertIn("🤍", unliked)
+        self.assertNotIn("❤️", unliked)
+
+    def test_owner_badge_is_not_shared(self):
+        self.assertIn(_("Your Product"), self.render_grid(self.seller_user))
+        self.assertNotIn(_("Your Product"), self.render_grid(self.user))
+        self.assertNotIn(_("Your Product"), self.render_grid())
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=300)
+class TestAnonymousResponseCache(BaseTestCase):
+
+    def setUp(self):
+        self.product = Product.objects.get(pk=1)
+        self.user = User.objects.get(pk=1)
+        self.list_url = reverse('product_list')
+        self.card_url = reverse('product_card', kwargs={'slug': self.product.slug})
+
+    def test_repeated_anonymous_request_is_served_from_cache(self):
+        first = self.client.get(self.list_url)
+        self.assertEqual(first["X-Response-Cache"], "miss")
+        with self.assertNumQueries(0):
+            second = self.client.get(self.list_url)
+        self.assertEqual(second["X-Response-Cache"], "hit")
+        self.assertContains(second, self.product.product_name)
+
+    def test_authenticated_request_is_not_cached(self):
+        self.login_user(self.user)
+        self.client.get(self.list_url)
+        response = self.client.get(self.list_url)
+        self.assertNotIn("X-Response-Cache", response)
+
+    def test_request_with_pending_message_is_not_cached(self):
+        self.client.get(reverse('product_create'))
+        response = self.client.get(self.list_url)
+        self.assertNotIn("X-Response-Cache", response)
+        self.assertContains(response, _("You are not logged in! Please log in."))
+
+    def test_hit_carries_the_visitors_own_csrf_token(self):
+        self.client.get(self.card_url)
+        visitor = self.client_class()
+        response = visitor.get(self.card_url)
+        self.assertEqual(response["X-Response-Cache"], "hit")
+        self.assertNotIn(CSRF_PLACEHOLDER, response.content.decode())
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+
+    def test_hit_without_csrf_token_sets_no_cookie(self):
+        self.client.get(self.list_url)
+        response = self.client_class().get(self.list_url)
+        self.assertEqual(response["X-Response-Cache"], "hit")
+        self.assertFalse(response.cookies)
+
+    def test_query_string_and_city_are_part_of_the_key(self):
+        self.client.get(self.list_url)
+        response = self.client.get(self.list_url, {"search": "testproduct"})
+        self.assertEqual(response["X-Response-Cache"], "miss")
+        session = self.client.session
+        session["city_pk"] = 2
+        session.save()
+        response = self.client.get(self.list_url)
+        self.assertEqual(response["X-Response-Cache"], "miss")
+
+    def test_liked_products_are_part_of_the_key(self):
+        self.client.get(self.list_url)
+        self.client.post(reverse('toggle_like', kwargs={'product_pk': 1}))
+        response = self.client.get(self.list_url)
+        self.assertEqual(response["X-Response-Cache"], "miss")
+        self.assertContains(response, "❤️")
+
+    def test_saved_product_invalidates_its_pages(self):
+        self.client.get(self.list_url)
+        self.client.get(self.card_url)
+        self.product.product_name = "Renamed product"
+        self.product.save()
+        for url in (self.list_url, self.card_url):
+            response = self.client.get(url)
+            self.assertEqual(response["X-Response-Cache"], "miss")
+            self.assertContains(response, "Renamed product")
+
+    def test_queryset_update_invalidates_the_product_card(self):
+        self.client.get(self.card_url)
+        Product.objects.filter(pk=1).update(product_price=777)
+        response = self.client.get(self.card_url)
+        self.assertEqual(response["X-Response-Cache"], "miss")
+        self.assertContains(response, "777")
+
+    def test_pages_rendered_before_the_commit_are_invalidated(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.product_name = "Renamed product"
+            self.product.save()
+            # Another request renders the page before the save commits.
+            self.client.get(self.card_url)
+            response = self.client.get(self.card_url)
+            self.assertEqual(response["X-Response-Cache"], "hit")
+        response = self.client.get(self.card_url)
+        self.assertEqual(response["X-Response-Cache"], "miss")
+
+    def test_write_during_the_render_outdates_the_entry(self):
+        get_object = ProductCardView.get_object
+
+        def read_then_write(view):
+            product = get_object(view)
+            # Another request saves the product once it has been read.
+            Product.objects.filter(pk=product.pk).update(product_price=777)
+            return product
+
+        with mock.patch.object(ProductCardView, 'get_object', read_then_write):
+            self.client.get(self.card_url)
+        response = self.client.get(self.card_url)
+        self.assertEqual(response["X-Response-Cache"], "miss")
+        self.assertContains(response, "777")
+
+    def test_large_update_invalidates_every_product_page(self):
+        self.client.get(self.card_url)
+        product_tag = cache.get(tag_key(f'product:{self.product.pk}'))
+        with self.assertNumQueries(1):
+            Product.objects.update(stock_quantity=5)
+        self.assertEqual(
+            cache.get(tag_key(f'product:{self.product.pk}')), product_tag
+        )
+        response = self.client.get(self.card_url)
+        self.assertEqual(response["X-Response-Cache"], "miss")
+
+    def test_other_product_card_stays_cached(self):
+        self.client.get(self.card_url)
+        Product.objects.filter(pk=4).update(product_price=777)
+        response = self.client.get(self.card_url)
+        self.assertEqual(response["X-Response-Cache"], "hit")
+
+    def test_renamed_category_invalidates_its_page(self):
+        category = Category.objects.get(pk=1)
+        url = reverse('category_page', kwargs={'slug': category.slug})
+        self.client.get(url)
+        category.name = "Renamed category"
+        category.save()
+        response = self.client.get(url)
+        self.assertEqual(response["X-Response-Cache"], "miss")
+        self.assertContains(response, "Renamed category")
+
+    def test_renamed_seller_invalidates_the_public_profile(self):
+        seller = self.product.seller
+        self.client.get(
+            reverse('public_seller_profile', kwargs={'store_name': seller.store_name})
+        )
+        seller.description = "Renamed description"
+        seller.save()
+        response = self.client.get(
+            reverse('public_seller_profile', kwargs={'store_name': seller.store_name})
+        )
+        self.assertEqual(response["X-Response-Cache"], "miss")
+
+    def test_stats_count_hits_and_misses(self):
+        self.client.get(self.list_url)
+        self.client.get(self.list_url)
+        stats = response_cache_stats()["ProductFilterView"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+        out = io.StringIO()
+        call_command("response_cache_stats", "--reset", stdout=out)
+        self.assertIn("ProductFilterView", out.getvalue())
+        self.assertEqual(response_cache_stats()["ProductFilterView"]["hits"], 0)
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0)
+    def test_zero_timeout_disables_the_cache(self):
+        self.client.get(self.list_url)
+        response = self.client.get(self.list_url)
+        self.assertNotIn("X-Response-Cache", response)
 
 
 class TestProductCreate(BaseTestCase):
@@ -537,7 +895,9 @@ class TestImageUpload(BaseTestCase):
             follow=True
         )
         self.product.refresh_from_db()
-        self.assertEqual(self.product.image.name, f'products/{self.product.slug}.jpg')
+        self.assertRegex(
+            self.product.image.name, r'^images/[0-9a-f]{2}/[0-9a-f]{32}\.jpg$'
+        )
         self.assertRedirectWithMessage(
             response,
             'product_card',
@@ -622,10 +982,8 @@ class TestImageUpload(BaseTestCase):
         )
         self.product.refresh_from_db()
         new_image_path = self.product.image.path
-        self.assertTrue(
-            self.product.image.name.startswith(f'products/{self.product.slug}'),
-            msg=_(f"Image name should start with 'products/{self.product.slug}', "
-                f"got '{self.product.image.name}'")
+        self.assertRegex(
+            self.product.image.name, r'^images/[0-9a-f]{2}/[0-9a-f]{32}\.jpg$'
         )
         self.assertTrue(os.path.exists(new_image_path))
         new_hash = get_file_hash(new_image_path)
@@ -669,6 +1027,78 @@ class TestImageUpload(BaseTestCase):
             _("You don&#x27;t have permission to access this product.")
         )
 
+    def gallery_upload(self, color):
+        img_bytes = io.BytesIO()
+        Image.new("RGB", (600, 400), color=color).save(img_bytes, format="JPEG")
+        return SimpleUploadedFile(
+            name=f"gallery_{color}.jpg",
+            content=img_bytes.getvalue(),
+            content_type="image/jpeg"
+        )
+
+    def post_gallery(self, files, order, deleted=()):
+        return self.client.post(
+            reverse('product_update_image', kwargs={'slug': self.product.slug}),
+            data={
+                'gallery_images': files,
+                'gallery_order': ",".join(order),
+                'delete_images': [str(pk) for pk in deleted],
+            },
+        )
+
+    def test_gallery_upload_and_reorder(self):
+        self.seller.is_verified = True
+        self.seller.save()
+        first, second, dropped = [
+            ProductImage.objects.create(
+                product=self.product, image=self.gallery_upload(color)
+            )
+            for color in ("red", "green", "blue")
+        ]
+        self.login_user(self.user)
+        files = [self.gallery_upload(color) for color in ("black", "white")]
+        response = self.post_gallery(
+            files,
+            ["new-0", str(second.pk), "new-1", str(first.pk)],
+            deleted=[dropped.pk],
+        )
+        self.assertRedirects(
+            response, reverse('product_card', kwargs={'slug': self.product.slug}),
+            fetch_redirect_response=False
+        )
+        gallery = list(self.product.gallery.all())
+        self.assertEqual(len(gallery), 4)
+        self.assertEqual([image.order for image in gallery], [1, 2, 3, 4])
+        self.assertEqual(gallery[1].pk, second.pk)
+        self.assertEqual(gallery[3].pk, first.pk)
+        for image in gallery:
+            with Image.open(image.image.path) as img:
+                self.assertEqual(img.size, (1200, 1200))
+
+    def test_gallery_upload_queries_bounded(self):
+        self.seller.is_verified = True
+        self.seller.save()
+        existing = ProductImage.objects.create(
+            product=self.product, image=self.gallery_upload("red")
+        )
+        self.login_user(self.user)
+        self.client.get(
+            reverse('product_update_image', kwargs={'slug': self.product.slug})
+        )
+        colors = [
+            "black", "white", "green", "blue", "yellow", "purple", "orange"
+        ]
+        files = [self.gallery_upload(color) for color in colors]
+        order = [f"new-{index}" for index in range(len(files))] + [str(existing.pk)]
+        with CaptureQueriesContext(connection) as queries:
+            self.post_gallery(files, order)
+        self.assertEqual(self.product.gallery.count(), 8)
+        existing.refresh_from_db()
+        self.assertEqual(existing.order, 8)
+        # One query per step of the update, whatever the number of uploads,
+        # queueing the renditions included.
+        self.assertLessEqual(len(queries), 25)
+
 
 class TestProductUpdate(BaseTestCase):
 
@@ -1052,3 +1482,473 @@ class TestProductSoftDelete(BaseTestCase):
             response, 'index',
             _("You don&#x27;t have permission to access this product.")
         )
+
+
+class TestProductAvailability(BaseTestCase):
+
+    def setUp(self):
+        self.product = Product.objects.get(pk=1)
+        self.capital = City.objects.get(pk=1)
+        self.second_city = City.objects.get(pk=2)
+
+    def available_cities(self, product):
+        return set(
+            ProductAvailability.objects.filter(product=product)
+            .values_list('city_id', flat=True)
+        )
+
+    def test_fixtures_are_indexed(self):
+        self.assertEqual(self.available_cities(self.product), {1, 2})
+        self.assertEqual(
+            self.available_cities(Product.objects.get(pk=6)), {2}
+        )
+
+    def test_delivery_city_changes_are_tracked(self):
+        self.product.delivery_cities.remove(self.second_city)
+        self.assertEqual(self.available_cities(self.product), {1})
+        self.second_city.delivery_products.add(self.product)
+        self.assertEqual(self.available_cities(self.product), {1, 2})
+        self.second_city.delivery_products.clear()
+        self.assertEqual(self.available_cities(self.product), {1})
+
+    def test_origin_city_change_is_tracked(self):
+        self.product.delivery_cities.clear()
+        self.product.origin_city = self.second_city
+        self.product.save()
+        self.assertEqual(self.available_cities(self.product), {2})
+        Product.objects.filter(pk=self.product.pk).update(origin_city=self.capital)
+        self.assertEqual(self.available_cities(self.product), {1})
+
+    def test_delivery_city_also_origin_has_single_row(self):
+        self.product.delivery_cities.add(self.capital)
+        self.assertEqual(
+            ProductAvailability.objects.filter(product=self.product).count(), 2
+        )
+
+    def test_city_listing_without_distinct(self):
+        self.product.delivery_cities.add(self.capital)
+        session = self.client.session
+        session['city_pk'] = 1
+        session.save()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('product_list'))
+        self.assertContains(response, 'data-product-id="1"', count=1)
+        self.assertFalse(
+            [query for query in queries if "DISTINCT" in query["sql"]]
+        )
+
+    def test_check_and_rebuild_commands(self):
+        call_command('check_availability', stdout=io.StringIO())
+        ProductAvailability.objects.filter(product=self.product).delete()
+        ProductAvailability.objects.create(
+            product=Product.objects.get(pk=6), city=self.capital
+        )
+        with self.assertRaises(CommandError):
+            call_command('check_availability', stdout=io.StringIO())
+        call_command('rebuild_availability', stdout=io.StringIO())
+        call_command('check_availability', stdout=io.StringIO())
+        self.assertEqual(self.available_cities(self.product), {1, 2})
+
+
+class TestSlugAllocation(BaseTestCase):
+
+    def setUp(self):
+        self.template = Product.objects.get(pk=1)
+
+    def create_product(self, product_name, slug=''):
+        return Product.objects.create(
+            seller=self.template.seller,
+            category=self.template.category,
+            origin_city=self.template.origin_city,
+            product_name=product_name,
+            product_price=10,
+            slug=slug,
+        )
+
+    def test_next_suffix_found_with_one_query(self):
+        for slug in ('camisa', 'camisa-1', 'camisa-7', 'camisa-azul', 'camisas'):
+            self.create_product('Camisa', slug=slug)
+        with self.assertNumQueries(1):
+            slug = next_free_slug(Product.objects.all(), 'camisa')
+        self.assertEqual(slug, 'camisa-8')
+        self.assertEqual(self.create_product('Camisa').slug, 'camisa-8')
+        self.assertEqual(self.create_product('Zapatos').slug, 'zapatos')
+
+    def test_numeric_tails_are_not_collision_suffixes(self):
+        self.create_product('Camisa 7501234567890123456789')
+        self.create_product('Camisa')
+        slugs = [self.create_product('Camisa').slug for _ in range(3)]
+        self.assertEqual(slugs, ['camisa-1', 'camisa-2', 'camisa-3'])
+
+    def test_used_up_suffixes_fall_back_to_free_ones(self):
+        self.create_product('Camisa')
+        self.create_product('Camisa 999999')
+        self.create_product('Camisa', slug='camisa-1')
+        slugs = [self.create_product('Camisa').slug for _ in range(2)]
+        self.assertEqual(slugs, ['camisa-2', 'camisa-3'])
+        self.assertEqual(
+            allocate_slugs(Product.objects.all(), ['Camisa', 'Camisa']),
+            ['camisa-4', 'camisa-5']
+        )
+
+    def test_names_without_slug_characters_use_the_model_name(self):
+        slugs = [self.create_product(name).slug for name in ('手机', '!!!')]
+        self.assertEqual(slugs, ['product', 'product-1'])
+        self.assertEqual(Category.objects.create(name='???').slug, 'category')
+
+    def test_slug_taken_concurrently_is_retried(self):
+        self.create_product('Camisa')
+        # Another request creates camisa-1 between allocation and insert.
+        stale = ['camisa-1']
+
+        def allocate(queryset, base, *args):
+            if stale:
+                self.create_product('Camisa', slug=stale.pop())
+                return 'camisa-1'
+            return next_free_slug(queryset, base, *args)
+
+        with mock.patch(
+            'honduras_shop_aggregator.slugs.next_free_slug', side_effect=allocate
+        ):
+            product = self.create_product('Camisa')
+        self.assertEqual(product.slug, 'camisa-2')
+
+    def test_long_names_fit_the_slug_field(self):
+        name = 'a' * 255
+        first = self.create_product(name)
+        second = self.create_product(name)
+        self.assertEqual(len(first.slug), 255)
+        self.assertEqual(first.slug, name)
+        self.assertEqual(second.slug, f"{name[:245]}-1")
+        self.assertEqual(self.create_product(name).slug, second.slug[:-1] + '2')
+
+
+class TestProductImport(BaseTestCase):
+
+    def setUp(self):
+        self.user = User.objects.get(username='userwithstorewithproduct')
+        self.seller = self.user.seller
+        self.seller.is_verified = True
+        self.seller.city = City.objects.get(pk=1)
+        self.seller.save()
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def import_file(self, content, name='products.csv', *args):
+        path = os.path.join(self.folder, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command(
+            'import_products', path, '--seller', self.seller.store_name, *args,
+            stdout=stdout, stderr=stderr
+        )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def csv_rows(self, count, name='Camisa'):
+        header = "product_name,category,product_price,stock_quantity\n"
+        return header + "".join(f"{name},general,10.50,3\n" for _ in range(count))
+
+    def test_valid_rows_created_with_cities_and_slugs(self):
+        stdout, stderr = self.import_file(
+            "product_name,category,product_price,stock_quantity,description,"
+            "is_active,product_link,origin_city,delivery_cities\n"
+            "Camisa azul,general,250,4,Algodón,yes,"
+            "https://product-store.test/camisa,second city,Capital|Second City\n"
+            "Camisa azul,General,199.99,1,,no,,,\n"
+            "Zapatos,general,0,1,,,,,\n"
+            "Gorra,nowhere,10,1,,,,Atlantis,\n"
+            "Bolso,general,10,1,,,https://elsewhere.test/bolso,,\n"
+            "Camisa azul,general,10,1,,,https://product-store.test/camisa,,\n"
+        )
+        first, second = Product.objects.filter(
+            product_name='Camisa azul'
+        ).order_by('pk')
+        self.assertEqual((first.slug, second.slug), ('camisa-azul', 'camisa-azul-1'))
+        self.assertEqual(first.seller, self.seller)
+        self.assertEqual(first.origin_city_id, 2)
+        self.assertEqual(
+            set(first.delivery_cities.values_list('pk', flat=True)), {1, 2}
+        )
+        self.assertEqual(
+            set(first.availability.values_list('city_id', flat=True)), {1, 2}
+        )
+        self.assertEqual(first.search_document, 'camisa azul algodon')
+        self.assertTrue(first.is_active)
+        self.assertFalse(second.is_active)
+        self.assertEqual(second.origin_city_id, 1)
+        self.assertEqual(
+            list(second.availability.values_list('city_id', flat=True)), [1]
+        )
+        self.assertIn("2 created, 4 rows skipped", stdout)
+        self.assertIn("Line 4: product_price: ", stderr)
+        self.assertIn("Line 5: category: Unknown category: nowhere", stderr)
+        self.assertIn("origin_city: Unknown city: Atlantis", stderr)
+        self.assertIn("Line 6: product_link: ", stderr)
+        self.assertIn(
+            f"Line 7: product_link: {_('This product is already listed.')}",
+            stderr
+        )
+
+    def test_queries_do_not_grow_with_rows(self):
+        self.import_file(self.csv_rows(5))
+        with CaptureQueriesContext(connection) as few:
+            self.import_file(self.csv_rows(5, 'Pantalón'))
+        with CaptureQueriesContext(connection) as many:
+            self.import_file(self.csv_rows(60, 'Pantalón'))
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(
+            Product.objects.filter(product_name='Pantalón').count(), 65
+        )
+        self.assertTrue(Product.objects.filter(slug='pantalon-64').exists())
+
+    def test_rows_written_in_chunks(self):
+        self.import_file(self.csv_rows(7), 'products.csv', '--chunk-size', '3')
+        self.assertEqual(
+            sorted(
+                Product.objects.filter(product_name='Camisa')
+                .values_list('slug', flat=True)
+            ),
+            ['camisa', *(f'camisa-{n}' for n in range(1, 7))]
+        )
+
+    def test_jsonl_upload_queues_images(self):
+        self.login_user(self.user)
+        content = (
+            '{"product_name": "Mesa", "category": "general", '
+            '"product_price": 1500, "stock_quantity": 2, '
+            '"delivery_cities": ["Second City"], '
+            '"image_url": "https://images.test/mesa.jpg"}\n'
+            '\n'
+            '["not", "an", "object"]\n'
+            '{"product_name": "Silla", "category": 1, "product_price": "80"}\n'
+        )
+        response = self.client.post(
+            reverse('product_import'),
+            {'file': SimpleUploadedFile('catalog.jsonl', content.encode())},
+            follow=True
+        )
+        self.assertRedirects(
+            response,
+            reverse('seller_profile', kwargs={'store_name': self.seller.store_name})
+        )
+        self.assertContains(response, _("Line %(line)d skipped: %(message)s") % {
+            'line': 3, 'message': _("The line is not a JSON object.")
+        })
+        table = Product.objects.get(product_name='Mesa')
+        self.assertEqual(table.image.name, 'products/placeholder.png')
+        self.assertEqual(
+            list(table.delivery_cities.values_list('name', flat=True)),
+            ['Second City']
+        )
+        job = ImageJob.objects.get()
+        self.assertEqual(
+            (job.object_id, job.url), (table.pk, 'https://images.test/mesa.jpg')
+        )
+        self.assertEqual(job.source, '')
+        self.assertTrue(Product.objects.filter(product_name='Silla').exists())
+
+    def test_internal_image_urls_rejected(self):
+        content = "product_name,category,product_price,image_url\n" + "".join(
+            f"Mesa,general,10,{url}\n" for url in (
+                'ftp://images.test/mesa.jpg',
+                'http://localhost/mesa.jpg',
+                'http://192.168.1.10/mesa.jpg',
+                'http://169.254.169.254/latest/meta-data/',
+            )
+        )
+        stdout, stderr = self.import_file(content)
+        self.assertEqual(stderr.count('image_url'), 4)
+        self.assertFalse(Product.objects.filter(product_name='Mesa').exists())
+        self.assertFalse(ImageJob.objects.exists())
+
+    def test_names_without_slug_characters(self):
+        self.import_file(self.csv_rows(2, '!!!'))
+        self.assertEqual(
+            sorted(
+                Product.objects.filter(product_name='!!!')
+                .values_list('slug', flat=True)
+            ),
+            ['product', 'product-1']
+        )
+
+    def test_link_taken_during_write_reported(self):
+        link = 'https://product-store.test/camisa'
+
+        def take_link(*args, **kwargs):
+            # Another seller lists the link between the check and the insert.
+            Product.objects.filter(pk=1).update(product_link=link)
+            return allocate_slugs(*args, **kwargs)
+
+        content = (
+            "product_name,category,product_price,product_link\n"
+            f"Camisa,general,10,{link}\n"
+            "Gorra,general,10,\n"
+        )
+        with mock.patch(
+            'honduras_shop_aggregator.products.imports.allocate_slugs', take_link
+        ):
+            stdout, stderr = self.import_file(content)
+        self.assertIn("1 created, 1 rows skipped", stdout)
+        self.assertIn(
+            f"Line 2: product_link: {_('This product is already listed.')}",
+            stderr
+        )
+        self.assertTrue(Product.objects.filter(product_name='Gorra').exists())
+        self.assertFalse(Product.objects.filter(product_name='Camisa').exists())
+
+    def test_undecodable_upload_reports_no_success(self):
+        self.login_user(self.user)
+        content = self.csv_rows(1).encode() + b"Camisa,general,\xff,3\n"
+        response = self.client.post(
+            reverse('product_import'),
+            {'file': SimpleUploadedFile('catalog.csv', content)},
+            follow=True
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(
+            response, _("The file must be UTF-8 encoded. The import stopped there.")
+        )
+        self.assertNotContains(response, _("Products imported"))
+
+    def test_import_requires_verified_seller(self):
+        self.seller.is_verified = False
+        self.seller.save()
+        self.login_user(self.user)
+        response = self.client.post(
+            reverse('product_import'),
+            {'file': SimpleUploadedFile('catalog.csv', self.csv_rows(1).encode())},
+            follow=True
+        )
+        self.assertFalse(Product.objects.filter(product_name='Camisa').exists())
+        self.assertRedirectWithMessage(
+            response,
+            'index',
+            _("Only verified sellers with active store can add and edit products.")
+        )
+
+
+class TestProductExport(BaseTestCase):
+
+    def setUp(self):
+        self.seller = Seller.objects.get(pk=3)
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def export(self, *args):
+        stdout = io.StringIO()
+        call_command('export_products', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_jsonl_rows(self):
+        rows = [
+            json.loads(line)
+            for line in self.export('--seller', 'store_with_product', '--format',
+                                    'jsonl').splitlines()
+        ]
+        self.assertEqual(
+            [row['slug'] for row in rows],
+            list(
+                Product.objects.filter(seller=self.seller, is_deleted=False)
+                .order_by('pk').values_list('slug', flat=True)
+            )
+        )
+        first = rows[0]
+        self.assertEqual(first['product_name'], 'testproduct')
+        self.assertEqual(first['category'], 'general')
+        self.assertEqual(first['origin_city'], 'Capital')
+        self.assertEqual(first['delivery_cities'], ['Second City'])
+        self.assertEqual(first['image_url'], '')
+
+    def test_csv_export_imports_again(self):
+        # Links must start with the website of the importing seller.
+        Product.objects.filter(seller=self.seller).update(product_link=None)
+        path = os.path.join(self.folder, 'catalog.csv')
+        output = self.export('--seller', 'store_with_product', '--output', path)
+        exported = Product.objects.filter(seller=self.seller, is_deleted=False)
+        self.assertIn(f"Products exported: {exported.count()}", output)
+        other = Seller.objects.get(store_name='other_store')
+        call_command(
+            'import_products', path, '--seller', other.store_name,
+            stdout=io.StringIO(), stderr=io.StringIO()
+        )
+        imported = Product.objects.filter(seller=other).exclude(pk=4)
+        self.assertEqual(
+            sorted(imported.values_list('product_name', flat=True)),
+            sorted(exported.values_list('product_name', flat=True))
+        )
+        copy = imported.get(product_name='testproduct')
+        self.assertEqual(copy.slug, 'testproduct-1')
+        self.assertEqual(
+            list(copy.delivery_cities.values_list('name', flat=True)),
+            ['Second City']
+        )
+
+    def test_csv_formulas_are_quoted_and_imported_back(self):
+        Product.objects.filter(seller=self.seller).update(product_link=None)
+        product = Product.objects.filter(seller=self.seller).first()
+        product.product_name = '=SUM(A1:A9)'
+        product.description = "'-1"
+        product.save()
+        path = os.path.join(self.folder, 'catalog.csv')
+        self.export('--seller', 'store_with_product', '--output', path)
+        with open(path, encoding='utf-8') as f:
+            row = next(
+                row for row in csv.DictReader(f) if row['slug'] == product.slug
+            )
+        self.assertEqual(row['product_name'], "'" + product.product_name)
+        self.assertEqual(row['description'], "''-1")
+        other = Seller.objects.get(store_name='other_store')
+        call_command(
+            'import_products', path, '--seller', other.store_name,
+            stdout=io.StringIO(), stderr=io.StringIO()
+        )
+        copy = Product.objects.get(
+            seller=other, product_name=product.product_name
+        )
+        self.assertEqual(copy.description, "'-1")
+
+    def test_non_ascii_filename(self):
+        response = export_response(Product.objects.none(), 'csv', 'tienda-ñ')
+        self.assertEqual(
+            response['Content-Disposition'],
+            "attachment; filename*=utf-8''tienda-%C3%B1.csv"
+        )
+
+    def test_queries_per_chunk(self):
+        count = Product.objects.count()
+        chunk_size = 2
+        chunks = -(-count // chunk_size)
+        # Products are read from one cursor; delivery cities once per chunk.
+        with self.assertNumQueries(1 + chunks):
+            lines = list(export_lines(Product.objects.all(), 'csv', '', chunk_size))
+        self.assertEqual(len(lines), count + 1)
+
+    def test_admin_action_streams_selection(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@admin.test', password='pass'
+        )
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse('admin:products_product_changelist'),
+            {'action': 'export_jsonl', '_selected_action': [1, 4]}
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response['Content-Disposition'], 'attachment; filename="products.jsonl"'
+        )
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).decode().splitlines()
+        ]
+        self.assertEqual(
+            [row['slug'] for row in rows],
+            list(
+                Product.objects.filter(pk__in=[1, 4])
+                .order_by('pk').values_list('slug', flat=True)
+            )
+        )
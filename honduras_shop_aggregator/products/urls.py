@@ -18,6 +18,11 @@ if settings.SELLER_FEATURES_ENABLED:
             views.ProductFormCreateView.as_view(),
             name='product_create'
         ),
+        path(
+            'import/',
+            views.ProductImportView.as_view(),
+            name='product_import'
+        ),
         path(
             '<str:slug>/update_image/',
             views.ProductImageManageView.as_view(),
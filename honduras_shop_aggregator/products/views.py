@@ -1,29 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.messages.views import SuccessMessageMixin
 from django.db import transaction
-from django.db.models import Q
 from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.template.loader import render_to_string
 from django.urls import reverse_lazy
 from django.utils import timezone
 from django.utils.translation import gettext as _
 from django.views import View
 from django.views.generic import DetailView
-from django.views.generic.edit import CreateView, UpdateView
+from django.views.generic.edit import CreateView, FormView, UpdateView
 from django_filters.views import FilterView
 
 from honduras_shop_aggregator import utils
+from honduras_shop_aggregator.images.pipeline import schedule_uploads
+from honduras_shop_aggregator.likedproducts.liked_set import LikedSet
+from honduras_shop_aggregator.pagination import (KeysetPaginationMixin,
+                                                 load_more_response)
 from honduras_shop_aggregator.products.filters import ProductFilter
 from honduras_shop_aggregator.products.forms import (ProductCreateForm,
                                                      ProductDeleteForm,
                                                      ProductImageUpdateForm,
+                                                     ProductImportForm,
                                                      ProductUpdateForm)
-from honduras_shop_aggregator.products.models import Product, ProductImage
+from honduras_shop_aggregator.products.imports import (ProductImporter,
+                                                       import_format,
+                                                       read_rows)
+from honduras_shop_aggregator.products.models import (GALLERY_LIMIT, Product,
+                                                      ProductImage)
+from honduras_shop_aggregator.response_cache import (
+    ALL_PRODUCTS_TAG, CATALOG_TAGS, AnonymousResponseCacheMixin,
+    invalidate_products)
+
+IMPORT_REPORTED_ERRORS = 10
 
 
 class ProductCardView(
-    SuccessMessageMixin, DetailView
+    AnonymousResponseCacheMixin, SuccessMessageMixin, DetailView
 ):
     model = Product
     template_name = 'pages/products/product_card.html'
@@ -32,63 +47,63 @@ class ProductCardView(
     slug_url_kwarg = "slug"
 
     def get_object(self):
-        product = get_object_or_404(Product, slug=self.kwargs["slug"])
+        product = get_object_or_404(
+            Product.objects.prefetch_related('gallery'), slug=self.kwargs["slug"]
+        )
         if product.is_deleted:
             raise Http404(_("Product not found"))
         if self.request.user.pk:
             product.is_liked = product.likes.filter(user=self.request.user).exists()
+        else:
+            product.is_liked = product.pk in self.request.visitor.liked_products
         return product
 
+    def get_cache_tags(self):
+        keys = (
+            Product.objects.filter(slug=self.kwargs['slug'])
+            .values_list('pk', 'seller_id', 'category_id').first()
+        )
+        if keys is None:
+            return ('cities', ALL_PRODUCTS_TAG)
+        product_pk, seller_pk, category_pk = keys
+        return (
+            'cities',
+            ALL_PRODUCTS_TAG,
+            f'product:{product_pk}',
+            f'seller:{seller_pk}',
+            f'category:{category_pk}',
+        )
+
 
-class ProductFilterView(SuccessMessageMixin, FilterView):
+class ProductFilterView(
+    AnonymousResponseCacheMixin, KeysetPaginationMixin, SuccessMessageMixin,
+    FilterView
+):
     model = Product
     template_name = 'pages/products/product_list.html'
     context_object_name = 'products'
     filterset_class = ProductFilter
     paginate_by = 20
+    cache_tags = CATALOG_TAGS
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        queryset = queryset.filter(
-            is_active=True, stock_quantity__gt=0, is_deleted=False
-        )
-        city_pk = self.request.session.get('city_pk')
-        if city_pk:
-            queryset = queryset.filter(
-                Q(origin_city=city_pk) | Q(delivery_cities=city_pk)
-            ).distinct()
-        return queryset
+        queryset = super().get_queryset().visible()
+        city_pk = self.request.visitor.city_pk
+        return queryset.available_in(city_pk).for_grid(city_pk)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        products = context['products']
-        if self.request.user.is_authenticated:
-            liked_ids = self.request.user.likes.values_list("product_id", flat=True)
-            for product in products:
-                product.is_liked = product.pk in liked_ids
-        else:
-            liked_products = self.request.session.get('liked_products', [])
-            for product in products:
-                product.is_liked = product.pk in liked_products
+        LikedSet.for_request(self.request, context['products']).mark(
+            context['products']
+        )
         return context
 
     def render_to_response(self, context, **response_kwargs):
         """Return JSON if AJAX, otherwise full page."""
-        request = self.request
-        if request.headers.get("x-requested-with") == "XMLHttpRequest":
-            html = render_to_string(
-                "partials/_product_grid.html", 
-                {"products": context["products"], "request": request},
-                request=request
+        if self.request.headers.get("x-requested-with") == "XMLHttpRequest":
+            return load_more_response(
+                self.request, context["page_obj"], "partials/_product_grid.html"
             )
-            page_obj = context["page_obj"]
-            return JsonResponse({
-                "html": html,
-                "has_next": page_obj.has_next(),
-                "next_page": (
-                    page_obj.next_page_number() if page_obj.has_next() else None
-                )
-            })
         return super().render_to_response(context, **response_kwargs)
 
 
@@ -162,6 +177,58 @@ class ProductFormCreateView(
         return initial
 
 
+class ProductImportView(
+    utils.UserLoginRequiredMixin, utils.SellerPermissionMixin, FormView
+):
+    form_class = ProductImportForm
+    template_name = 'layouts/base_form.html'
+
+    def get_success_url(self):
+        return reverse_lazy(
+            'seller_profile', kwargs={'store_name': self.request.user.seller.store_name}
+        )
+
+    def get_context_data(self, *args, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update({
+            'heading': _("Import products"),
+            'button_text': _("Import"),
+            'button_class': 'btn btn-success'
+        })
+        return context
+
+    def form_valid(self, form):
+        upload = form.cleaned_data['file']
+        importer = ProductImporter(self.request.user.seller)
+        try:
+            importer.run(read_rows(upload.file, import_format(upload.name)))
+        except UnicodeDecodeError:
+            messages.error(
+                self.request,
+                _("The file must be UTF-8 encoded. The import stopped there.")
+            )
+            return self.form_invalid(form)
+        messages.success(
+            self.request,
+            _("Products imported: %(created)d. Images queued: %(images)d.") % {
+                'created': importer.created, 'images': importer.images_queued
+            }
+        )
+        for line, message in importer.errors[:IMPORT_REPORTED_ERRORS]:
+            messages.warning(
+                self.request,
+                _("Line %(line)d skipped: %(message)s") % {
+                    'line': line, 'message': message
+                }
+            )
+        hidden = len(importer.errors) - IMPORT_REPORTED_ERRORS
+        if hidden > 0:
+            messages.warning(
+                self.request, _("%(count)d more rows skipped.") % {'count': hidden}
+            )
+        return super().form_valid(form)
+
+
 class ProductImageManageView(
     utils.UserLoginRequiredMixin, utils.SellerPermissionMixin,
     SuccessMessageMixin, View
@@ -174,6 +241,9 @@ class ProductImageManageView(
     def get(self, request, slug):
         product = get_object_or_404(Product, slug=slug, is_deleted=False)
         form = ProductImageUpdateForm(instance=product)
+        return self.render_form(product, form, list(product.gallery.all()))
+
+    def render_form(self, product, form, gallery):
         context = {
             "heading": _("Manage Product Images"),
             "product": product,
@@ -184,122 +254,77 @@ class ProductImageManageView(
                     "url": image.image.url,
                     "order": image.order,
                 }
-                for image in product.gallery.all()
+                for image in gallery
             ],
-            "gallery_limit": 8,
-            "gallery_count": product.gallery.count(),
-            "remaining_images": 8 - product.gallery.count(),
+            "gallery_limit": GALLERY_LIMIT,
+            "gallery_count": len(gallery),
+            "remaining_images": GALLERY_LIMIT - len(gallery),
         }
         return render(
-            request,
-            "pages/products/manage_images.html",
+            self.request,
+            self.template_name,
             context,
         )
 
     @transaction.atomic
     def post(self, request, slug):
         product = get_object_or_404(Product, slug=slug, is_deleted=False)
+        gallery = list(product.gallery.all())
         form = ProductImageUpdateForm(
             request.POST,
             request.FILES,
             instance=product,
         )
         if not form.is_valid():
-            context = {
-                "heading": _("Manage Product Images"),
-                "product": product,
-                "form": form,
-                "gallery": [
-                    {
-                        "id": image.pk,
-                        "url": image.image.url,
-                        "order": image.order,
-                    }
-                    for image in product.gallery.all()
-                ],
-                "gallery_limit": 8,
-                "gallery_count": product.gallery.count(),
-                "remaining_images": 8 - product.gallery.count(),
-            }
-            return render(
-                request,
-                self.template_name,
-                context,
-            )
+            return self.render_form(product, form, gallery)
         gallery_files = request.FILES.getlist("gallery_images")
-        ids = request.POST.getlist("delete_images")
-        remaining_existing = (
-            product.gallery.count()
-            - len(ids)
-        )
-        total_after_save = (
-            remaining_existing
-            + len(gallery_files)
-        )
-        if total_after_save > 8:
+        ids = set(request.POST.getlist("delete_images"))
+        existing = {
+            str(image.pk): image
+            for image in gallery
+            if str(image.pk) not in ids
+        }
+        if len(existing) + len(gallery_files) > GALLERY_LIMIT:
             form.add_error(
                 None,
                 _("Maximum of 8 gallery images allowed.")
             )
-            context = {
-                "heading": _("Manage Product Images"),
-                "product": product,
-                "form": form,
-                "gallery": [
-                    {
-                        "id": image.pk,
-                        "url": image.image.url,
-                        "order": image.order,
-                    }
-                    for image in product.gallery.all()
-                ],
-                "gallery_limit": 8,
-                "gallery_count": product.gallery.count(),
-                "remaining_images": 8 - product.gallery.count(),
-            }
-            return render(
-                request,
-                self.template_name,
-                context,
-            )
+            return self.render_form(product, form, gallery)
         form.save()
-        ProductImage.objects.filter(
-            product=product,
-            pk__in=ids,
-        ).delete()
-        existing_ids = set(
-            product.gallery.values_list("pk", flat=True)
+        deleted = [image.pk for image in gallery if str(image.pk) in ids]
+        if deleted:
+            ProductImage.objects.filter(pk__in=deleted).delete()
+
+        new_orders = []
+        reordered = []
+        tokens = request.POST.get("gallery_order", "").split(",")
+        for order, token in enumerate(tokens, start=1):
+            if token.startswith("new-"):
+                new_orders.append(order)
+            elif token in existing and existing[token].order != order:
+                existing[token].order = order
+                reordered.append(existing[token])
+        ProductImage.objects.bulk_update(reordered, ["order"])
+
+        last_order = max(
+            [image.order or 0 for image in existing.values()] + new_orders + [0]
         )
-        existing = {
-            str(image.pk): image
-            for image in product.gallery.all()
-        }
-        for file in gallery_files:
-            ProductImage.objects.create(
-                product=product,
-                image=file,
+        new_images = []
+        for index, file in enumerate(gallery_files):
+            if index < len(new_orders):
+                order = new_orders[index]
+            else:
+                last_order += 1
+                order = last_order
+            new_images.append(
+                ProductImage(product=product, image=file, order=order)
             )
-        gallery_order = request.POST.get("gallery_order", "")
-        tokens = gallery_order.split(",")
-        new_images = ProductImage.objects.filter(
-            product=product
-        ).exclude(
-            pk__in=existing_ids
-        ).order_by("pk")
-        new_index = 0
-        order = 1
-        for token in tokens:
-            if token.startswith("new-"):
-                if new_index < len(new_images):
-                    image = new_images[new_index]
-                    image.order = order
-                    image.save(update_fields=["order"])
-                    new_index += 1
-            elif token in existing:
-                image = existing[token]
-                image.order = order
-                image.save(update_fields=["order"])
-            order += 1
+        if new_images:
+            ProductImage.objects.bulk_create(new_images)
+            workers = min(len(new_images), settings.IMAGE_JOB_WORKERS)
+            with ThreadPoolExecutor(workers) as executor:
+                schedule_uploads(new_images, "image", executor=executor)
+        invalidate_products([product.pk])
         messages.success(
             request,
             _("Images updated successfully.")
@@ -0,0 +1,218 @@
+"""
+Whole-response cache for catalog pages seen by anonymous visitors.
+
+For an anonymous visitor a catalog page depends only on its path and
+query string, the language, the city picked and the products liked, see
+visitor.py. Responses are cached under those, so the
+many visitors who liked nothing share one entry per page and city.
+
+Each entry keeps the versions of the tags it was built from, such as
+'products' or 'seller:3'. invalidate() gives a tag a new version, and
+the entries built from the old one are no longer served. It does so
+again once the transaction commits, since a page rendered meanwhile by
+another request still shows the data from before it. The CSRF token
+of the visitor the page was rendered for is swapped for the current
+visitor's on every hit.
+
+Hits and misses are counted per view, with their total time, see
+response_cache_stats().
+"""
+import hashlib
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.translation import get_language
+
+RESPONSE_CACHE_PREFIX = 'responses'
+# Writes to more products than this invalidate every product page through
+# ALL_PRODUCTS_TAG rather than one 'product:<pk>' tag each.
+MAX_PRODUCT_TAGS = 100
+ALL_PRODUCTS_TAG = 'product:all'
+CSRF_PLACEHOLDER = '__response_cache_csrf_token__'
+# The hidden input of {% csrf_token %}, also when escaped inside JSON.
+CSRF_INPUT = re.compile(r'csrfmiddlewaretoken\\?" value=\\?"(\w+)')
+# Outcome -> the counters of its number and total time in microseconds.
+COUNTERS = {'hit': ('hits', 'hit_us'), 'miss': ('misses', 'miss_us')}
+STATS = tuple(stat for counters in COUNTERS.values() for stat in counters)
+# Listings show products of every seller and category, and city names.
+CATALOG_TAGS = ('products', 'sellers', 'categories', 'cities')
+
+cached_views = set()
+
+
+def tag_key(tag):
+    return f'{RESPONSE_CACHE_PREFIX}:tag:{tag}'
+
+
+def bump(tags):
+    cache.set_many({tag_key(tag): uuid.uuid4().hex for tag in tags}, timeout=None)
+
+
+def invalidate(*tags):
+    """
+    Drops every cached response built from one of the tags, now and once
+    the current transaction commits.
+    """
+    bump(tags)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: bump(tags))
+
+
+def invalidate_products(product_pks=None):
+    """
+    Invalidates the pages of the products, or of every product when
+    `product_pks` is None or longer than MAX_PRODUCT_TAGS.
+    """
+    product_pks = None if product_pks is None else list(product_pks)
+    if product_pks is None or len(product_pks) > MAX_PRODUCT_TAGS:
+        return invalidate('products', ALL_PRODUCTS_TAG)
+    invalidate('products', *(f'product:{pk}' for pk in product_pks))
+
+
+def tag_versions(tags):
+    keys = {tag_key(tag): tag for tag in tags}
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    for key, version in missing.items():
+        cache.add(key, version, timeout=None)
+    if missing:
+        versions.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def is_cacheable(request):
+    return (
+        settings.RESPONSE_CACHE_TIMEOUT > 0
+        and request.method == 'GET'
+        and not request.user.is_authenticated
+        # Flash messages are shown once, to one visitor.
+        and not len(get_messages(request))
+    )
+
+
+def response_cache_key(request, view_name):
+    variant = (
+        request.path,
+        sorted(request.GET.lists()),
+        get_language(),
+        request.visitor.city_pk,
+        sorted(request.visitor.liked_products),
+        request.headers.get('x-requested-with'),
+    )
+    digest = hashlib.md5(repr(variant).encode()).hexdigest()
+    return f'{RESPONSE_CACHE_PREFIX}:page:{view_name}:{digest}'
+
+
+def cached_response(request, key):
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    if tag_versions(entry['tags']) != entry['tags']:
+        return None
+    content = entry['content']
+    # Reading the token sets the CSRF cookie, which most pages do without.
+    if CSRF_PLACEHOLDER in content:
+        content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+    return HttpResponse(content, content_type=entry['content_type'])
+
+
+def store_response(response, key, versions, timeout):
+    if response.status_code != 200 or response.streaming:
+        return
+    content = response.content.decode(response.charset)
+    for token in set(CSRF_INPUT.findall(content)):
+        content = content.replace(token, CSRF_PLACEHOLDER)
+    cache.set(key, {
+        'content': content,
+        'content_type': response['Content-Type'],
+        'tags': versions,
+    }, timeout)
+
+
+def count(view_name, outcome, started):
+    elapsed = int((time.perf_counter() - started) * 1_000_000)
+    for stat, value in zip(COUNTERS[outcome], (1, elapsed)):
+        key = f'{RESPONSE_CACHE_PREFIX}:stats:{view_name}:{stat}'
+        if not cache.add(key, value, timeout=None):
+            try:
+                cache.incr(key, value)
+            except ValueError:
+                cache.set(key, value, timeout=None)
+
+
+def response_cache_stats():
+    """Maps every cached view to its hits, misses, hit ratio and mean times."""
+    stats = {}
+    for view_name in sorted(cached_views):
+        keys = {
+            f'{RESPONSE_CACHE_PREFIX}:stats:{view_name}:{stat}': stat
+            for stat in STATS
+        }
+        values = {stat: 0 for stat in STATS}
+        values.update({
+            keys[key]: value for key, value in cache.get_many(keys).items()
+        })
+        hits, misses = values['hits'], values['misses']
+        stats[view_name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / (hits + misses) if hits + misses else 0.0,
+            'hit_ms': values['hit_us'] / hits / 1000 if hits else 0.0,
+            'miss_ms': values['miss_us'] / misses / 1000 if misses else 0.0,
+        }
+    return stats
+
+
+def reset_response_cache_stats():
+    cache.delete_many([
+        f'{RESPONSE_CACHE_PREFIX}:stats:{view_name}:{stat}'
+        for view_name in cached_views
+        for stat in STATS
+    ])
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Serves anonymous GET requests from the response cache.
+
+    Views list the tags their response is built from in get_cache_tags().
+    Their versions are read before the view runs, so a write that lands
+    while the page renders leaves the stored entry outdated rather than
+    marking stale data current. get_cache_tags() can thus only use the
+    request, not the view's object.
+    """
+    cache_tags = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cached_views.add(cls.__name__)
+
+    def get_cache_tags(self):
+        return self.cache_tags
+
+    def dispatch(self, request, *args, **kwargs):
+        if not is_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+        started = time.perf_counter()
+        view_name = type(self).__name__
+        key = response_cache_key(request, view_name)
+        response = cached_response(request, key)
+        if response is not None:
+            response['X-Response-Cache'] = 'hit'
+            count(view_name, 'hit', started)
+            return response
+        versions = tag_versions(self.get_cache_tags())
+        response = super().dispatch(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        store_response(response, key, versions, settings.RESPONSE_CACHE_TIMEOUT)
+        response['X-Response-Cache'] = 'miss'
+        count(view_name, 'miss', started)
+        return response
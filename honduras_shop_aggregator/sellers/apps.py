@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SellersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'honduras_shop_aggregator.sellers'
+
+    def ready(self):
+        import honduras_shop_aggregator.sellers.signals  # noqa: F401
@@ -1,15 +1,16 @@
-import os
-
 from django import forms
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from PIL import Image
 
 from honduras_shop_aggregator.cities.models import City
 from honduras_shop_aggregator.image_utils import (image_upload_path,
                                                   validate_image)
+from honduras_shop_aggregator.images.fields import ProcessedImageField
+from honduras_shop_aggregator.images.models import OPERATION_CROP
+from honduras_shop_aggregator.images.pipeline import ProcessedImageMixin
+from honduras_shop_aggregator.images.renditions import AVATAR_RENDITIONS
 from honduras_shop_aggregator.users.models import User
 
 
@@ -20,7 +21,7 @@ class HttpsURLField(models.URLField):
         return super().formfield(**defaults)
 
 
-class Seller(models.Model):
+class Seller(ProcessedImageMixin, models.Model):
 
     class Meta:
         verbose_name = "Seller"
@@ -53,8 +54,11 @@ class Seller(models.Model):
     )
     is_verified = models.BooleanField(default=False)
     date_registered = models.DateTimeField(default=timezone.now)
-    image = models.ImageField(
+    image = ProcessedImageField(
         upload_to=image_upload_path,
+        operation=OPERATION_CROP,
+        renditions=AVATAR_RENDITIONS,
+        pending_placeholder='images/store_placeholder.jpg',
         validators=[validate_image],
         blank=True,
         null=True,
@@ -89,48 +93,7 @@ class Seller(models.Model):
 
     def save(self, *args, **kwargs):
         self.full_clean()
-
-        old_image_path = None
-        old_image_name = None
-        if self.pk:
-            try:
-                old = Seller.objects.get(pk=self.pk)
-                old_image_name = old.image.name
-                if (
-                    old.image
-                    and old.image != self.image
-                    and old.image.name != 'sellers/placeholder.jpg'
-                ):
-                    old_image_path = old.image.path
-            except User.DoesNotExist:
-                pass
-
         super().save(*args, **kwargs)
 
-        if (
-            self.image
-            and self.image.name != 'sellers/placeholder.jpg'
-            and self.image.name != old_image_name
-        ):
-            try:
-                img_path = self.image.path
-                if not os.path.exists(img_path):
-                    return
-                img = Image.open(img_path)
-                output_size = (240, 240)
-                width, height = img.size
-                min_side = min(width, height)
-                left = (width - min_side) / 2
-                top = (height - min_side) / 2
-                right = (width + min_side) / 2
-                bottom = (height + min_side) / 2
-                img = img.crop((left, top, right, bottom))
-                img = img.resize(output_size, Image.Resampling.LANCZOS)
-                img.save(img_path)
-                if old_image_path and os.path.exists(old_image_path):
-                    os.remove(old_image_path)
-            except Exception as e:
-                raise ValidationError(_("Image processing failed") + f": {e}")
-
     def __str__(self):
         return self.store_name
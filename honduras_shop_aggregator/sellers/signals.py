@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from honduras_shop_aggregator.images.signals import image_swapped
+from honduras_shop_aggregator.response_cache import invalidate
+from honduras_shop_aggregator.sellers.models import Seller
+
+
+@receiver(post_save, sender=Seller)
+@receiver(post_delete, sender=Seller)
+def invalidate_seller_pages(sender, instance, **kwargs):
+    invalidate('sellers', f'seller:{instance.pk}')
+
+
+@receiver(image_swapped, sender=Seller)
+def invalidate_swapped_seller_images(sender, pks, **kwargs):
+    invalidate('sellers', *(f'seller:{pk}' for pk in pks))
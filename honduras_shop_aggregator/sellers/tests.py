@@ -4,11 +4,14 @@ import tempfile
 from os.path import join
 
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.translation import gettext as _
 from PIL import Image
 
+from honduras_shop_aggregator.likedproducts.models import LikedProduct
 from honduras_shop_aggregator.products.models import Product
 from honduras_shop_aggregator.sellers.models import Seller
 from honduras_shop_aggregator.users.models import User
@@ -166,6 +169,79 @@ class TestPrivateSellerProfileRead(BaseTestCase):
         self.assertIn("has_next", data)
         self.assertIn("next_page", data)
 
+    def add_liked_products(self, count):
+        likers = list(User.objects.exclude(pk=self.user.pk))
+        for i in range(count):
+            product = Product.objects.create(
+                product_name=f"Dashboard product {Product.objects.count()}",
+                product_price=10,
+                stock_quantity=5,
+                seller=self.seller,
+                category_id=1,
+                origin_city_id=1
+            )
+            for liker in likers[:i % (len(likers) + 1)]:
+                LikedProduct.objects.create(user=liker, product=product)
+
+    def test_like_counts_sorted_without_per_product_queries(self):
+        self.login_user(self.user)
+        url = reverse(
+            'seller_profile', kwargs={'store_name': self.seller.store_name}
+        )
+        self.add_liked_products(3)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {"sort": "-likes"})
+        self.add_liked_products(25)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(url, {"sort": "-likes"})
+        products = list(response.context['products'])
+        self.assertEqual(len(products), 20)
+        counts = [product.likes_count for product in products]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        for product in products:
+            self.assertEqual(product.likes_count, product.likes.count())
+            self.assertFalse(product.is_liked)
+
+    def test_load_more_by_like_count_pages_through_every_product(self):
+        self.login_user(self.user)
+        url = reverse(
+            'seller_profile', kwargs={'store_name': self.seller.store_name}
+        )
+        self.add_liked_products(45)
+        response = self.client.get(url, {"sort": "-likes"})
+        products = list(response.context['products'])
+        data = {"next_page": response.context['page_obj'].next_cursor}
+        pages = [response.context['page_obj']]
+        while data["next_page"]:
+            data = self.client.get(
+                url,
+                {"sort": "-likes", "cursor": data["next_page"]},
+                HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+            ).json()
+            pages.append(data)
+        self.assertEqual(len(pages), 3)
+        expected = list(
+            Product.objects.filter(seller=self.seller, is_deleted=False)
+            .with_like_state(self.user)
+            .order_by('-likes_count', '-date_added', '-pk')
+        )
+        self.assertEqual(products, expected[:20])
+        html = "".join(page["html"] for page in pages[1:])
+        for product in expected[20:]:
+            self.assertIn(product.product_name, html)
+
+    def test_cursor_of_another_sort_is_not_found(self):
+        self.login_user(self.user)
+        url = reverse(
+            'seller_profile', kwargs={'store_name': self.seller.store_name}
+        )
+        self.add_liked_products(25)
+        response = self.client.get(url, {"sort": "-likes"})
+        cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(url, {"sort": "product_name", "cursor": cursor})
+        self.assertEqual(response.status_code, 404)
+
     def test_seller_profile_ajax_uses_seller_grid(self):
         self.login_user(self.user)
         response = self.client.get(
@@ -180,6 +256,37 @@ class TestPrivateSellerProfileRead(BaseTestCase):
         self.assertIn("product-active-toggle", html)
 
 
+    def test_export_own_products_streams_filtered_catalog(self):
+        self.login_user(self.user)
+        response = self.client.get(
+            reverse(
+                "seller_profile",
+                kwargs={"store_name": self.seller.store_name},
+            ),
+            {"export": "csv", "status": "inactive"},
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response["Content-Disposition"],
+            f'attachment; filename="{self.seller.store_name}-products.csv"'
+        )
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith("slug,product_name,category"))
+        self.assertEqual(len(lines), 2)
+        self.assertIn(self.unavailable_product.slug, lines[1])
+
+    def test_export_other_store_denied(self):
+        self.login_user(User.objects.get(username="otheruser"))
+        response = self.client.get(
+            reverse(
+                "seller_profile",
+                kwargs={"store_name": self.seller.store_name},
+            ),
+            {"export": "jsonl"},
+        )
+        self.assertRedirects(response, reverse("index"))
+
+
 class TestPublicSellerProfileRead(BaseTestCase):
 
     def setUp(self):
@@ -387,7 +494,7 @@ class TestSellerCreate(BaseTestCase):
         img = Image.open(seller.image.path)
         self.assertEqual(img.size, (240, 240))
         self.assertIsNotNone(seller.image)
-        self.assertEqual(seller.image.name, f'sellers/{seller.store_name}.jpg')
+        self.assertRegex(seller.image.name, r'^images/[0-9a-f]{2}/[0-9a-f]{32}\.jpg$')
         self.assertRedirectWithMessage(
             response,
             'seller_profile',
@@ -808,5 +915,5 @@ class TestUserModeSwitch(BaseTestCase):
         html = response.content.decode()
         assert _('Switch to Seller Mode') not in html
         assert _('Switch to User Mode') not in html
-        assert self.client.session['mode'] == 'user'
+        assert self.client.session.get('mode', 'user') == 'user'
         assert response.context['mode'] == 'user'
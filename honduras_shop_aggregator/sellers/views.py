@@ -1,11 +1,7 @@
 from django.contrib import messages
 from django.contrib.messages.views import SuccessMessageMixin
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.db import transaction
-from django.db.models import Count
-from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect
-from django.template.loader import render_to_string
 from django.urls import reverse_lazy
 from django.utils import timezone
 from django.utils.translation import gettext as _
@@ -13,7 +9,12 @@ from django.views.generic import DetailView, ListView, TemplateView
 from django.views.generic.edit import CreateView, UpdateView
 
 from honduras_shop_aggregator import utils
+from honduras_shop_aggregator.likedproducts.liked_set import LikedSet
+from honduras_shop_aggregator.pagination import load_more_response, paginate
+from honduras_shop_aggregator.products.exports import (EXPORT_FORMATS,
+                                                       export_response)
 from honduras_shop_aggregator.products.models import Product
+from honduras_shop_aggregator.response_cache import AnonymousResponseCacheMixin
 from honduras_shop_aggregator.sellers.forms import (SellerCreateForm,
                                                     SellerDeleteForm,
                                                     SellerUpdateForm)
@@ -62,77 +63,69 @@ class SellerProfileView(
             Seller, store_name=self.kwargs["store_name"], is_deleted=False
         )
 
+    def get(self, request, *args, **kwargs):
+        file_format = request.GET.get("export")
+        if file_format in EXPORT_FORMATS:
+            seller = self.get_object()
+            return export_response(
+                self.filter_products(seller),
+                file_format,
+                f"{seller.store_name}-products",
+                base_url=request.build_absolute_uri("/").rstrip("/")
+            )
+        return super().get(request, *args, **kwargs)
+
+    def filter_products(self, seller):
+        """The seller's products matching the search and status filters."""
+        products = Product.objects.filter(
+            seller=seller,
+            is_deleted=False
+        )
+        search = self.request.GET.get("search")
+        if search:
+            products = products.filter(
+                product_name__icontains=search
+            )
+        status = self.request.GET.get("status")
+        if status == "active":
+            products = products.visible()
+        elif status == "inactive":
+            products = products.filter(
+                is_active=False
+            )
+        elif status == "out":
+            products = products.filter(
+                stock_quantity=0
+            )
+        return products
+
     def get_context_data(self, **kwargs):
             context = super().get_context_data(**kwargs)
-            profile_seller = context['seller']
-            products = Product.objects.filter(
-                seller=profile_seller,
-                is_deleted=False
-            )
-            search = self.request.GET.get("search")
-            if search:
-                products = products.filter(
-                    product_name__icontains=search
-                )
-            status = self.request.GET.get("status")
-            if status == "active":
-                products = products.filter(
-                    is_active=True,
-                    stock_quantity__gt=0,
-                )
-            elif status == "inactive":
-                products = products.filter(
-                    is_active=False
-                )
-            elif status == "out":
-                products = products.filter(
-                    stock_quantity=0
-                )
+            products = self.filter_products(context['seller'])
             sort = self.request.GET.get("sort")
+            products = products.with_like_state(self.request.user)
             if sort == "product_name":
                 products = products.order_by("product_name")
             elif sort == "-likes":
-                products = products.annotate(
-                    likes_count=Count("likes")
-                ).order_by("-likes_count")
+                products = products.order_by("-likes_count", "-date_added")
             else:
                 products = products.order_by("-date_added")
-            for product in products:
-                product.is_liked = product.likes.filter(user=self.request.user).exists()
-            paginator = Paginator(products, self.paginate_by)
-            page = self.request.GET.get('page')
-            try:
-                products = paginator.page(page)
-            except PageNotAnInteger:
-                products = paginator.page(1)
-            except EmptyPage:
-                products = paginator.page(paginator.num_pages)
+            products = paginate(self.request, products, self.paginate_by)
             context['page_obj'] = products
             context['products'] = products
             return context
 
     def render_to_response(self, context, **response_kwargs):
         """Return JSON if AJAX, otherwise full page."""
-        request = self.request
-        if request.headers.get("x-requested-with") == "XMLHttpRequest":
-            html = render_to_string(
-                "partials/_seller_product_grid.html", 
-                {"products": context["products"], "request": request},
-                request=request
+        if self.request.headers.get("x-requested-with") == "XMLHttpRequest":
+            return load_more_response(
+                self.request, context["page_obj"], "partials/_seller_product_grid.html"
             )
-            page_obj = context["page_obj"]
-            return JsonResponse({
-                "html": html,
-                "has_next": page_obj.has_next(),
-                "next_page": (
-                    page_obj.next_page_number() if page_obj.has_next() else None
-                )
-            })
         return super().render_to_response(context, **response_kwargs)
 
 
 class PublicSellerProfileView(
-    SuccessMessageMixin, DetailView
+    AnonymousResponseCacheMixin, SuccessMessageMixin, DetailView
 ):
     model = Seller
     template_name = 'pages/sellers/public_profile.html'
@@ -149,49 +142,28 @@ class PublicSellerProfileView(
     def get_context_data(self, **kwargs):
             context = super().get_context_data(**kwargs)
             profile_seller = context['seller']
-            products = Product.objects.filter(
-                seller=profile_seller,
-                is_deleted=False,
-                is_active=True,
-                stock_quantity__gt=0
-            )
-            if self.request.user.is_authenticated:
-                liked_ids = self.request.user.likes.values_list("product_id", flat=True)
-                for product in products:
-                    product.is_liked = product.pk in liked_ids
-            else:
-                liked_products = self.request.session.get('liked_products', [])
-                for product in products:
-                    product.is_liked = product.pk in liked_products
-            paginator = Paginator(products, self.paginate_by)
-            page = self.request.GET.get('page')
-            try:
-                products = paginator.page(page)
-            except PageNotAnInteger:
-                products = paginator.page(1)
-            except EmptyPage:
-                products = paginator.page(paginator.num_pages)
+            products = Product.objects.visible().filter(
+                seller=profile_seller
+            ).for_grid(self.request.visitor.city_pk)
+            products = paginate(self.request, products, self.paginate_by)
+            LikedSet.for_request(self.request, products).mark(products)
             context['page_obj'] = products
             context['products'] = products
             return context
 
+    def get_cache_tags(self):
+        seller_pk = (
+            Seller.objects.filter(store_name=self.kwargs['store_name'])
+            .values_list('pk', flat=True).first()
+        )
+        return ('products', 'cities', f'seller:{seller_pk}')
+
     def render_to_response(self, context, **response_kwargs):
         """Return JSON if AJAX, otherwise full page."""
-        request = self.request
-        if request.headers.get("x-requested-with") == "XMLHttpRequest":
-            html = render_to_string(
-                "partials/_product_grid.html", 
-                {"products": context["products"], "request": request},
-                request=request
+        if self.request.headers.get("x-requested-with") == "XMLHttpRequest":
+            return load_more_response(
+                self.request, context["page_obj"], "partials/_product_grid.html"
             )
-            page_obj = context["page_obj"]
-            return JsonResponse({
-                "html": html,
-                "has_next": page_obj.has_next(),
-                "next_page": (
-                    page_obj.next_page_number() if page_obj.has_next() else None
-                )
-            })
         return super().render_to_response(context, **response_kwargs)
 
 
@@ -0,0 +1,139 @@
+"""
+Finds the code that makes a request save its session.
+
+With SESSION_AUDIT on, SessionWriteAuditMiddleware records the project
+function that marked the session modified, whether by setting a key or
+through Django (login, logout, messages that overflow their cookie):
+
+    X-Session-Writes: honduras_shop_aggregator/views.py:74 switch_mode
+
+"none" means nothing marked the session modified. The writers are also
+counted across requests, see session_write_stats(), so a write that only
+happens on some paths shows up after a while of browsing.
+"""
+import hashlib
+import os
+import sys
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+
+SESSION_AUDIT_PREFIX = 'session_audit'
+SESSION_AUDIT_HEADER = 'X-Session-Writes'
+WRITERS_KEY = f'{SESSION_AUDIT_PREFIX}:writers'
+REQUESTS_KEY = f'{SESSION_AUDIT_PREFIX}:requests'
+DIRTY_REQUESTS_KEY = f'{SESSION_AUDIT_PREFIX}:dirty_requests'
+
+audited_classes = {}
+
+
+def writer():
+    """The innermost project frame calling into the session: file:line name."""
+    root = str(settings.BASE_DIR) + os.sep
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(root) and filename != __file__:
+            return (
+                f"{os.path.relpath(filename, root)}:{frame.f_lineno} "
+                f"{frame.f_code.co_name}"
+            )
+        frame = frame.f_back
+    return 'django'
+
+
+class AuditedSession:
+    """Records a writer whenever the session is marked modified."""
+
+    @property
+    def modified(self):
+        return self.__dict__['_modified']
+
+    @modified.setter
+    def modified(self, value):
+        if value:
+            self.writers.append(writer())
+        self.__dict__['_modified'] = value
+
+
+def audit(session):
+    """Turns `session` into an audited instance of its own class."""
+    cls = type(session)
+    if cls not in audited_classes:
+        audited_classes[cls] = type(
+            f'Audited{cls.__name__}', (AuditedSession, cls), {}
+        )
+    modified = session.__dict__.pop('modified', False)
+    session.__class__ = audited_classes[cls]
+    session.__dict__['_modified'] = modified
+    session.writers = []
+    return session
+
+
+def increment(key, value=1):
+    if not cache.add(key, value, timeout=None):
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            cache.set(key, value, timeout=None)
+
+
+def writer_key(name):
+    digest = hashlib.md5(name.encode()).hexdigest()
+    return f'{SESSION_AUDIT_PREFIX}:writes:{digest}'
+
+
+def record(writers):
+    increment(REQUESTS_KEY)
+    if not writers:
+        return
+    increment(DIRTY_REQUESTS_KEY)
+    known = cache.get(WRITERS_KEY, set())
+    if not known.issuperset(writers):
+        cache.set(WRITERS_KEY, known | set(writers), timeout=None)
+    for name in writers:
+        increment(writer_key(name))
+
+
+def session_write_stats():
+    """Audited and session-saving requests, and the requests per writer."""
+    names = sorted(cache.get(WRITERS_KEY, set()))
+    counts = cache.get_many([
+        REQUESTS_KEY, DIRTY_REQUESTS_KEY, *(writer_key(name) for name in names)
+    ])
+    return {
+        'requests': counts.get(REQUESTS_KEY, 0),
+        'dirty_requests': counts.get(DIRTY_REQUESTS_KEY, 0),
+        'writers': {name: counts.get(writer_key(name), 0) for name in names},
+    }
+
+
+def reset_session_write_stats():
+    names = cache.get(WRITERS_KEY, set())
+    cache.delete_many([
+        WRITERS_KEY,
+        REQUESTS_KEY,
+        DIRTY_REQUESTS_KEY,
+        *(writer_key(name) for name in names),
+    ])
+
+
+class SessionWriteAuditMiddleware:
+    """
+    Reports what dirtied the session of each request. Goes right after
+    SessionMiddleware and is only loaded with SESSION_AUDIT on.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SESSION_AUDIT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        session = audit(request.session)
+        response = self.get_response(request)
+        writers = list(dict.fromkeys(session.writers))
+        record(writers)
+        response[SESSION_AUDIT_HEADER] = ', '.join(writers) or 'none'
+        return response
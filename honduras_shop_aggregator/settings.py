@@ -16,6 +16,8 @@ from pathlib import Path
 import dj_database_url
 from dotenv import load_dotenv
 
+from honduras_shop_aggregator import cache_url
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -54,6 +56,7 @@ INSTALLED_APPS = [
     'honduras_shop_aggregator.categories',
     'honduras_shop_aggregator.cities',
     'honduras_shop_aggregator.likedproducts',
+    'honduras_shop_aggregator.images',
     "crispy_forms",
     "crispy_bootstrap5",
 ]
@@ -61,10 +64,12 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'honduras_shop_aggregator.session_audit.SessionWriteAuditMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'honduras_shop_aggregator.visitor.VisitorMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -106,6 +111,27 @@ DATABASES = {
     )
 }
 
+# Cache and sessions
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# https://docs.djangoproject.com/en/5.1/topics/http/sessions/
+
+CACHES = {
+    'default': cache_url.config(),
+}
+
+# Sessions are stored in the database. With a cache every process shares
+# they are read through it, so most requests do not query the session table.
+SESSION_ENGINE = os.getenv(
+    'SESSION_ENGINE',
+    'django.contrib.sessions.backends.cached_db'
+    if cache_url.is_shared(CACHES['default'])
+    else 'django.contrib.sessions.backends.db'
+)
+
+# Reports the code that dirtied the session in an X-Session-Writes header
+# and counts it, see `manage.py session_write_stats`. Meant for development.
+SESSION_AUDIT = os.getenv('SESSION_AUDIT', 'False') == 'True'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -122,6 +148,10 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = 'users.User'
 
+AUTHENTICATION_BACKENDS = [
+    'honduras_shop_aggregator.users.backends.EmailOrUsernameBackend',
+]
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -155,3 +185,14 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, os.getenv('MEDIA_ROOT', 'media/'))
+
+# With async processing on, uploads are stored raw and the placeholder is
+# shown until `manage.py process_image_jobs` has processed them, renditions
+# included. With it off, the request writes the renditions after its commit.
+IMAGE_PROCESSING_ASYNC = os.getenv('IMAGE_PROCESSING_ASYNC', 'False') == 'True'
+IMAGE_JOB_WORKERS = int(os.getenv('IMAGE_JOB_WORKERS', os.cpu_count() or 1))
+
+# Seconds catalog pages are cached for anonymous visitors; 0 turns it off.
+# Off by default. Only turn it on when every process shares the cache, or an
+# edit handled by one process leaves the others serving stale pages.
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', '0'))
@@ -0,0 +1,152 @@
+import itertools
+import re
+from collections import Counter
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Count, Max, Q
+from django.db.models.functions import Cast, Substr
+from django.utils.text import slugify
+
+SLUG_ATTEMPTS = 5
+# Room kept for "-<n>" when a slug has to be cut to the field's max_length.
+SUFFIX_WIDTH = 10
+# Longer numeric tails are part of the name, such as a barcode, not
+# suffixes added on a collision.
+SUFFIX_DIGITS = 6
+SUFFIX_LIMIT = 10 ** SUFFIX_DIGITS
+# Suffixes checked per query once the suffix space is used up.
+SLUG_PROBES = 20
+
+
+def slug_base(model, source):
+    """
+    The slug of `source`, or the model name when nothing of it is left,
+    as with names in other scripts or made of punctuation.
+    """
+    return slugify(source) or model._meta.model_name
+
+
+def slug_stem(base, max_length=None):
+    """
+    Cuts `base` to `max_length`; returns it with the shorter stem that
+    numbered suffixes follow.
+    """
+    if not max_length:
+        return base, base
+    base = base[:max_length].rstrip('-')
+    return base, base[:max_length - SUFFIX_WIDTH].rstrip('-')
+
+
+def slug_usage(queryset, base, field_name='slug', max_length=None):
+    """
+    Returns (base, stem, whether base is taken, highest suffix in use or 0),
+    with a single aggregate query over the slugs that start with the stem.
+    """
+    base, stem = slug_stem(base, max_length)
+    suffixed = Q(**{
+        f'{field_name}__regex': rf'^{re.escape(stem)}-[0-9]{{1,{SUFFIX_DIGITS}}}$'
+    })
+    found = queryset.filter(
+        Q(**{field_name: base}) | Q(**{f'{field_name}__startswith': f'{stem}-'})
+    ).aggregate(
+        base_taken=Count('pk', filter=Q(**{field_name: base})),
+        last=Max(
+            Cast(Substr(field_name, len(stem) + 2), BigIntegerField()),
+            filter=suffixed
+        ),
+    )
+    return base, stem, bool(found['base_taken']), found['last'] or 0
+
+
+def suffixed_slugs(queryset, stem, last, field_name='slug'):
+    """
+    Yields free `<stem>-<n>` slugs, starting one past `last`, the highest
+    suffix in use.
+
+    No suffix above `last` is taken, so those are yielded without a query.
+    Once they run out, the suffixes from 1 are checked for gaps.
+    """
+    for number in range(last + 1, SUFFIX_LIMIT):
+        yield f"{stem}-{number}"
+    for start in itertools.count(1, SLUG_PROBES):
+        candidates = [f"{stem}-{n}" for n in range(start, start + SLUG_PROBES)]
+        taken = set(
+            queryset.filter(**{f'{field_name}__in': candidates})
+            .values_list(field_name, flat=True)
+        )
+        yield from (slug for slug in candidates if slug not in taken)
+
+
+def next_free_slug(queryset, base, field_name='slug', max_length=None):
+    """
+    Returns `base`, or `<base>-<n>` with n one past the highest suffix in use,
+    or the lowest free one when that would be longer than SUFFIX_DIGITS.
+
+    Long slugs are cut to `max_length`, and suffixes go after a shorter stem
+    so they always fit.
+    """
+    base, stem, taken, last = slug_usage(queryset, base, field_name, max_length)
+    if not taken:
+        return base
+    return next(suffixed_slugs(queryset, stem, last, field_name))
+
+
+def allocate_slugs(queryset, sources, field_name='slug', max_length=None):
+    """
+    next_free_slug() for a batch of new objects; returns one slug per source.
+
+    Free slugs are found with one query for the whole batch. Only names
+    that are taken, or repeated within the batch, cost a query each.
+    """
+    bases = [
+        slug_stem(slug_base(queryset.model, source), max_length)[0]
+        for source in sources
+    ]
+    counts = Counter(bases)
+    taken = set(
+        queryset.filter(**{f'{field_name}__in': counts})
+        .values_list(field_name, flat=True)
+    )
+    suffixes = {}
+    used = set()
+    slugs = []
+    for base in bases:
+        slug = base
+        while slug in taken or slug in used:
+            if base not in suffixes:
+                _, stem, _, last = slug_usage(
+                    queryset, base, field_name, max_length
+                )
+                suffixes[base] = suffixed_slugs(queryset, stem, last, field_name)
+            slug = next(suffixes[base])
+        used.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def save_with_slug(instance, save, source, field_name='slug'):
+    """
+    Fills the empty slug of `instance` from `source` and calls `save()`.
+
+    When a concurrent save takes the same slug first, the unique check or
+    constraint fails; the next free suffix is then tried, a few times.
+    """
+    model = type(instance)
+    field = model._meta.get_field(field_name)
+    base = slug_base(model, source)
+    for attempt in range(1, SLUG_ATTEMPTS + 1):
+        slug = next_free_slug(
+            model._default_manager.all(), base, field_name, field.max_length
+        )
+        setattr(instance, field_name, slug)
+        try:
+            with transaction.atomic():
+                return save()
+        except (IntegrityError, ValidationError):
+            setattr(instance, field_name, '')
+            taken = model._default_manager.filter(
+                **{field_name: slug}
+            ).exclude(pk=instance.pk).exists()
+            if attempt == SLUG_ATTEMPTS or not taken:
+                raise
@@ -0,0 +1,34 @@
+// Pages anonymous visitors see leave the CSRF token out, so that they set
+// no cookie. The token is fetched the first time the page posts something.
+function getCsrfToken() {
+    const input = document.querySelector('[name=csrfmiddlewaretoken]');
+    if (input) {
+        return Promise.resolve(input.value);
+    }
+    const cookie = document.cookie
+        .split('; ')
+        .find(row => row.startsWith('csrftoken='));
+    if (cookie) {
+        return Promise.resolve(decodeURIComponent(cookie.split('=')[1]));
+    }
+    return fetch(csrfTokenUrl)
+        .then(response => response.json())
+        .then(data => data.token);
+}
+
+// Forms marked data-csrf get the token added when they are submitted.
+document.addEventListener('submit', function (event) {
+    const form = event.target;
+    if (!form.matches('form[data-csrf]') || form.elements.csrfmiddlewaretoken) {
+        return;
+    }
+    event.preventDefault();
+    getCsrfToken().then(token => {
+        const input = document.createElement('input');
+        input.type = 'hidden';
+        input.name = 'csrfmiddlewaretoken';
+        input.value = token;
+        form.appendChild(input);
+        form.requestSubmit(event.submitter);
+    });
+});
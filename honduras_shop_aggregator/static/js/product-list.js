@@ -6,7 +6,7 @@ document.addEventListener('DOMContentLoaded', function () {
         loadMoreBtn.addEventListener("click", function () {
             const nextPage = this.dataset.nextPage;
             const params = new URLSearchParams(window.location.search);
-            params.set("page", nextPage);
+            params.set("cursor", nextPage);
             fetch(`?${params.toString()}`, {
                 headers: {
                     "X-Requested-With": "XMLHttpRequest"
@@ -26,7 +26,6 @@ document.addEventListener('DOMContentLoaded', function () {
     }
 
     function attachLikeEvents() {
-        const csrfToken = document.querySelector('[name=csrfmiddlewaretoken]').value;
         document.querySelectorAll('.like-btn').forEach(btn => {
             if (!btn.dataset.bound) {
                 btn.dataset.bound = "true";
@@ -34,13 +33,13 @@ document.addEventListener('DOMContentLoaded', function () {
                     const productId = this.dataset.productId;
                     const url = toggleLikeUrl.replace('0', productId);  // 👈 more on this below
 
-                    fetch(url, {
+                    getCsrfToken().then(csrfToken => fetch(url, {
                         method: 'POST',
                         headers: {
                             'X-CSRFToken': csrfToken,
                             'Content-Type': 'application/json'
                         },
-                    })
+                    }))
                     .then(response => response.json())
                     .then(data => {
                         this.textContent = data.status === 'liked' ? '❤️' : '🤍';
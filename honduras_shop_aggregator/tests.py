@@ -0,0 +1,348 @@
+import io
+import os
+from importlib import import_module
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Q
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from honduras_shop_aggregator import cache_url
+from honduras_shop_aggregator.categories.models import Category
+from honduras_shop_aggregator.cities.models import City
+from honduras_shop_aggregator.likedproducts.models import LikedProduct
+from honduras_shop_aggregator.pagination import cursor_state
+from honduras_shop_aggregator.products.models import (AVAILABILITY_DELIVERY,
+                                                      AVAILABILITY_LOCAL,
+                                                      AVAILABILITY_UNAVAILABLE,
+                                                      Product)
+from honduras_shop_aggregator.sellers.models import Seller
+from honduras_shop_aggregator.session_audit import (SESSION_AUDIT_HEADER,
+                                                    session_write_stats)
+from honduras_shop_aggregator.users.models import User
+from honduras_shop_aggregator.utils import BaseTestCase
+from honduras_shop_aggregator.views import IndexView
+from honduras_shop_aggregator.visitor import (CITY_COOKIE, LIKES_COOKIE,
+                                              MAX_ANONYMOUS_LIKES, Visitor)
+
+
+class TestIndexShuffle(BaseTestCase):
+
+    def setUp(self):
+        self.paginate_by = IndexView.paginate_by
+        seller = Seller.objects.get(pk=3)
+        category = Category.objects.get(pk=1)
+        city = City.objects.get(pk=1)
+        for i in range(self.paginate_by + 6):
+            Product.objects.create(
+                product_name=f"Shuffled {i}",
+                product_price=10 + i,
+                stock_quantity=5,
+                seller=seller,
+                category=category,
+                origin_city=city
+            )
+        self.visible = Product.objects.filter(
+            is_active=True, stock_quantity__gt=0, is_deleted=False
+        )
+        self.visible_in_capital = self.visible.filter(
+            Q(origin_city=1) | Q(delivery_cities=1)
+        ).distinct()
+
+    def test_same_seed_gives_same_order(self):
+        first = list(self.visible.shuffled(42).values_list('pk', flat=True))
+        second = list(self.visible.shuffled(42).values_list('pk', flat=True))
+        self.assertEqual(first, second)
+        self.assertCountEqual(first, self.visible.values_list('pk', flat=True))
+
+    def test_different_seeds_give_different_orders(self):
+        first = list(self.visible.shuffled(1).values_list('pk', flat=True))
+        second = list(self.visible.shuffled(2).values_list('pk', flat=True))
+        self.assertNotEqual(first, second)
+
+    def test_load_more_continues_the_order_of_the_first_page(self):
+        self.client.get(reverse('set_city', kwargs={'city_pk': 1}))
+        response = self.client.get(reverse('index'))
+        first_page = [product.pk for product in response.context['products']]
+        self.assertEqual(len(first_page), self.paginate_by)
+        first_cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(
+            reverse('index'),
+            {"cursor": first_cursor},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+        )
+        data = response.json()
+        self.assertFalse(data["has_next"])
+        seed = cursor_state(first_cursor)
+        expected = list(
+            self.visible_in_capital.shuffled(seed).values_list('pk', flat=True)
+        )
+        self.assertEqual(first_page, expected[:self.paginate_by])
+        for pk in expected[self.paginate_by:]:
+            self.assertIn(f'data-product-id="{pk}"', data["html"])
+
+    def test_only_requested_page_is_fetched(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('index'))
+        product_queries = [
+            query["sql"] for query in queries
+            if 'FROM "products_product"' in query["sql"]
+            and not query["sql"].startswith("SELECT COUNT(")
+        ]
+        self.assertTrue(product_queries)
+        # One row more than a page tells whether there is a next page.
+        for sql in product_queries:
+            self.assertIn(f"LIMIT {self.paginate_by + 1}", sql)
+
+
+class TestProductGridQueries(BaseTestCase):
+    """Rendering more cards must not cost more queries."""
+
+    def setUp(self):
+        self.user = User.objects.get(pk=1)
+        self.seller = Seller.objects.get(pk=3)
+        self.capital = City.objects.get(pk=1)
+        self.second_city = City.objects.get(pk=2)
+        self.client.get(reverse('set_city', kwargs={'city_pk': 1}))
+
+    def add_products(self, count):
+        for i in range(count):
+            origin = self.capital if i % 2 else self.second_city
+            product = Product.objects.create(
+                product_name=f"Grid product {Product.objects.count()}",
+                product_price=10,
+                stock_quantity=5,
+                seller=self.seller,
+                category_id=1,
+                origin_city=origin
+            )
+            product.delivery_cities.add(self.capital)
+            LikedProduct.objects.create(user=self.user, product=product)
+
+    def assertConstantQueries(self, url, data=None, **extra):
+        self.add_products(2)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data, **extra)
+        self.assertEqual(response.status_code, 200)
+        self.add_products(4)
+        with self.assertNumQueries(len(queries)):
+            self.client.get(url, data, **extra)
+
+    def test_index(self):
+        self.assertConstantQueries(reverse('index'))
+
+    def test_index_load_more(self):
+        self.assertConstantQueries(
+            reverse('index'), {"page": 1}, HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+        )
+
+    def test_product_list(self):
+        self.assertConstantQueries(reverse('product_list'))
+
+    def test_category_page(self):
+        self.assertConstantQueries(
+            reverse('category_page', kwargs={'slug': 'general'})
+        )
+
+    def test_public_seller_profile(self):
+        self.assertConstantQueries(reverse(
+            'public_seller_profile',
+            kwargs={'store_name': self.seller.store_name}
+        ))
+
+    def test_user_profile(self):
+        self.login_user(self.user)
+        self.assertConstantQueries(reverse(
+            'user_profile', kwargs={'username': self.user.username}
+        ))
+
+    def test_availability_annotation(self):
+        local = Product.objects.get(pk=4)
+        delivered = Product.objects.get(pk=1)
+        self.assertEqual(local.origin_city, self.capital)
+        self.assertIn(self.second_city, delivered.delivery_cities.all())
+        products = Product.objects.with_availability(self.second_city.pk)
+        self.assertEqual(
+            products.get(pk=delivered.pk).city_availability,
+            AVAILABILITY_DELIVERY
+        )
+        self.assertEqual(
+            products.get(pk=local.pk).city_availability,
+            AVAILABILITY_UNAVAILABLE
+        )
+        products = Product.objects.with_availability(self.capital.pk)
+        self.assertEqual(
+            products.get(pk=local.pk).city_availability, AVAILABILITY_LOCAL
+        )
+
+
+class TestVisitorCookies(BaseTestCase):
+
+    def test_anonymous_browsing_writes_no_session(self):
+        self.client.get(reverse('index'))
+        self.client.get(reverse('set_city', kwargs={'city_pk': 2}))
+        self.client.post(reverse('toggle_like', kwargs={'product_pk': 1}))
+        response = self.client.get(reverse('product_list'))
+        self.assertContains(response, 'Second City')
+        self.assertFalse(Session.objects.exists())
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+        self.assertEqual(self.visitor_cookie(CITY_COOKIE), [2])
+        self.assertEqual(self.visitor_cookie(LIKES_COOKIE), [1])
+
+    def test_unchanged_values_set_no_cookie(self):
+        self.client.get(reverse('set_city', kwargs={'city_pk': 2}))
+        response = self.client.get(reverse('product_list'))
+        self.assertNotIn(CITY_COOKIE, response.cookies)
+
+    def test_tampered_cookie_is_ignored(self):
+        self.client.get(reverse('set_city', kwargs={'city_pk': 2}))
+        self.client.cookies[CITY_COOKIE] = '2:forged'
+        response = self.client.get(reverse('product_list'))
+        self.assertEqual(response.context['current_city'].pk, 1)
+
+    def test_session_values_move_to_cookies(self):
+        session = self.client.session
+        session['city_pk'] = 2
+        session['city_name'] = 'Second City'
+        session['liked_products'] = [1]
+        session.save()
+        response = self.client.get(reverse('product_list'))
+        self.assertEqual(response.context['current_city'].pk, 2)
+        self.assertEqual(self.visitor_cookie(CITY_COOKIE), [2])
+        self.assertEqual(self.visitor_cookie(LIKES_COOKIE), [1])
+        session = self.client.session
+        self.assertNotIn('city_pk', session)
+        self.assertNotIn('city_name', session)
+        self.assertNotIn('liked_products', session)
+
+    def test_anonymous_catalog_pages_carry_no_cookie_headers(self):
+        for name in ('index', 'product_list', 'category_list'):
+            with self.subTest(name):
+                response = self.client_class().get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('Cookie', response.get('Vary', ''))
+                self.assertFalse(response.cookies)
+
+    def test_csrf_token_is_fetched_on_demand(self):
+        client = self.client_class(enforce_csrf_checks=True)
+        token = client.get(reverse('csrf_token')).json()['token']
+        response = client.post(
+            reverse('toggle_like', kwargs={'product_pk': 1}),
+            headers={'X-CSRFToken': token}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_anonymous_likes_are_capped(self):
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+        visitor = Visitor(request)
+        visitor.liked_products = range(MAX_ANONYMOUS_LIKES + 10)
+        self.assertEqual(len(visitor.liked_products), MAX_ANONYMOUS_LIKES)
+        self.assertEqual(visitor.liked_products[0], 10)
+
+
+class TestCacheURL(SimpleTestCase):
+
+    def test_redis(self):
+        config = cache_url.parse('redis://cache:6379/1?key_prefix=shop')
+        self.assertEqual(config, {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': 'redis://cache:6379/1',
+            'KEY_PREFIX': 'shop',
+        })
+        self.assertTrue(cache_url.is_shared(config))
+
+    def test_file(self):
+        config = cache_url.parse('file:///var/tmp/shop?timeout=none')
+        self.assertEqual(config['LOCATION'], '/var/tmp/shop')
+        self.assertIsNone(config['TIMEOUT'])
+        self.assertTrue(cache_url.is_shared(config))
+
+    def test_locmem_is_the_default(self):
+        with mock.patch.dict(os.environ, {'CACHE_URL': ''}):
+            config = cache_url.config()
+        self.assertEqual(
+            config['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache'
+        )
+        self.assertFalse(cache_url.is_shared(config))
+
+    def test_options(self):
+        config = cache_url.parse('locmem://catalog?timeout=60&max_entries=5000')
+        self.assertEqual(config['LOCATION'], 'catalog')
+        self.assertEqual(config['TIMEOUT'], 60)
+        self.assertEqual(config['OPTIONS'], {'MAX_ENTRIES': 5000})
+
+    def test_unsupported_urls(self):
+        for url in ('memcached://cache:11211', 'redis://cache?pool=1', 'file://'):
+            with self.subTest(url=url), self.assertRaises(ImproperlyConfigured):
+                cache_url.parse(url)
+
+
+@override_settings(SESSION_AUDIT=True)
+class TestSessionWrites(BaseTestCase):
+
+    def setUp(self):
+        self.user = User.objects.get(pk=1)
+        self.product = Product.objects.get(pk=1)
+        self.session_store = import_module(settings.SESSION_ENGINE).SessionStore
+
+    def browse(self):
+        urls = [
+            reverse('index'),
+            reverse('product_list'),
+            reverse('product_card', kwargs={'slug': self.product.slug}),
+            reverse('category_page', kwargs={'slug': self.product.category.slug}),
+            reverse('public_seller_profile', kwargs={
+                'store_name': self.product.seller.store_name
+            }),
+        ]
+        return [self.client.get(url) for url in urls]
+
+    def assertBrowsingSavesNoSession(self):
+        self.browse()
+        with mock.patch.object(self.session_store, 'save') as save:
+            responses = self.browse() + self.browse()
+        save.assert_not_called()
+        for response in responses:
+            self.assertEqual(response[SESSION_AUDIT_HEADER], 'none')
+
+    def test_repeated_gets_save_no_session_anonymous(self):
+        self.assertBrowsingSavesNoSession()
+
+    def test_repeated_gets_save_no_session_signed_in(self):
+        self.client.post(reverse('login'), {
+            'username': self.user.username,
+            'password': 'correct_password',
+        })
+        self.assertBrowsingSavesNoSession()
+
+    def test_header_names_the_writer(self):
+        self.login_user(self.user)
+        response = self.client.post(reverse('switch_mode'), {'mode': 'user'})
+        self.assertIn('views.py', response[SESSION_AUDIT_HEADER])
+        self.assertIn('switch_mode', response[SESSION_AUDIT_HEADER])
+
+    def test_writers_are_counted(self):
+        self.login_user(self.user)
+        self.client.get(reverse('index'))
+        self.client.post(reverse('switch_mode'), {'mode': 'user'})
+        stats = session_write_stats()
+        self.assertEqual((stats['dirty_requests'], stats['requests']), (1, 2))
+        [(name, count)] = stats['writers'].items()
+        self.assertIn('switch_mode', name)
+        self.assertEqual(count, 1)
+        out = io.StringIO()
+        call_command('session_write_stats', '--reset', stdout=out)
+        self.assertIn('1 of 2 requests', out.getvalue())
+        self.assertEqual(session_write_stats()['requests'], 0)
+
+    @override_settings(SESSION_AUDIT=False)
+    def test_audit_is_off_by_default(self):
+        response = self.client.get(reverse('index'))
+        self.assertNotIn(SESSION_AUDIT_HEADER, response)
@@ -18,5 +18,6 @@ urlpatterns = i18n_patterns(
     path('set-city/<int:city_pk>/', views.SetCityView.as_view(), name='set_city'),
     path('toggle-like/<int:product_pk>/', ToggleLikeView.as_view(), name='toggle_like'),
     path('switch-mode/', views.switch_mode, name='switch_mode'),
+    path('csrf-token/', views.csrf_token, name='csrf_token'),
     path('admin/', admin.site.urls),
 ) + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,40 @@
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Case, Q, Value, When
+from django.db.models.functions import Lower
+
+from .models import User
+
+
+class EmailOrUsernameBackend(ModelBackend):
+    """
+    Authenticates with the username or the email address.
+
+    Both are looked up in one query, the email through the index on its
+    lowercased value, and the password is hashed exactly once. A login
+    that matches nobody hashes it once as well, so it takes as long as a
+    wrong password.
+    """
+
+    def users_for_login(self, login):
+        """Users whose username or email is `login`, the username match first."""
+        return User._default_manager.alias(
+            email_lower=Lower('email')
+        ).filter(
+            Q(username=login) | Q(email_lower=login.lower())
+        ).order_by(
+            Case(When(username=login, then=Value(0)), default=Value(1))
+        )
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        user = self.users_for_login(username).first()
+        if user is None:
+            # Hashes the password like a real check would.
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -1,5 +1,5 @@
 from django import forms
-from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth import authenticate
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 from django.utils.translation import gettext_lazy as _
 
@@ -84,18 +84,10 @@ class EmailOrUsernameAuthenticationForm(AuthenticationForm):
         username_or_email = self.cleaned_data.get('username')
         password = self.cleaned_data.get('password')
         if username_or_email and password:
+            # EmailOrUsernameBackend accepts either one.
             user = authenticate(
                 self.request, username=username_or_email, password=password
             )
-            if user is None:
-                UserModel = get_user_model()
-                try:
-                    user_obj = UserModel.objects.get(email__iexact=username_or_email)
-                    user = authenticate(
-                        self.request, username=user_obj.username, password=password
-                    )
-                except UserModel.DoesNotExist:
-                    pass
             if user is None:
                 raise forms.ValidationError(_("Invalid username/email or password"))
             self.confirm_login_allowed(user)
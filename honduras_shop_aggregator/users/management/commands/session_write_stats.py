@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from honduras_shop_aggregator.session_audit import (reset_session_write_stats,
+                                                    session_write_stats)
+
+
+class Command(BaseCommand):
+    help = (
+        "Prints how many audited requests saved their session and the code "
+        "that marked it modified. Needs SESSION_AUDIT=True."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help="Zero the counters after printing them."
+        )
+
+    def handle(self, *args, **options):
+        stats = session_write_stats()
+        self.stdout.write(
+            f"{stats['dirty_requests']} of {stats['requests']} requests "
+            f"saved the session."
+        )
+        for name, count in sorted(
+            stats['writers'].items(), key=lambda item: -item[1]
+        ):
+            self.stdout.write(f"{count:>8}  {name}")
+        if options['reset']:
+            reset_session_write_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
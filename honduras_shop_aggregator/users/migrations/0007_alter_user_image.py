@@ -0,0 +1,21 @@
+# Generated by Django 5.1.15 on 2026-10-18 08:40
+
+from django.db import migrations
+
+import honduras_shop_aggregator.image_utils
+import honduras_shop_aggregator.images.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_user_deleted_at_user_deleted_email_user_is_deleted'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='image',
+            field=honduras_shop_aggregator.images.fields.ProcessedImageField(blank=True, help_text='Upload JPEG or PNG image up to 15MB.', null=True, upload_to=honduras_shop_aggregator.image_utils.image_upload_path, validators=[honduras_shop_aggregator.image_utils.validate_image]),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.15 on 2026-10-18 08:48
+
+from django.db import migrations
+
+import honduras_shop_aggregator.image_utils
+import honduras_shop_aggregator.images.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_alter_user_image'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='image',
+            field=honduras_shop_aggregator.images.fields.ProcessedImageField(blank=True, help_text='Upload JPEG or PNG image up to 15MB.', null=True, renditions={'card': 160, 'detail': 240, 'thumb': 80}, upload_to=honduras_shop_aggregator.image_utils.image_upload_path, validators=[honduras_shop_aggregator.image_utils.validate_image]),
+        ),
+    ]
@@ -2,8 +2,10 @@ import json
 import os
 import tempfile
 from os.path import join
+from unittest import mock
 
 from django.contrib import auth
+from django.contrib.auth.hashers import get_hasher
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import override_settings
 from django.urls import reverse
@@ -58,6 +60,38 @@ class TestAuthentication(BaseTestCase):
             _("You are logged in")
         )
 
+    def test_login_with_email_ignores_case(self):
+        login_successful = self.client.login(
+            username=self.user.email.upper(),
+            password="correct_password"
+        )
+        self.assertTrue(login_successful, _("User login failed"))
+
+    def assertHashesOnce(self, username, password):
+        hasher = type(get_hasher())
+        with mock.patch.object(
+            hasher, 'encode', autospec=True, side_effect=hasher.encode
+        ) as encode, self.assertNumQueries(1):
+            auth.authenticate(username=username, password=password)
+        self.assertEqual(encode.call_count, 1)
+
+    def test_login_hashes_once_in_one_query(self):
+        self.assertHashesOnce(self.user.username, "correct_password")
+        self.assertHashesOnce(self.user.email, "correct_password")
+        self.assertHashesOnce(self.user.email, "wrong_password")
+        self.assertHashesOnce("nobody@example.com", "correct_password")
+
+    def test_login_prefers_username_over_email(self):
+        other = User.objects.exclude(pk=self.user.pk).first()
+        other.email = self.user.username + "@example.com"
+        other.save()
+        self.user.username = other.email
+        self.user.save()
+        self.assertEqual(
+            auth.authenticate(username=other.email, password="correct_password"),
+            self.user
+        )
+
     def test_logout(self):
         self.login_user(self.user)
         self.client.logout()
@@ -165,7 +199,7 @@ class TestUserCreate(BaseTestCase):
         img = Image.open(user.image.path)
         self.assertEqual(img.size, (240, 240))
         self.assertIsNotNone(user.image)
-        self.assertEqual(user.image.name, f'users/{user.username}.jpg')
+        self.assertRegex(user.image.name, r'^images/[0-9a-f]{2}/[0-9a-f]{32}\.jpg$')
         self.assertRedirectWithMessage(
             response, 'login', _("User is registered successfully")
         )
@@ -3,10 +3,7 @@ from django.contrib.auth import logout
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth.views import LoginView, LogoutView, PasswordChangeView
 from django.contrib.messages.views import SuccessMessageMixin
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
-from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect
-from django.template.loader import render_to_string
 from django.urls import reverse_lazy
 from django.utils import timezone
 from django.utils.translation import gettext as _
@@ -14,7 +11,8 @@ from django.views.generic import DetailView, TemplateView
 from django.views.generic.edit import CreateView, UpdateView
 
 from honduras_shop_aggregator import utils
-from honduras_shop_aggregator.cities.models import City
+from honduras_shop_aggregator.cities.registry import city_registry
+from honduras_shop_aggregator.pagination import load_more_response, paginate
 from honduras_shop_aggregator.products.models import Product
 from honduras_shop_aggregator.users.forms import (
     EmailOrUsernameAuthenticationForm, UserCreateForm, UserDeleteForm,
@@ -43,38 +41,20 @@ class UserProfileView(
             profile_user = context['user']
             products = Product.objects.filter(
                 likes__user=profile_user
-            )
+            ).for_grid(self.request.visitor.city_pk)
+            products = paginate(self.request, products, self.paginate_by)
             for product in products:
                 product.is_liked = True
-            paginator = Paginator(products, self.paginate_by)
-            page = self.request.GET.get('page')
-            try:
-                products = paginator.page(page)
-            except PageNotAnInteger:
-                products = paginator.page(1)
-            except EmptyPage:
-                products = paginator.page(paginator.num_pages)
             context['products'] = products
             context['page_obj'] = products
             return context
 
     def render_to_response(self, context, **response_kwargs):
         """Return JSON if AJAX, otherwise full page."""
-        request = self.request
-        if request.headers.get("x-requested-with") == "XMLHttpRequest":
-            html = render_to_string(
-                "partials/_product_grid.html", 
-                {"products": context["products"], "request": request},
-                request=request
+        if self.request.headers.get("x-requested-with") == "XMLHttpRequest":
+            return load_more_response(
+                self.request, context["page_obj"], "partials/_product_grid.html"
             )
-            page_obj = context["page_obj"]
-            return JsonResponse({
-                "html": html,
-                "has_next": page_obj.has_next(),
-                "next_page": (
-                    page_obj.next_page_number() if page_obj.has_next() else None
-                )
-            })
         return super().render_to_response(context, **response_kwargs)
 
 
@@ -85,8 +65,10 @@ class AnonymousProfileView(
 
     def get_context_data(self, **kwargs):
             context = super().get_context_data(**kwargs)
-            product_pks = self.request.session.get('liked_products', [])
-            products = Product.objects.filter(pk__in=product_pks)
+            visitor = self.request.visitor
+            products = Product.objects.filter(
+                pk__in=visitor.liked_products
+            ).for_grid(visitor.city_pk)
             for product in products:
                 product.is_liked = True
             context['products'] = products
@@ -117,14 +99,11 @@ class UserLoginView(SuccessMessageMixin, LoginView):
     def form_valid(self, form):
         response = super().form_valid(form)
         user = self.request.user
-        capital_city = City.objects.get(pk=1)
-        city = user.preferred_delivery_city
-        if city:
-            self.request.session['city_pk'] = city.pk
-            self.request.session['city_name'] = city.name
-        else:
-            self.request.session['city_pk'] = capital_city.pk
-            self.request.session['city_name'] = capital_city.name
+        city = (
+            city_registry.get(user.preferred_delivery_city_id)
+            or city_registry.capital()
+        )
+        self.request.visitor.city_pk = city.pk
         return response
 
 
@@ -192,14 +171,11 @@ class UserFormUpdateView(
     def form_valid(self, form):
         response = super().form_valid(form)
         user = self.object
-        capital_city = City.objects.get(pk=1)
-        city = user.preferred_delivery_city
-        if city:
-            self.request.session['city_pk'] = city.pk
-            self.request.session['city_name'] = city.name
-        else:
-            self.request.session['city_pk'] = capital_city.pk
-            self.request.session['city_name'] = capital_city.name
+        city = (
+            city_registry.get(user.preferred_delivery_city_id)
+            or city_registry.capital()
+        )
+        self.request.visitor.city_pk = city.pk
         return response
 
 class UserPasswordChangeView(
@@ -1,6 +1,9 @@
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.messages import get_messages
+from django.core import signing
+from django.core.cache import cache
+from django.db import connection
 from django.shortcuts import get_object_or_404, redirect
 from django.test import TestCase
 from django.urls import reverse
@@ -80,6 +83,40 @@ class BaseTestCase(TestCase):
         "cities.json"
     ]
 
+    def _pre_setup(self):
+        # Cached likes and the city registry version outlive the per-test
+        # rollback, so every test starts from an empty cache.
+        cache.clear()
+        super()._pre_setup()
+
+    def assertUsesIndex(self, queryset, index_name):
+        """
+        Asserts that the database plans `queryset` through `index_name`.
+
+        Test tables are too small for PostgreSQL to prefer an index scan on
+        its own, so sequential scans are turned off while it plans.
+        """
+        postgresql = connection.vendor == 'postgresql'
+        with connection.cursor() as cursor:
+            if postgresql:
+                cursor.execute("SET enable_seqscan = off")
+            try:
+                plan = queryset.explain()
+            finally:
+                if postgresql:
+                    cursor.execute("RESET enable_seqscan")
+        self.assertIn(index_name, plan, f"{index_name} is not used:\n{plan}")
+
+    def visitor_cookie(self, name):
+        """The pks held by the client's signed visitor cookie `name`."""
+        from honduras_shop_aggregator.visitor import (VISITOR_COOKIE_SALT,
+                                                      parse_pks)
+        morsel = self.client.cookies.get(name)
+        if morsel is None or not morsel.value:
+            return []
+        signer = signing.get_cookie_signer(salt=name + VISITOR_COOKIE_SALT)
+        return parse_pks(signer.unsign(morsel.value))
+
     def login_user(self, user):
         self.client.login(
             username=user.username,
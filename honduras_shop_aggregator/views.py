@@ -1,88 +1,68 @@
 import random
 
 from django.contrib.messages.views import SuccessMessageMixin
-from django.db.models import Q
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404, redirect
-from django.template.loader import render_to_string
+from django.http import Http404, JsonResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import redirect
 from django.views import View
+from django.views.decorators.cache import never_cache
 from django.views.decorators.http import require_POST
 from django.views.generic import ListView
 
 from honduras_shop_aggregator.categories.models import Category
-from honduras_shop_aggregator.cities.models import City
+from honduras_shop_aggregator.cities.registry import city_registry
+from honduras_shop_aggregator.likedproducts.liked_set import LikedSet
+from honduras_shop_aggregator.pagination import (KeysetPaginationMixin,
+                                                 cursor_state,
+                                                 load_more_response)
 from honduras_shop_aggregator.products.models import Product
 
 
-class IndexView(SuccessMessageMixin, ListView):
+class IndexView(KeysetPaginationMixin, SuccessMessageMixin, ListView):
     model = Product
     template_name = "pages/index.html"
     context_object_name = "products"
     paginate_by = 24
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        queryset = queryset.filter(
-            is_active=True, stock_quantity__gt=0, is_deleted=False
-        )
-        city_pk = self.request.session.get('city_pk')
-        if city_pk:
-            queryset = queryset.filter(
-                Q(origin_city=city_pk) | Q(delivery_cities=city_pk)
-            ).distinct()
-        page = self.request.GET.get("page", "1")
-        print(f'page: {page}')
-        if page == "1":
-            seed = random.randint(0, 9999999)
-            self.request.session["shuffle_seed"] = seed
-            self.request.session.modified = True
-        else:
-            seed = self.request.session.get("shuffle_seed", 1)
-        products = list(queryset)
-        # this needs to be changed when number of products grows
-        random.Random(seed).shuffle(products)
-        return products
+        queryset = super().get_queryset().visible()
+        city_pk = self.request.visitor.city_pk
+        queryset = queryset.available_in(city_pk)
+        # The seed travels in the cursor, so "load more" keeps the order of
+        # the first page without storing anything for the visitor.
+        cursor = self.get_cursor()
+        self.seed = cursor_state(cursor) if cursor else None
+        if self.seed is None:
+            self.seed = random.randint(0, 9999999)
+        return queryset.shuffled(self.seed).for_grid(city_pk)
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        return self.paginator_class(queryset, per_page, state=self.seed)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        products = context['products']
-        if self.request.user.is_authenticated:
-            liked_ids = self.request.user.likes.values_list("product_id", flat=True)
-            for product in products:
-                product.is_liked = product.pk in liked_ids
-        else:
-            liked_products = self.request.session.get('liked_products', [])
-            for product in products:
-                product.is_liked = product.pk in liked_products
+        LikedSet.for_request(self.request, context['products']).mark(
+            context['products']
+        )
         context["categories"] = Category.objects.all()[:6]
         return context
 
     def render_to_response(self, context, **response_kwargs):
         """Return JSON if AJAX, otherwise full page."""
-        request = self.request
-        if request.headers.get("x-requested-with") == "XMLHttpRequest":
-            html = render_to_string(
-                "partials/_product_grid.html", 
-                {"products": context["products"], "request": request},
-                request=request
+        if self.request.headers.get("x-requested-with") == "XMLHttpRequest":
+            return load_more_response(
+                self.request, context["page_obj"], "partials/_product_grid.html"
             )
-            page_obj = context["page_obj"]
-            return JsonResponse({
-                "html": html,
-                "has_next": page_obj.has_next(),
-                "next_page": (
-                    page_obj.next_page_number() if page_obj.has_next() else None
-                )
-            })
         return super().render_to_response(context, **response_kwargs)
 
 
 class SetCityView(View):
 
     def get(self, request, city_pk):
-        city = get_object_or_404(City, pk=city_pk)
-        request.session['city_pk'] = city.pk
-        request.session['city_name'] = city.name
+        city = city_registry.get(city_pk)
+        if city is None:
+            raise Http404
+        request.visitor.city_pk = city.pk
 
         return redirect(request.META.get('HTTP_REFERER', '/'))
 
@@ -90,6 +70,16 @@ class SetCityView(View):
 @require_POST
 def switch_mode(request):
     mode = request.POST.get("mode")
+    if mode == "seller" and not (
+        request.user.is_authenticated and request.user.is_seller
+    ):
+        mode = "user"
     if mode in ["user", "seller"]:
         request.session["mode"] = mode
     return redirect(request.META.get("HTTP_REFERER", "index"))
+
+
+@never_cache
+def csrf_token(request):
+    """The CSRF token, for pages that leave it out to set no cookie."""
+    return JsonResponse({'token': get_token(request)})
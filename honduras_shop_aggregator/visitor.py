@@ -0,0 +1,135 @@
+"""
+The visitor's city and anonymous likes, kept in signed cookies.
+
+Neither needs the session, so anonymous browsing never writes a
+django_session row and responses only set a cookie when the visitor
+changes one of them. Values that were kept in the session before are
+moved into the cookies the first time the visitor comes back.
+
+A visitor without a session cookie gets no Vary: Cookie either: the
+empty session read for request.user cannot change the response. Together
+with pages that leave the CSRF token out, see js/csrf.js, an anonymous
+catalog page carries no cookie header, so a reverse proxy can cache it
+for the requests that send no cookie.
+
+    request.visitor.city_pk = 2
+    request.visitor.liked_products       # [3, 7]
+"""
+from django.conf import settings
+
+from honduras_shop_aggregator.cities.registry import CAPITAL_CITY_PK
+
+CITY_COOKIE = 'city'
+LIKES_COOKIE = 'liked_products'
+VISITOR_COOKIE_SALT = 'honduras_shop_aggregator.visitor'
+VISITOR_COOKIE_MAX_AGE = 60 * 60 * 24 * 365
+# Keeps the likes cookie well below the 4 KB browsers accept.
+MAX_ANONYMOUS_LIKES = 200
+# Session keys the city and the likes were kept under before.
+SESSION_KEYS = {
+    CITY_COOKIE: ('city_pk', 'city_name'),
+    LIKES_COOKIE: ('liked_products',),
+}
+
+
+def parse_pks(value):
+    try:
+        return [int(pk) for pk in value.split(',') if pk]
+    except ValueError:
+        return []
+
+
+class Visitor:
+    """Cookie-backed preferences of the visitor making `request`."""
+
+    def __init__(self, request):
+        self.request = request
+        self.changed = set()
+        self._values = {}
+
+    def _read(self, name):
+        if name in self._values:
+            return self._values[name]
+        value = self.request.get_signed_cookie(
+            name, default=None, salt=VISITOR_COOKIE_SALT
+        )
+        if value is None:
+            value = self._migrate(name)
+        self._values[name] = value = parse_pks(value or '')
+        return value
+
+    def _migrate(self, name):
+        """Moves the value out of the session of an earlier version."""
+        # Reading the session of a visitor without one would add Vary: Cookie.
+        if settings.SESSION_COOKIE_NAME not in self.request.COOKIES:
+            return None
+        session = self.request.session
+        legacy = [session.pop(key, None) for key in SESSION_KEYS[name]][0]
+        if not legacy:
+            return None
+        self.changed.add(name)
+        if isinstance(legacy, list):
+            return ','.join(str(pk) for pk in legacy)
+        return str(legacy)
+
+    def _write(self, name, pks):
+        self._values[name] = list(pks)
+        self.changed.add(name)
+
+    @property
+    def city_pk(self):
+        """The selected city, the capital until the visitor picks one."""
+        pks = self._read(CITY_COOKIE)
+        return pks[0] if pks else CAPITAL_CITY_PK
+
+    @city_pk.setter
+    def city_pk(self, city_pk):
+        if city_pk != self.city_pk:
+            self._write(CITY_COOKIE, [city_pk])
+
+    @property
+    def liked_products(self):
+        """Pks of the products an anonymous visitor liked, oldest first."""
+        return list(self._read(LIKES_COOKIE))
+
+    @liked_products.setter
+    def liked_products(self, product_pks):
+        product_pks = list(product_pks)[-MAX_ANONYMOUS_LIKES:]
+        if product_pks != self._read(LIKES_COOKIE):
+            self._write(LIKES_COOKIE, product_pks)
+
+    def save(self, response):
+        """Sets the cookies of the values that changed on `response`."""
+        for name in self.changed:
+            pks = self._values[name]
+            if not pks:
+                response.delete_cookie(name, samesite='Lax')
+                continue
+            response.set_signed_cookie(
+                name,
+                ','.join(str(pk) for pk in pks),
+                salt=VISITOR_COOKIE_SALT,
+                max_age=VISITOR_COOKIE_MAX_AGE,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+
+
+class VisitorMiddleware:
+    """Sets request.visitor and saves its changes on the response."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.visitor = Visitor(request)
+        response = self.get_response(request)
+        request.visitor.save(response)
+        session = request.session
+        if (
+            settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and not session.modified
+        ):
+            session.accessed = False
+        return response